@@ -0,0 +1,374 @@
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import shutil
+import statistics
+import threading
+import time
+from datetime import datetime
+from tabulate import tabulate
+from connectionPool import configure_pool, get_pool, profile_pragmas, STORAGE_PROFILES
+from dataGenerator import AIRPORTS, generate
+import flightManagementApplication as application
+import flightQueries
+import tableOutput
+
+# Start date used for every benchmark database, so databases of the same size are always identical
+BENCHMARK_START = datetime(2025, 1, 1)
+BENCHMARK_SEED = 42
+
+# The menu operations being benchmarked. Each entry has:
+#  - the flightQueries function the operation uses and a function choosing its arguments (timed on its own as
+#    the "query" path)
+#  - the inputs that would be typed at the operation's prompts (timed running the real menu function, which
+#    includes rendering the output with tabulate)
+#  - whether the operation lists a whole table, in which case it is skipped above --full-listing-limit
+def random_airport(rng, size):
+    return (rng.choice(AIRPORTS)[0],)
+
+
+def random_pilot(rng, size):
+    return (str(rng.randint(1, pilot_count(size))),)
+
+
+def random_status(rng, size):
+    return (rng.choice(["On Time", "Delayed", "Cancelled"]),)
+
+
+def no_arguments(rng, size):
+    return ()
+
+
+OPERATIONS = [
+    ("view_flights (Arrival_Airport_IATA)", application.view_flights,
+     lambda iata: flightQueries.find_flights("Arrival_Airport_IATA", iata),
+     random_airport, lambda iata: ["Arrival_Airport_IATA", iata], False),
+    ("view_flights (Flight_Status)", application.view_flights,
+     lambda status: flightQueries.find_flights("Flight_Status", status),
+     random_status, lambda status: ["Flight_Status", status], True),
+    ("view_flights (ALL)", application.view_flights, flightQueries.all_flights,
+     no_arguments, lambda: ["ALL"], True),
+    ("view_pilot_schedule (pilot)", application.view_pilot_schedule, flightQueries.pilot_schedule,
+     random_pilot, lambda pilot_id: [pilot_id], False),
+    ("view_pilot_schedule (ALL)", application.view_pilot_schedule, flightQueries.pilot_schedule,
+     no_arguments, lambda: ["ALL"], True),
+    ("view_destination_info", application.view_destination_info, flightQueries.flights_to,
+     random_airport, lambda iata: [iata], False),
+    ("number_of_flights_to_destination", application.number_of_flights_to_destination,
+     lambda iata: [flightQueries.count_flights_to(iata)], random_airport, lambda iata: [iata], False)
+]
+
+
+# Pilot and aircraft numbers grow with the number of flights so schedules stay a realistic length
+def pilot_count(size):
+    return max(15, size // 100)
+
+
+def aircraft_count(size):
+    return max(15, size // 500)
+
+
+# Create (or reuse) a generated database with the given number of flights
+def seed_database(directory, size):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"benchmark_{size}.db")
+    if os.path.exists(path):
+        return path
+
+    print(f"Generating benchmark database with {size:,} flights...")
+    connection = sqlite3.connect(path + ".tmp")
+    connection.execute("PRAGMA synchronous = OFF")
+    generate(connection, flights=size, aircrafts=aircraft_count(size), pilots=pilot_count(size),
+             seed=BENCHMARK_SEED, start=BENCHMARK_START, days=max(30, size // 20000))
+    connection.close()
+    # Only move the file into place once it is complete, so an interrupted run is regenerated next time
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# Output sink that throws away everything written to it, so rendering is timed without filling memory
+class DiscardOutput(io.TextIOBase):
+
+    def write(self, text):
+        return len(text)
+
+
+# Run a menu function with scripted answers to its input() prompts and its output discarded
+def run_menu_function(function, answers):
+    answers = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        with contextlib.redirect_stdout(DiscardOutput()):
+            function()
+    finally:
+        builtins.input = original_input
+
+
+# Summarise a list of latencies (seconds) as milliseconds percentiles and operations per second
+def summarise(latencies, rows):
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    def percentile(fraction):
+        # Nearest-rank percentile - exact for the small sample sizes used here
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {
+        "iterations": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+        "ops_per_second": len(ordered) / total if total else None,
+        "rows_per_second": rows / total if total else None
+    }
+
+
+# Time one operation against the current pool's database
+def benchmark_operation(operation, size, iterations, warmup, rng):
+    name, function, query, choose_arguments, answers_for, full_listing = operation
+    arguments = [choose_arguments(rng, size) for i in range(warmup + iterations)]
+
+    # Query path: the data-access function on its own
+    query_latencies = []
+    rows = 0
+    for index, call_arguments in enumerate(arguments):
+        started = time.perf_counter()
+        result = query(*call_arguments)
+        elapsed = time.perf_counter() - started
+        if index >= warmup:
+            query_latencies.append(elapsed)
+            rows += len(result)
+
+    # Full path: the real menu function, including the tabulate rendering
+    render_latencies = []
+    for index, call_arguments in enumerate(arguments):
+        started = time.perf_counter()
+        run_menu_function(function, answers_for(*call_arguments))
+        elapsed = time.perf_counter() - started
+        if index >= warmup:
+            render_latencies.append(elapsed)
+
+    return {"operation": name, "flights": size, "rows_returned": rows,
+            "query": summarise(query_latencies, rows), "query_and_render": summarise(render_latencies, rows)}
+
+
+def run(sizes, iterations, warmup, directory, full_listing_limit, operations=None):
+    results = []
+    for size in sizes:
+        path = seed_database(directory, size)
+        configure_pool(database=path)
+        rng = random.Random(BENCHMARK_SEED)
+
+        for operation in OPERATIONS:
+            name, full_listing = operation[0], operation[5]
+            if operations and name not in operations:
+                continue
+            if full_listing and size > full_listing_limit:
+                print(f"Skipping {name} at {size:,} flights (full listing above --full-listing-limit)")
+                continue
+
+            # Full listings are slow, so they are only run a few times
+            repeats = min(iterations, 3) if full_listing else iterations
+            result = benchmark_operation(operation, size, repeats, warmup if not full_listing else 0, rng)
+            results.append(result)
+            print(f"{size:>10,} flights  {name:<40} query p50 {result['query']['p50_ms']:9.2f}ms  "
+                  f"query+render p50 {result['query_and_render']['p50_ms']:9.2f}ms")
+
+        get_pool().close()
+        # Results cached from this database mustn't be served for the next one
+        flightQueries.query_cache.clear()
+    return results
+
+
+# Measure reader throughput while writers are inserting flights, once for each storage profile.
+# Each profile runs on its own copy of the database. Readers repeatedly run the destination query on their own
+# connections; writers insert write_batch flights per transaction as fast as they can
+def concurrency_benchmark(path, size, profiles, readers, writers, seconds, write_batch=100):
+    results = []
+    for profile in profiles:
+        copy = f"{path}.{profile}.db"
+        shutil.copyfile(path, copy)
+        stop = threading.Event()
+        read_latencies = [[] for i in range(readers)]
+        read_errors = [0] * readers
+        commits = [0] * writers
+
+        def open_connection():
+            connection = sqlite3.connect(copy, timeout=30, check_same_thread=False)
+            for pragma in profile_pragmas(profile):
+                connection.execute(pragma)
+            return connection
+
+        def reader(number):
+            connection = open_connection()
+            rng = random.Random(number)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    connection.execute(flightQueries.FLIGHTS_TO_QUERY, (rng.choice(AIRPORTS)[0],)).fetchall()
+                    read_latencies[number].append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    # "database is locked" - the reader was blocked by a writer for longer than the busy timeout
+                    read_errors[number] += 1
+            connection.close()
+
+        def writer(number):
+            connection = open_connection()
+            row = (1234, "Benchmark Air", 1, "2025-01-01T10:00", "2025-01-01T12:00", "On Time", "LHR", "JFK")
+            while not stop.is_set():
+                connection.executemany(flightQueries.INSERT_FLIGHT_QUERY, [row] * write_batch)
+                connection.commit()
+                commits[number] += 1
+            connection.close()
+
+        # Switch the copy to the profile's journal mode before any other connection opens it
+        open_connection().close()
+        threads = ([threading.Thread(target=reader, args=(number,)) for number in range(readers)] +
+                   [threading.Thread(target=writer, args=(number,)) for number in range(writers)])
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = [latency for reader_latencies in read_latencies for latency in reader_latencies]
+        result = {"profile": profile, "flights": size, "readers": readers, "writers": writers, "seconds": seconds,
+                  "reads": summarise(latencies, len(latencies)) if latencies else None,
+                  "reads_per_second": len(latencies) / seconds, "read_errors": sum(read_errors),
+                  "flights_written_per_second": sum(commits) * write_batch / seconds}
+        results.append(result)
+        p99 = f"{result['reads']['p99_ms']:.2f}ms" if latencies else "n/a"
+        print(f"{size:>10,} flights  profile {profile:<9} {result['reads_per_second']:10,.0f} reads/s "
+              f"(p99 {p99}, {result['read_errors']} blocked) with "
+              f"{result['flights_written_per_second']:,.0f} flights/s being written")
+
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(copy + suffix):
+                os.remove(copy + suffix)
+    return results
+
+
+# Time printing the same large listing (the first `rows` flights) through tabulate's grid and each streamed
+# output mode, with the output thrown away. Each mode is run `repeats` times and the fastest run is reported
+def render_benchmark(path, size, rows, modes, repeats=3):
+    connection = sqlite3.connect(path)
+    listing = connection.execute(flightQueries.FLIGHTS_PAGE_QUERY, (flightQueries.FIRST_KEY, rows)).fetchall()
+    connection.close()
+
+    results = []
+    for mode in modes:
+        timings = []
+        for repeat in range(repeats):
+            started = time.perf_counter()
+            if mode == "grid":
+                DiscardOutput().write(tabulate(listing, headers=flightQueries.FLIGHT_COLUMNS, tablefmt="grid"))
+            else:
+                tableOutput.write_table(listing, flightQueries.FLIGHT_COLUMNS, mode, output=DiscardOutput())
+            timings.append(time.perf_counter() - started)
+        result = {"mode": mode, "flights": size, "rows": len(listing), "best_seconds": min(timings),
+                  "rows_per_second": len(listing) / min(timings)}
+        results.append(result)
+        print(f"{len(listing):>10,} rows  {mode:<6} {result['best_seconds']:8.3f}s  "
+              f"{result['rows_per_second']:12,.0f} rows/s")
+    return results
+
+
+# Compare a run with a previous results file and print operations whose median got slower than the threshold
+def compare(results, previous_path, threshold):
+    with open(previous_path) as previous_file:
+        previous = {(result["operation"], result["flights"]): result for result in json.load(previous_file)["results"]}
+
+    regressions = 0
+    for result in results:
+        before = previous.get((result["operation"], result["flights"]))
+        if before is None:
+            continue
+        for path in ["query", "query_and_render"]:
+            old, new = before[path]["p50_ms"], result[path]["p50_ms"]
+            if old and new > old * (1 + threshold):
+                regressions += 1
+                print(f"REGRESSION {result['operation']} ({result['flights']:,} flights, {path}): "
+                      f"p50 {old:.2f}ms -> {new:.2f}ms")
+    if not regressions:
+        print("No regressions found.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the menu operations against generated databases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000],
+                        help="Numbers of flights to benchmark with, e.g. --sizes 10000 1000000 10000000")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per operation")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per operation before timing")
+    parser.add_argument("--directory", default="benchmark_data", help="Where the generated databases are kept")
+    parser.add_argument("--full-listing-limit", type=int, default=100000,
+                        help="Skip the ALL listings on databases larger than this")
+    parser.add_argument("--operations", nargs="+", help="Only run the named operations")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the query result cache so every call reaches the database")
+    parser.add_argument("--concurrency", action="store_true",
+                        help="Also measure read throughput while writes are under way, for each storage profile")
+    parser.add_argument("--profiles", nargs="+", choices=list(STORAGE_PROFILES), default=["rollback", "wal"],
+                        help="Storage profiles compared by --concurrency")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads for --concurrency")
+    parser.add_argument("--writers", type=int, default=1, help="Writer threads for --concurrency")
+    parser.add_argument("--seconds", type=float, default=5.0, help="How long each --concurrency run lasts")
+    parser.add_argument("--render", action="store_true",
+                        help="Also compare tabulate's grid with the streamed output modes on a large listing")
+    parser.add_argument("--render-rows", type=int, default=100000, help="Rows printed by --render")
+    parser.add_argument("--render-modes", nargs="+", choices=tableOutput.OUTPUT_MODES,
+                        default=tableOutput.OUTPUT_MODES, help="Output modes compared by --render")
+    parser.add_argument("--output", default="benchmark_results.json", help="File to save the results to")
+    parser.add_argument("--compare", help="Previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Fractional slowdown of the median that counts as a regression")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        # Entries that expire immediately are never served, so every lookup goes to the database
+        flightQueries.query_cache.ttl = 0
+
+    results = run(args.sizes, args.iterations, args.warmup, args.directory, args.full_listing_limit, args.operations)
+
+    concurrency = []
+    if args.concurrency:
+        for size in args.sizes:
+            concurrency += concurrency_benchmark(seed_database(args.directory, size), size, args.profiles,
+                                                 args.readers, args.writers, args.seconds)
+
+    rendering = []
+    if args.render:
+        for size in args.sizes:
+            rendering += render_benchmark(seed_database(args.directory, size), size, args.render_rows,
+                                          args.render_modes)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.platform(),
+        "query_cache": not args.no_cache,
+        "results": results,
+        "concurrency": concurrency,
+        "rendering": rendering
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
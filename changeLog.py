@@ -0,0 +1,164 @@
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from connectionPool import configure_pool, connect_to_db, get_pool
+
+# Reading the change log. Triggers add a row to Change_Log for every insert, update and delete on Flights and
+# Flight_Pilot (see databaseSchema), in the same transaction as the change, so the log holds exactly the committed
+# changes in the order they were made. A consumer keeps the Sequence of the last change it has applied and asks for
+# the changes after it, instead of re-reading whole tables: a cache, replica or report that is out of date by a
+# few changes catches up by reading just those changes.
+#
+# Sequence numbers have no gaps unless old changes have been pruned, so changes_since() can tell when a consumer
+# has fallen so far behind that changes it needed are gone; it then has to re-read the tables and carry on from
+# latest_sequence(). The same goes for a 'reset' change, which the data generator records after rewriting the
+# tables with the triggers dropped
+
+CHANGE_COLUMNS = ["Sequence", "Table_Name", "Operation", "Flight_ID", "Pilot_ID", "Old_Row", "New_Row", "Changed_At"]
+OPERATIONS = ["insert", "update", "delete", "reset"]
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_POLL_SECONDS = 0.5
+
+CHANGES_SINCE_QUERY = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM Change_Log WHERE Sequence > ?"
+CHANGES_ORDER = " ORDER BY Sequence LIMIT ?"
+# sqlite_sequence keeps the highest Sequence ever handed out, even once those changes have been pruned
+LATEST_SEQUENCE_QUERY = "SELECT seq FROM sqlite_sequence WHERE name = 'Change_Log'"
+OLDEST_SEQUENCE_QUERY = "SELECT MIN(Sequence) FROM Change_Log"
+
+
+# Raised when the changes a consumer asked for have been pruned, so it can't catch up from the log alone
+class ChangesPruned(LookupError):
+
+    def __init__(self, since, oldest):
+        super().__init__(f"Changes after {since} have been pruned (the oldest left is {oldest}). "
+                         "Re-read the tables and continue from latest_sequence().")
+        self.since = since
+        self.oldest = oldest
+
+
+def _decode(row):
+    return row[:5] + tuple(json.loads(value) if value is not None else None for value in row[5:7]) + row[7:]
+
+
+# Up to limit changes after sequence, oldest first, in CHANGE_COLUMNS order with Old_Row and New_Row as dicts.
+# tables optionally limits them to some of the tables. Raises ChangesPruned if changes after sequence are missing
+def read_changes(connection, sequence=0, limit=DEFAULT_BATCH_SIZE, tables=None):
+    query, parameters = CHANGES_SINCE_QUERY, [sequence]
+    if tables:
+        query += " AND Table_Name IN (SELECT value FROM json_each(?))"
+        parameters.append(json.dumps(list(tables)))
+    rows = connection.execute(query + CHANGES_ORDER, parameters + [limit]).fetchall()
+    # Without pruning every Sequence is present, so if the one after sequence is missing it may have been pruned.
+    # (It may also belong to a table that was filtered out, so what decides it is the oldest change still logged)
+    if not rows or rows[0][0] != sequence + 1:
+        oldest = connection.execute(OLDEST_SEQUENCE_QUERY).fetchone()[0]
+        if oldest is None:
+            oldest = latest_sequence(connection) + 1
+        if oldest > sequence + 1:
+            raise ChangesPruned(sequence, oldest)
+    return [_decode(row) for row in rows]
+
+
+def changes_since(sequence=0, limit=DEFAULT_BATCH_SIZE, tables=None):
+    connection = connect_to_db()
+    try:
+        return read_changes(connection, sequence, limit, tables)
+    finally:
+        connection.close()
+
+
+# The Sequence of the most recent change, or 0 if nothing has been logged yet. A new consumer that reads the tables
+# first should note this beforehand and start from it
+def latest_sequence(connection=None):
+    if connection is None:
+        connection = connect_to_db()
+        try:
+            return latest_sequence(connection)
+        finally:
+            connection.close()
+    row = connection.execute(LATEST_SEQUENCE_QUERY).fetchone()
+    return 0 if row is None else row[0]
+
+
+# Yield the changes after sequence (or from now on if it is None) as they are committed, in lists of at most
+# batch_size, until the caller stops. Consumers can apply each list and record its last Sequence in one go.
+# Between commits the log isn't queried at all, only PRAGMA data_version, which changes whenever another
+# connection commits, so an idle tail costs next to nothing. Uses its own connection rather than holding one of the
+# pool's indefinitely
+def tail(sequence=None, batch_size=DEFAULT_BATCH_SIZE, tables=None, poll_seconds=DEFAULT_POLL_SECONDS):
+    connection = sqlite3.connect(get_pool().database)
+
+    def data_version():
+        return connection.execute("PRAGMA data_version").fetchone()[0]
+
+    try:
+        if sequence is None:
+            sequence = latest_sequence(connection)
+        while True:
+            # Read before the query, so a commit landing after the query is still noticed below
+            version = data_version()
+            changes = read_changes(connection, sequence, batch_size, tables)
+            if changes:
+                yield changes
+                sequence = changes[-1][0]
+                if len(changes) == batch_size:
+                    continue
+            while data_version() == version:
+                time.sleep(poll_seconds)
+    finally:
+        connection.close()
+
+
+# Delete changes up to and including sequence, e.g. once every consumer has read them. Returns the number deleted
+def prune_changes(sequence):
+    connection = connect_to_db()
+    try:
+        deleted = connection.execute("DELETE FROM Change_Log WHERE Sequence <= ?", (sequence,)).rowcount
+        connection.commit()
+    finally:
+        connection.close()
+    return deleted
+
+
+def _write_change(change, output):
+    output.write(json.dumps(dict(zip(CHANGE_COLUMNS, change))) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the change log of Flights and Flight_Pilot as JSON lines.")
+    parser.add_argument("command", choices=["since", "tail", "latest", "prune"],
+                        help="since: print the changes after --since; tail: print them and keep printing new ones; "
+                             "latest: print the latest Sequence; prune: delete the changes up to --since")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--since", type=int, help="Sequence of the last change already seen (tail defaults to now)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_BATCH_SIZE, help="Maximum number of changes for since")
+    parser.add_argument("--table", action="append", choices=["Flights", "Flight_Pilot"],
+                        help="Only changes to this table (can be given more than once)")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between checks for tail")
+    args = parser.parse_args()
+    configure_pool(database=args.database)
+
+    if args.command == "latest":
+        print(latest_sequence())
+    elif args.command == "prune":
+        if args.since is None:
+            parser.error("prune needs --since")
+        print(f"Deleted {prune_changes(args.since):,} changes.")
+    elif args.command == "since":
+        for change in changes_since(args.since or 0, args.limit, args.table):
+            _write_change(change, sys.stdout)
+    else:
+        try:
+            for changes in tail(args.since, tables=args.table, poll_seconds=args.poll):
+                for change in changes:
+                    _write_change(change, sys.stdout)
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import sqlite3
+import threading
+import time
+import traceback
+import queue
+
+# Default location of the database used by the application
+DATABASE_PATH = "FlightManagement.db"
+
+# Storage profiles: named sets of PRAGMA settings applied to every new connection the pool opens.
+#  - wal: write-ahead logging, so readers carry on reading the last committed data while a write is in progress
+#    instead of being blocked by it. synchronous = NORMAL is safe with WAL (a power cut can lose the last few
+#    commits but never corrupts the database) and avoids an fsync on every commit
+#  - durable: WAL, but every commit is synced to disk before returning
+#  - rollback: SQLite's original rollback journal, where a writer committing blocks all readers
+# cache_size is negative to give it in KiB; mmap_size lets reads come straight from the OS page cache;
+# journal_size_limit stops the WAL file staying large after a checkpoint
+STORAGE_PROFILES = {
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -64000, "mmap_size": 268435456,
+            "temp_store": "MEMORY", "busy_timeout": 5000, "wal_autocheckpoint": 1000,
+            "journal_size_limit": 67108864},
+    "durable": {"journal_mode": "WAL", "synchronous": "FULL", "cache_size": -64000, "mmap_size": 268435456,
+                "temp_store": "MEMORY", "busy_timeout": 5000, "wal_autocheckpoint": 1000,
+                "journal_size_limit": 67108864},
+    "rollback": {"journal_mode": "DELETE", "synchronous": "FULL", "cache_size": -16000, "mmap_size": 0,
+                 "temp_store": "MEMORY", "busy_timeout": 5000}
+}
+
+DEFAULT_PROFILE = "wal"
+
+
+# Turn a profile (optionally with some settings overridden) into PRAGMA statements. journal_mode comes first
+# because it changes how the other settings behave
+def profile_pragmas(profile=DEFAULT_PROFILE, **overrides):
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {profile!r}. Choose from {', '.join(STORAGE_PROFILES)}.")
+    settings = dict(STORAGE_PROFILES[profile], **overrides)
+    ordered = sorted(settings.items(), key=lambda setting: setting[0] != "journal_mode")
+    return [f"PRAGMA {name} = {value}" for name, value in ordered]
+
+
+# Wrapper handed out by the pool. It behaves exactly like a sqlite3.Connection (any attribute it doesn't define is
+# passed straight through) except that close() gives the connection back to the pool instead of closing it.
+# This means existing code that does connection.close() keeps working unchanged.
+# If the pool has a tracer (see queryTracing.py), statements are sent through the tracer's wrapper instead
+class PooledConnection:
+
+    def __init__(self, pool, connection, tracer=None):
+        self._pool = pool
+        self._connection = connection
+        self._target = connection if tracer is None else tracer.wrap(connection)
+        self._released = False
+
+        # Record when and where the connection was checked out so leaks can be traced back to the caller
+        self.checked_out_at = time.monotonic()
+        self.checked_out_by = "".join(traceback.format_stack(limit=6)[:-2])
+
+    def __getattr__(self, name):
+        if self._released:
+            raise sqlite3.ProgrammingError("Cannot operate on a connection that has been returned to the pool.")
+        return getattr(self._target, name)
+
+    # Return the connection to the pool - calling this more than once does nothing
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self, self._connection)
+
+    # Allow "with connect_to_db() as connection:" to check the connection back in on exit.
+    # Note this differs from sqlite3.Connection, whose context manager only commits/rolls back
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self._connection.commit()
+        else:
+            self._connection.rollback()
+        self.close()
+        return False
+
+
+# Process-wide pool of SQLite connections. Connections are reused so the page cache and the statement cache
+# that sqlite3 keeps per connection stay warm between menu actions.
+class ConnectionPool:
+
+    # profile picks the storage profile applied to each connection; pragmas lists any extra PRAGMA statements
+    # to run after it
+    def __init__(self, database=DATABASE_PATH, size=5, profile=DEFAULT_PROFILE, pragmas=None, timeout=30.0,
+                 leak_timeout=60.0, statement_cache_size=128):
+        self.database = database
+        self.size = size
+        self.profile = profile
+        self.pragmas = profile_pragmas(profile) + list(pragmas or [])
+        self.timeout = timeout                      # Seconds to wait for a free connection before giving up
+        self.leak_timeout = leak_timeout            # Seconds a connection can be checked out before it is reported as leaked
+        self.statement_cache_size = statement_cache_size
+        self.tracer = None                          # Set by queryTracing.enable_tracing() to time every statement
+
+        # Idle connections waiting to be reused. A LIFO queue hands back the most recently used connection,
+        # which is the one most likely to have the pages we need in its cache
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0                             # Number of connections currently open (idle + checked out)
+        self._checked_out = {}                       # id(wrapper) -> wrapper for every connection currently in use
+        self._closed = False
+
+    # Open a brand new connection and apply the PRAGMA setup to it
+    def _open_connection(self):
+        # check_same_thread=False lets a connection be used by whichever thread checked it out - the pool makes sure
+        # only one thread holds a given connection at a time
+        connection = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                                     cached_statements=self.statement_cache_size)
+        for pragma in self.pragmas:
+            connection.execute(pragma)
+        return connection
+
+    # Check a connection is still usable before handing it out
+    def _is_healthy(self, connection):
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    # Get a connection from the pool, opening a new one if the pool hasn't reached its size yet
+    def acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("The connection pool has been closed.")
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+
+            # Nothing idle - open a new connection if we are allowed to, otherwise wait for one to be returned
+            if connection is None:
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        connection = self._open_connection()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No database connection became free within {self.timeout} seconds. "
+                                           f"Leaked connections: {len(self.find_leaks())}")
+                    try:
+                        connection = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+
+            # Replace connections that have gone bad rather than handing them out
+            if not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+
+            wrapper = PooledConnection(self, connection, self.tracer)
+            with self._lock:
+                self._checked_out[id(wrapper)] = wrapper
+            return wrapper
+
+    # Called by PooledConnection.close()
+    def _release(self, wrapper, connection):
+        with self._lock:
+            self._checked_out.pop(id(wrapper), None)
+
+        # Throw away anything the caller didn't commit so the next user starts from a clean state
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self._discard(connection)
+            return
+
+        if self._closed:
+            self._discard(connection)
+        else:
+            self._idle.put(connection)
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened -= 1
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    # Return the connections that have been checked out for longer than leak_timeout
+    def find_leaks(self, leak_timeout=None):
+        limit = self.leak_timeout if leak_timeout is None else leak_timeout
+        now = time.monotonic()
+        with self._lock:
+            return [wrapper for wrapper in self._checked_out.values() if now - wrapper.checked_out_at > limit]
+
+    # Print a report of leaked connections and where they were checked out from
+    def report_leaks(self, leak_timeout=None):
+        leaks = self.find_leaks(leak_timeout)
+        for wrapper in leaks:
+            held_for = time.monotonic() - wrapper.checked_out_at
+            print(f"Connection held for {held_for:.1f}s, checked out at:\n{wrapper.checked_out_by}")
+        return len(leaks)
+
+    # Current state of the pool, useful for debugging
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "open": self._opened, "in_use": len(self._checked_out),
+                    "idle": self._idle.qsize()}
+
+    # Close every idle connection. Connections still checked out are closed when they are returned
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+
+# The single pool shared by the whole process, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Get the shared pool, creating it with the default settings if it doesn't exist yet
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+# Replace the shared pool with one using different settings (e.g. a different database file, pool size or
+# storage profile).
+# Any previous pool is closed first
+def configure_pool(**settings):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**settings)
+        return _pool
+
+
+# Get a connection from the shared pool - call close() on it when finished to give it back
+def connect_to_db():
+    return get_pool().acquire()
@@ -0,0 +1,328 @@
+import argparse
+import heapq
+import time
+from connectionPool import configure_pool, connect_to_db
+import flightQueries
+
+# Crew scheduling tables and checks. Two tables are derived from the crew assignments in Flight_Pilot and kept up
+# to date by triggers (see databaseSchema.py):
+#  - Crew_Intervals holds each pilot's flights as UTC time intervals sorted by departure. flightQueries.assign_pilot()
+#    uses it to refuse an assignment that would put a pilot on two flights at once, and audit_crew() checks every
+#    pilot's whole schedule in one pass
+#  - Pilot_Schedule holds each pilot's schedule already joined to the pilot and flight details, ready to display
+# staff_flights() fills every unstaffed Captain and First Officer seat it can in one batch
+
+# Every flight needs one pilot of each of these ranks, with the rank as their role
+ROLES = ["Captain", "First Officer"]
+
+# How staff_flights() chooses between pilots who are free at the departure airport:
+#  - workload: the pilot who has flown the fewest minutes so far, so hours are spread evenly
+#  - experience: Captains by workload, then the most experienced First Officer for a Captain with less experience
+#    than average and the least experienced one otherwise, so every crew has a similar amount of experience
+OBJECTIVES = ["workload", "experience"]
+
+# Minimum time between a pilot landing and taking off again
+DEFAULT_TURNAROUND_MINUTES = 45
+
+# Each crew assignment with its flight's UTC times, as Crew_Intervals rows
+EXPECTED_INTERVALS_QUERY = """SELECT Flight_Pilot.Pilot_ID, Flights.Departure_UTC, Flights.Arrival_UTC, Flights.Flight_ID
+                              FROM Flight_Pilot JOIN Flights ON Flights.Flight_ID = Flight_Pilot.Flight_ID
+                              WHERE Flights.Departure_UTC IS NOT NULL AND Flights.Arrival_UTC IS NOT NULL"""
+
+# Each crew assignment joined to its pilot and flight, as Pilot_Schedule rows
+SCHEDULE_ROWS = """SELECT Flight_Pilot.Pilot_ID, Pilots.Full_Name, Flight_Pilot.Flight_ID, Flights.Flight_Number,
+       Flights.Departure, Flights.Arrival, Flights.Flight_Status, Flights.Departure_Airport_IATA,
+       Flights.Arrival_Airport_IATA
+FROM Flight_Pilot
+JOIN Pilots ON Pilots.Pilot_ID = Flight_Pilot.Pilot_ID
+JOIN Flights ON Flights.Flight_ID = Flight_Pilot.Flight_ID"""
+
+
+# Throw away Crew_Intervals and rebuild it from Flight_Pilot and Flights in one transaction
+def rebuild_crew_intervals(connection):
+    connection.execute("DELETE FROM Crew_Intervals")
+    connection.execute("INSERT OR IGNORE INTO Crew_Intervals (Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID) "
+                       + EXPECTED_INTERVALS_QUERY)
+    connection.commit()
+
+
+# Throw away Pilot_Schedule and rebuild it from Flight_Pilot, Pilots and Flights in one transaction
+def rebuild_pilot_schedule(connection):
+    connection.execute("DELETE FROM Pilot_Schedule")
+    connection.execute("INSERT INTO Pilot_Schedule " + SCHEDULE_ROWS)
+    connection.commit()
+
+
+# Compare Crew_Intervals and Pilot_Schedule with what they should contain. Returns a list of
+# (table, row, problem) where problem is "missing" or "unexpected"
+def verify_crew_tables(connection):
+    differences = []
+    for table, expected_query in [("Crew_Intervals", EXPECTED_INTERVALS_QUERY), ("Pilot_Schedule", SCHEDULE_ROWS)]:
+        expected = set(connection.execute(expected_query))
+        stored = set(connection.execute(f"SELECT * FROM {table}"))
+        differences += [(table, row, "missing") for row in sorted(expected - stored)]
+        differences += [(table, row, "unexpected") for row in sorted(stored - expected)]
+    return differences
+
+
+# Find every pair of overlapping flights in every pilot's schedule. Returns a list of
+# (Pilot_ID, Flight_ID, Flight_ID) with the earlier-departing flight first.
+# Crew_Intervals is read in primary key order, i.e. already sorted by pilot and departure, and swept once per pilot
+# keeping a heap of the flights still in the air ordered by arrival. Flights that have landed by the next departure
+# are popped off; anything left overlaps it. This is O(n log n + number of conflicts) for n assignments
+def audit_crew(connection):
+    conflicts = []
+    current_pilot = None
+    airborne = []   # (Arrival_UTC, Flight_ID) of the current pilot's flights that haven't landed yet
+    for pilot_id, departure, arrival, flight_id in connection.execute(
+            "SELECT Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID FROM Crew_Intervals "
+            "ORDER BY Pilot_ID, Departure_UTC, Flight_ID"):
+        if pilot_id != current_pilot:
+            current_pilot = pilot_id
+            airborne = []
+        while airborne and airborne[0][0] <= departure:
+            heapq.heappop(airborne)
+        for landing, other_flight_id in airborne:
+            conflicts.append((pilot_id, other_flight_id, flight_id))
+        heapq.heappush(airborne, (arrival, flight_id))
+    return conflicts
+
+
+# Plans crew for unstaffed flights by sweeping through the flights in UTC departure order, greedy interval
+# scheduling style. Every pilot has a location and a time they are next free. Pilots waiting to become free at an
+# airport sit in a heap per (rank, airport) ordered by that time; when a flight departs, the ones who are free by
+# then move to a second heap ordered by the objective, and the top of that heap is given the seat. Pilots who have
+# never flown have no location yet and can start anywhere. Each decision is O(log n), so a month of flights for
+# thousands of pilots takes seconds.
+# Heap entries carry the pilot's version number, which goes up whenever the pilot moves, so stale entries are
+# skipped when they reach the top instead of being searched for and removed
+class CrewPlanner:
+
+    def __init__(self, pilots, turnaround_minutes=DEFAULT_TURNAROUND_MINUTES, objective="workload"):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}. Choose from {', '.join(OBJECTIVES)}.")
+        self.pilots = pilots                    # Pilot_ID -> (Rank, Years_Of_Experience)
+        self.turnaround = turnaround_minutes * 60
+        self.objective = objective
+        captains = [experience for rank, experience in pilots.values() if rank == "Captain"]
+        self.average_captain_experience = sum(captains) / len(captains) if captains else 0
+
+        self.version = dict.fromkeys(pilots, 0)
+        self.free_at = {}                       # Pilot_ID -> UTC time the pilot can next take off
+        self.location = {}                      # Pilot_ID -> airport the pilot is at, if they have flown
+        self.minutes_flown = dict.fromkeys(pilots, 0)
+        self.commitments = {}                   # Pilot_ID -> existing flights still to come, as [(departure, airport)]
+        self.waiting = {}                       # (rank, airport) -> heap of (free_at, version, Pilot_ID)
+        self.ready = {}                         # (rank, airport) -> {heap name: heap of (key, version, Pilot_ID)}
+        self.floating = {}                      # rank -> {heap name: heap}, for pilots with no location yet
+        for pilot_id in pilots:
+            self._make_ready(pilot_id, self.floating.setdefault(pilots[pilot_id][0], {}))
+
+    # Keys for the heaps a free pilot is put in, by heap name
+    def _ready_keys(self, pilot_id):
+        rank, experience = self.pilots[pilot_id]
+        keys = {"workload": (self.minutes_flown[pilot_id], pilot_id)}
+        if self.objective == "experience" and rank == "First Officer":
+            keys["senior"] = (-experience, pilot_id)
+            keys["junior"] = (experience, pilot_id)
+        return keys
+
+    def _make_ready(self, pilot_id, heaps):
+        for name, key in self._ready_keys(pilot_id).items():
+            heapq.heappush(heaps.setdefault(name, []), (key, self.version[pilot_id], pilot_id))
+
+    # Record that a pilot flies a flight, moving them to its arrival airport
+    def fly(self, pilot_id, departure, arrival, arrival_airport):
+        self.version[pilot_id] += 1
+        self.minutes_flown[pilot_id] += max(arrival - departure, 0) // 60
+        self.free_at[pilot_id] = max(self.free_at.get(pilot_id, arrival), arrival) + self.turnaround
+        self.location[pilot_id] = arrival_airport
+        heapq.heappush(self.waiting.setdefault((self.pilots[pilot_id][0], arrival_airport), []),
+                       (self.free_at[pilot_id], self.version[pilot_id], pilot_id))
+
+    # Register the existing assignments from the start of the planning window on, in departure order, so new flights are
+    # only given to a pilot if they land back at the right airport in time for them
+    def commit(self, pilot_id, departure, departure_airport):
+        self.commitments.setdefault(pilot_id, []).append((departure, departure_airport))
+
+    # Called for each existing assignment as the sweep reaches it
+    def fly_commitment(self, pilot_id, departure, arrival, arrival_airport):
+        commitments = self.commitments.get(pilot_id)
+        if commitments:
+            commitments.pop(0)
+        self.fly(pilot_id, departure, arrival, arrival_airport)
+
+    def _fits(self, pilot_id, arrival, arrival_airport):
+        commitments = self.commitments.get(pilot_id)
+        if not commitments:
+            return True
+        next_departure, next_airport = commitments[0]
+        return arrival + self.turnaround <= next_departure and arrival_airport == next_airport
+
+    # Take the best valid pilot from heap, or None. Pilots who can't fit the flight in are put back afterwards
+    def _take(self, heap, arrival, arrival_airport):
+        unsuitable = []
+        chosen = None
+        while heap:
+            entry = heapq.heappop(heap)
+            pilot_id = entry[2]
+            if entry[1] != self.version[pilot_id]:
+                continue
+            if self._fits(pilot_id, arrival, arrival_airport):
+                chosen = pilot_id
+                break
+            unsuitable.append(entry)
+        for entry in unsuitable:
+            heapq.heappush(heap, entry)
+        return chosen
+
+    # Choose a pilot of the given rank for a flight, or None if nobody is free. crew lists the pilots already chosen
+    # for the flight
+    def choose(self, rank, departure, arrival, departure_airport, arrival_airport, crew):
+        # Pilots at the departure airport who have become free by now can be chosen
+        waiting = self.waiting.get((rank, departure_airport), [])
+        ready = self.ready.setdefault((rank, departure_airport), {})
+        while waiting and waiting[0][0] <= departure:
+            free_at, version, pilot_id = heapq.heappop(waiting)
+            if version == self.version[pilot_id]:
+                self._make_ready(pilot_id, ready)
+
+        heap_name = "workload"
+        if self.objective == "experience" and rank == "First Officer" and crew:
+            captain_experience = self.pilots[crew[0]][1]
+            heap_name = "senior" if captain_experience < self.average_captain_experience else "junior"
+
+        # Prefer someone already at the airport, then someone who hasn't flown yet
+        for heaps in (ready, self.floating.get(rank, {})):
+            pilot_id = self._take(heaps.get(heap_name, []), arrival, arrival_airport)
+            if pilot_id is not None:
+                return pilot_id
+        return None
+
+
+# Work out Captain and First Officer assignments for every flight departing between start and end (UTC epoch
+# seconds, None for no limit) that is missing one. Cancelled flights aren't staffed. Existing assignments are kept
+# and respected: nobody is given overlapping flights, a pilot only takes off from the airport they last landed at,
+# and there is at least turnaround_minutes between landing and taking off again.
+# Returns (new Flight_Pilot rows as (Flight_ID, Pilot_ID, Role), number of seats left empty)
+def plan_crew(connection, start=None, end=None, turnaround_minutes=DEFAULT_TURNAROUND_MINUTES, objective="workload"):
+    pilots = {pilot_id: (rank, experience) for pilot_id, rank, experience in connection.execute(
+        "SELECT Pilot_ID, Rank, Years_Of_Experience FROM Pilots")}
+    planner = CrewPlanner(pilots, turnaround_minutes, objective)
+    start = flightQueries.FIRST_KEY if start is None else start
+    end = -flightQueries.FIRST_KEY - 1 if end is None else end
+
+    # Existing assignments, in departure order. Those before the window tell us where each pilot is when it
+    # starts; those inside and after it are commitments the new assignments have to fit around
+    crew_by_flight = {}
+    for flight_id, pilot_id, role, departure, arrival, departure_airport, arrival_airport in connection.execute(
+            """SELECT Flight_Pilot.Flight_ID, Flight_Pilot.Pilot_ID, Flight_Pilot.Role, Flights.Departure_UTC,
+                      Flights.Arrival_UTC, Flights.Departure_Airport_IATA, Flights.Arrival_Airport_IATA
+               FROM Flight_Pilot JOIN Flights ON Flights.Flight_ID = Flight_Pilot.Flight_ID
+               WHERE Flights.Departure_UTC IS NOT NULL AND Flights.Arrival_UTC IS NOT NULL
+               ORDER BY Flights.Departure_UTC"""):
+        if pilot_id not in pilots:
+            continue
+        if departure < start:
+            planner.fly(pilot_id, departure, arrival, arrival_airport)
+        else:
+            planner.commit(pilot_id, departure, departure_airport)
+            crew_by_flight.setdefault(flight_id, []).append((pilot_id, role))
+
+    assignments = []
+    unfilled = 0
+    for flight_id, departure, arrival, departure_airport, arrival_airport, status in connection.execute(
+            """SELECT Flight_ID, Departure_UTC, Arrival_UTC, Departure_Airport_IATA, Arrival_Airport_IATA, Flight_Status
+               FROM Flights WHERE Departure_UTC >= ? AND Departure_UTC < ? AND Arrival_UTC IS NOT NULL
+               ORDER BY Departure_UTC""", (start, end)):
+        crew = crew_by_flight.get(flight_id, [])
+        for pilot_id, role in crew:
+            planner.fly_commitment(pilot_id, departure, arrival, arrival_airport)
+        if status == "Cancelled":
+            continue
+
+        chosen = [pilot_id for pilot_id, role in crew]
+        staffed_roles = {role for pilot_id, role in crew}
+        for role in ROLES:
+            if role in staffed_roles:
+                continue
+            pilot_id = planner.choose(role, departure, arrival, departure_airport, arrival_airport, chosen)
+            if pilot_id is None:
+                unfilled += 1
+                continue
+            planner.fly(pilot_id, departure, arrival, arrival_airport)
+            chosen.append(pilot_id)
+            assignments.append((flight_id, pilot_id, role))
+    return assignments, unfilled
+
+
+# Plan crew for the unstaffed flights (see plan_crew()) and save the assignments in one transaction, unless
+# dry_run is set. Returns a summary of what was done
+def staff_flights(connection, start=None, end=None, turnaround_minutes=DEFAULT_TURNAROUND_MINUTES,
+                  objective="workload", dry_run=False):
+    started = time.perf_counter()
+    assignments, unfilled = plan_crew(connection, start, end, turnaround_minutes, objective)
+    planned = time.perf_counter()
+    if assignments and not dry_run:
+        connection.executemany("INSERT INTO Flight_Pilot (Flight_ID, Pilot_ID, Role) VALUES (?, ?, ?)", assignments)
+        connection.commit()
+        flightQueries.notify_write("Flight_Pilot")
+    return {"assigned": len(assignments), "unfilled": unfilled,
+            "pilots_used": len({pilot_id for flight_id, pilot_id, role in assignments}),
+            "planning_seconds": planned - started, "total_seconds": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check pilots' schedules for overlapping flights, or check and "
+                                                 "rebuild the crew scheduling tables, or staff unstaffed flights.")
+    parser.add_argument("command", choices=["audit", "verify", "rebuild", "staff"])
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of conflicts or differences to list")
+    parser.add_argument("--from", dest="start", help="staff: only flights departing at or after this time "
+                                                     "(ISO 8601, UTC unless it has an offset)")
+    parser.add_argument("--to", dest="end", help="staff: only flights departing before this time")
+    parser.add_argument("--turnaround", type=int, default=DEFAULT_TURNAROUND_MINUTES,
+                        help="staff: minimum minutes between a pilot landing and taking off again")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="workload",
+                        help="staff: how to choose between free pilots")
+    parser.add_argument("--dry-run", action="store_true", help="staff: plan the assignments without saving them")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    connection = connect_to_db()
+    try:
+        if args.command == "staff":
+            start = flightQueries.to_utc_epoch(args.start) if args.start else None
+            end = flightQueries.to_utc_epoch(args.end) if args.end else None
+            summary = staff_flights(connection, start, end, args.turnaround, args.objective, args.dry_run)
+            print(f"{'Planned' if args.dry_run else 'Made'} {summary['assigned']} assignments using "
+                  f"{summary['pilots_used']} pilots in {summary['planning_seconds']:.2f}s; "
+                  f"{summary['unfilled']} seats could not be filled.")
+        elif args.command == "rebuild":
+            rebuild_crew_intervals(connection)
+            rebuild_pilot_schedule(connection)
+            print("Crew_Intervals and Pilot_Schedule rebuilt.")
+        elif args.command == "verify":
+            differences = verify_crew_tables(connection)
+            for table, row, problem in differences[:args.limit]:
+                print(f"{table}: {problem} row {row}")
+            if differences:
+                print(f"{len(differences)} rows are out of step - run 'python crewScheduling.py rebuild' to fix them.")
+                raise SystemExit(1)
+            else:
+                print("Crew_Intervals and Pilot_Schedule match the crew assignments.")
+        else:
+            conflicts = audit_crew(connection)
+            for pilot_id, first_flight_id, second_flight_id in conflicts[:args.limit]:
+                print(f"Pilot {pilot_id} is on flights {first_flight_id} and {second_flight_id} at the same time")
+            if conflicts:
+                print(f"{len(conflicts)} scheduling conflicts found.")
+                raise SystemExit(1)
+            else:
+                print("No pilot is assigned to overlapping flights.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta # Use this to format date and time into ISO 8601 and perform date calculations
+from itertools import islice
+from databaseSchema import (create_tables, create_indexes, drop_indexes, create_triggers, drop_triggers,
+                            sync_flight_id_sequence, fill_utc_times, log_reset)
+from crewScheduling import rebuild_crew_intervals, rebuild_pilot_schedule, staff_flights
+from flightCounters import rebuild_counters
+
+# Reference data used by the generator. Airports are fixed, everything else is generated from these lists
+AIRPORTS = [
+    ("JFK", "New York", "USA", "-05:00"),
+    ("LHR", "London", "UK", "+00:00"),
+    ("CDG", "Paris", "France", "+01:00"),
+    ("HND", "Tokyo", "Japan", "+09:00"),
+    ("DXB", "Dubai", "UAE", "+04:00"),
+    ("SYD", "Sydney", "Australia", "+10:00"),
+    ("FRA", "Frankfurt", "Germany", "+01:00"),
+    ("SIN", "Singapore", "Singapore", "+08:00"),
+    ("AMS", "Amsterdam", "Netherlands", "+01:00"),
+    ("HKG", "Hong Kong", "Hong Kong SAR China", "+08:00"),
+    ("LAX", "Los Angeles", "USA", "-08:00"),
+    ("ORD", "Chicago", "USA", "-06:00"),
+    ("GRU", "Sao Paulo", "Brazil", "-03:00"),
+    ("YYZ", "Toronto", "Canada", "-05:00"),
+    ("ICN", "Seoul", "South Korea", "+09:00")
+]
+
+# First departure date when a seed is given without a start, so a seed on its own always gives the same flights
+SEEDED_START = datetime(2025, 1, 1)
+
+# Each airport's offset from UTC. Departure and Arrival are stored in the local time of their airport
+UTC_OFFSETS = {iata: (-1 if offset[0] == "-" else 1) * timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+               for iata, city, country, offset in AIRPORTS}
+
+AIRCRAFT_MODELS = [
+    "Boeing 737", "Airbus A320", "Boeing 777", "Airbus A380", "Boeing 787", "Airbus A350", "Boeing 747",
+    "Airbus A330", "Boeing 767", "Airbus A340", "Boeing 757", "Airbus A321", "Boeing 727", "Airbus A319",
+    "Boeing 737 MAX"
+]
+
+AIRLINES = ["British Airways", "Emirates", "Singapore Airlines"]
+
+FLIGHT_STATUSES = ["On Time", "Delayed", "Cancelled"]
+
+RANKS = ["Captain", "First Officer"]
+
+FIRST_NAMES = ["John", "Jane", "Jim", "Jake", "Jill", "Jack", "Jerry", "Janet", "Jordan", "Jasmine", "Jason",
+               "Jessica", "Jeremy", "Julia", "Jeff"]
+SURNAMES = ["Doe", "Smith", "Brown", "White", "Green", "Black", "Blue", "Yellow", "Purple", "Orange", "Red",
+            "Pink", "Gray"]
+
+
+# Generate aircraft rows one at a time. Registrations follow the N/A prefix + model code + ID pattern
+def generate_aircrafts(rng, count):
+    for aircraft_id in range(1, count + 1):
+        model = AIRCRAFT_MODELS[(aircraft_id - 1) % len(AIRCRAFT_MODELS)]
+        prefix = "N" if model.startswith("Boeing") else "A"
+        code = "".join(character for character in model if character.isdigit())[:3]
+        yield (aircraft_id, model, rng.randint(1, 25), f"{prefix}{code}{aircraft_id:02d}")
+
+
+# Generate pilot rows. Ranks alternate so there are roughly as many Captains as First Officers
+def generate_pilots(rng, count):
+    for pilot_id in range(1, count + 1):
+        name = f"{FIRST_NAMES[(pilot_id - 1) % len(FIRST_NAMES)]} {SURNAMES[(pilot_id - 1) // len(FIRST_NAMES) % len(SURNAMES)]}"
+        rank = RANKS[(pilot_id - 1) % len(RANKS)]
+        # Captains have more experience than First Officers
+        experience = rng.randint(10, 25) if rank == "Captain" else rng.randint(2, 12)
+        yield (pilot_id, name, f"LN{pilot_id:05d}", rank, experience)
+
+
+# Generate flight rows in (UTC) departure order, spread evenly over the given number of days from start (UTC).
+# Each row is a tuple matching the column order of the Flights table, with times in each airport's local time
+def generate_flights(rng, count, aircraft_count, start, days):
+    airport_codes = [airport[0] for airport in AIRPORTS]
+    spacing = days * 24 * 60 / max(count, 1)  # Average minutes between departures
+
+    for index in range(count):
+        flight_id = index + 1
+
+        # Randomly select the flight no, airline, aircraft and airports, making sure departure != arrival
+        flight_number = rng.randint(1000, 9999)
+        airline_name = rng.choice(AIRLINES)
+        aircraft_id = rng.randint(1, aircraft_count)
+        departure_airport = rng.choice(airport_codes)
+        arrival_airport = rng.choice(airport_codes[:airport_codes.index(departure_airport)] +
+                                     airport_codes[airport_codes.index(departure_airport) + 1:])
+
+        # Departures move forward in time with each flight, so rows come out already sorted by departure.
+        # The flight time is added in UTC, then each end is converted to its airport's local time
+        departure_utc = start + timedelta(minutes=int(index * spacing + rng.random() * spacing))
+        arrival_utc = departure_utc + timedelta(hours=rng.randint(2, 12))
+        departure_time = departure_utc + UTC_OFFSETS[departure_airport]
+        arrival_time = arrival_utc + UTC_OFFSETS[arrival_airport]
+
+        flight_status = rng.choice(FLIGHT_STATUSES)
+
+        yield (flight_id, flight_number, airline_name, aircraft_id, departure_time.strftime('%Y-%m-%dT%H:%M'),
+               arrival_time.strftime('%Y-%m-%dT%H:%M'), flight_status, departure_airport, arrival_airport)
+
+
+# Send rows to the database in batches of batch_size using executemany, without building the full list
+def insert_in_batches(cursor, statement, rows, batch_size):
+    inserted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return inserted
+        cursor.executemany(statement, batch)
+        inserted += len(batch)
+
+
+# Replace the contents of the database with generated data. The reference data and flights are written inside a
+# single transaction, with the secondary indexes and triggers dropped during the load, then crew are assigned by the
+# crew optimizer and everything the triggers maintain is rebuilt at the end.
+# Passing the same seed always produces the same data. start defaults to SEEDED_START when there is a seed and to
+# tomorrow when there isn't
+def generate(connection, flights=15, aircrafts=15, pilots=15, seed=None, batch_size=10000, start=None, days=30):
+    rng = random.Random(seed)
+    if start is None and seed is not None:
+        start = SEEDED_START
+    elif start is None:
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    create_tables(connection)
+    drop_indexes(connection)
+    drop_triggers(connection)
+
+    cursor = connection.cursor()
+    cursor.execute("BEGIN")
+    try:
+        # Clear out previously generated data so crew assignments can't point at old flights
+        for table in ["Flight_Pilot", "Flights", "Pilots", "Aircrafts"]:
+            cursor.execute(f"DELETE FROM {table}")
+
+        cursor.executemany("INSERT OR REPLACE INTO Airports VALUES (?, ?, ?, ?)", AIRPORTS)
+        insert_in_batches(cursor, "INSERT INTO Aircrafts VALUES (?, ?, ?, ?)",
+                          generate_aircrafts(rng, aircrafts), batch_size)
+        insert_in_batches(cursor, "INSERT INTO Pilots VALUES (?, ?, ?, ?, ?)",
+                          generate_pilots(rng, pilots), batch_size)
+
+        flight_count = insert_in_batches(
+            cursor, "INSERT INTO Flights (Flight_ID, Flight_Number, Airline_Name, Aircraft_ID, Departure, Arrival, "
+                    "Flight_Status, Departure_Airport_IATA, Arrival_Airport_IATA) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            generate_flights(rng, flights, aircrafts, start, days), batch_size)
+
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Crew are assigned by the optimizer once the UTC times it plans with have been filled in
+    fill_utc_times(connection)
+    create_indexes(connection)
+    crew_count = staff_flights(connection)["assigned"]
+    rebuild_counters(connection)
+    rebuild_crew_intervals(connection)
+    rebuild_pilot_schedule(connection)
+    sync_flight_id_sequence(connection)
+    create_triggers(connection)
+    log_reset(connection, ["Flights", "Flight_Pilot"])
+    return {"flights": flight_count, "crew_assignments": crew_count, "aircrafts": aircrafts, "pilots": pilots}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a database with generated flights, aircraft, pilots and crew.")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to populate")
+    parser.add_argument("--flights", type=int, default=15, help="Number of flights to generate")
+    parser.add_argument("--aircrafts", type=int, default=15, help="Number of aircraft to generate")
+    parser.add_argument("--pilots", type=int, default=15, help="Number of pilots to generate")
+    parser.add_argument("--seed", type=int, help="Random seed - the same seed always produces the same data")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows sent to the database per executemany call")
+    parser.add_argument("--start", help="First departure date (YYYY-MM-DD), defaults to "
+                                        f"{SEEDED_START:%Y-%m-%d} with --seed and tomorrow without")
+    parser.add_argument("--days", type=int, default=30, help="Number of days the flights are spread over")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+
+    connection = sqlite3.connect(args.database)
+    # The data is regenerated from scratch if anything goes wrong, so durability can be traded for load speed
+    connection.execute("PRAGMA synchronous = OFF")
+    began = time.perf_counter()
+    counts = generate(connection, flights=args.flights, aircrafts=args.aircrafts, pilots=args.pilots,
+                      seed=args.seed, batch_size=args.batch_size, start=start, days=args.days)
+    elapsed = time.perf_counter() - began
+    connection.close()
+
+    print(f"Generated {counts['flights']} flights, {counts['crew_assignments']} crew assignments, "
+          f"{counts['aircrafts']} aircraft and {counts['pilots']} pilots in {elapsed:.1f}s "
+          f"({counts['flights'] / max(elapsed, 1e-9):,.0f} flights/s)")
+
+
+if __name__ == "__main__":
+    main()
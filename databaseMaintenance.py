@@ -0,0 +1,67 @@
+import argparse
+import os
+from connectionPool import configure_pool, connect_to_db, STORAGE_PROFILES, DEFAULT_PROFILE
+
+# Storage maintenance commands: show how the database is stored and control the size of the WAL file.
+# In WAL mode new commits are appended to FlightManagement.db-wal and copied back into the main file by a
+# checkpoint. SQLite checkpoints automatically (wal_autocheckpoint), but a checkpoint can't finish while a reader
+# is still using old data, so under constant reads the WAL file can keep growing - run a checkpoint to fix that
+
+CHECKPOINT_MODES = ["PASSIVE", "FULL", "RESTART", "TRUNCATE"]
+
+
+# Size in bytes of the WAL file for a database, or 0 if there isn't one
+def wal_size(database):
+    path = database + "-wal"
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+# Run a checkpoint and return (busy, WAL pages, pages checkpointed).
+#  - PASSIVE copies what it can without waiting for readers or writers
+#  - FULL waits for writers and then copies everything
+#  - RESTART also waits for readers so the next writer starts the WAL file from the beginning
+#  - TRUNCATE is RESTART and then shrinks the WAL file to zero bytes
+def checkpoint(connection, mode="PASSIVE"):
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode {mode!r}. Choose from {', '.join(CHECKPOINT_MODES)}.")
+    return connection.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+# The storage settings currently in force on a connection
+def storage_status(connection):
+    status = {}
+    for setting in ["journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout",
+                    "wal_autocheckpoint", "journal_size_limit", "page_size", "page_count", "freelist_count"]:
+        status[setting] = connection.execute(f"PRAGMA {setting}").fetchone()[0]
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show storage settings or checkpoint the WAL file.")
+    parser.add_argument("command", choices=["status", "checkpoint"])
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--profile", choices=list(STORAGE_PROFILES), default=DEFAULT_PROFILE,
+                        help="Storage profile to open the database with")
+    parser.add_argument("--mode", choices=CHECKPOINT_MODES, default="TRUNCATE", help="Checkpoint mode")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database, size=1, profile=args.profile)
+    connection = connect_to_db()
+    try:
+        if args.command == "status":
+            for setting, value in storage_status(connection).items():
+                print(f"{setting:<20} {value}")
+            print(f"{'wal_file_bytes':<20} {wal_size(args.database)}")
+        else:
+            before = wal_size(args.database)
+            busy, wal_pages, checkpointed = checkpoint(connection, args.mode)
+            print(f"{args.mode} checkpoint: {checkpointed} of {wal_pages} WAL pages copied into the database"
+                  f"{' (blocked by another connection, try again later)' if busy else ''}. "
+                  f"WAL file {before} -> {wal_size(args.database)} bytes.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+import sqlite3
+from crewScheduling import SCHEDULE_ROWS, rebuild_crew_intervals, rebuild_pilot_schedule
+from flightCounters import rebuild_counters
+
+# Table definitions for the database (refer to ER diagram for entity structure and relations).
+# Primary and foreign keys are set up here too. Each statement uses IF NOT EXISTS so running it against an
+# existing database is harmless
+TABLES = [
+    """
+CREATE TABLE IF NOT EXISTS Flights (
+    Flight_ID INTEGER PRIMARY KEY,
+    Flight_Number INTEGER NOT NULL,
+    Airline_Name TEXT NOT NULL,
+    Aircraft_ID INTEGER NOT NULL,
+    Departure TEXT NOT NULL,
+    Arrival TEXT NOT NULL,
+    Flight_Status TEXT NOT NULL,
+    Departure_Airport_IATA TEXT NOT NULL,
+    Arrival_Airport_IATA TEXT NOT NULL,
+    FOREIGN KEY(Aircraft_ID) REFERENCES Aircrafts(Aircraft_ID),
+    FOREIGN KEY(Departure_Airport_IATA) REFERENCES Airport(Airport_IATA),
+    FOREIGN KEY(Arrival_Airport_IATA) REFERENCES Airport(Airport_IATA)
+)
+""",
+    """
+CREATE TABLE IF NOT EXISTS Aircrafts (
+    Aircraft_ID INTEGER PRIMARY KEY,
+    Aircraft_Model TEXT NOT NULL,
+    Age INTEGER NOT NULL,
+    Registration_Number INTEGER
+)
+""",
+    """
+CREATE TABLE IF NOT EXISTS Airports (
+    Airport_IATA TEXT PRIMARY KEY,
+    City TEXT NOT NULL,
+    Country TEXT NOT NULL,
+    Timezone TEXT NOT NULL
+)
+""",
+    # This table has a composite primary key
+    """
+CREATE TABLE IF NOT EXISTS Flight_Pilot (
+    Flight_ID INTEGER,
+    Pilot_ID INTEGER,
+    Role TEXT NOT NULL,
+    PRIMARY KEY(Flight_ID, Pilot_ID)
+)
+""",
+    """
+CREATE TABLE IF NOT EXISTS Pilots (
+    Pilot_ID INTEGER PRIMARY KEY,
+    Full_Name TEXT NOT NULL,
+    Licence_Number INTEGER NOT NULL,
+    Rank TEXT NOT NULL,
+    Years_Of_Experience INTEGER NOT NULL
+)
+""",
+    # Summary tables holding the number of flights departing from and arriving at each airport, in total and per
+    # Flight_Status. They are kept up to date by the triggers below, so counting flights for an airport is a
+    # single primary key lookup instead of a scan of Flights. WITHOUT ROWID stores each row in the primary key itself
+    """
+CREATE TABLE IF NOT EXISTS Airport_Flight_Counts (
+    Airport_IATA TEXT PRIMARY KEY,
+    Departures INTEGER NOT NULL DEFAULT 0,
+    Arrivals INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+""",
+    """
+CREATE TABLE IF NOT EXISTS Airport_Status_Counts (
+    Airport_IATA TEXT,
+    Flight_Status TEXT,
+    Departures INTEGER NOT NULL DEFAULT 0,
+    Arrivals INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(Airport_IATA, Flight_Status)
+) WITHOUT ROWID
+""",
+    # The next Flight_ID to hand out. New flights take their ID from here inside the INSERT itself, and bulk loads
+    # reserve whole blocks by moving Next_ID on, so concurrent writers can never be given the same ID.
+    # IDs are never reused, even after the flight with the highest ID is removed
+    """
+CREATE TABLE IF NOT EXISTS Flight_ID_Sequence (
+    Next_ID INTEGER NOT NULL
+)
+""",
+    # Every pilot's flights as (Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID), kept in step with Flight_Pilot and
+    # Flights by the triggers below. The primary key keeps each pilot's flights sorted by departure, so finding the
+    # flights that overlap a time window is a short range scan however many flights the pilot has
+    """
+CREATE TABLE IF NOT EXISTS Crew_Intervals (
+    Pilot_ID INTEGER NOT NULL,
+    Departure_UTC INTEGER NOT NULL,
+    Arrival_UTC INTEGER NOT NULL,
+    Flight_ID INTEGER NOT NULL,
+    PRIMARY KEY(Pilot_ID, Departure_UTC, Flight_ID)
+) WITHOUT ROWID
+""",
+    # Every pilot's schedule, already joined: one row per crew assignment with the pilot's name and the flight's
+    # details, in the column order of flightQueries.SCHEDULE_COLUMNS. Triggers keep it in step with Flight_Pilot,
+    # Flights and Pilots, so schedules are read straight from the primary key in (Pilot_ID, Flight_ID) order
+    # instead of joining three tables on every view
+    """
+CREATE TABLE IF NOT EXISTS Pilot_Schedule (
+    Pilot_ID INTEGER NOT NULL,
+    Full_Name TEXT NOT NULL,
+    Flight_ID INTEGER NOT NULL,
+    Flight_Number INTEGER NOT NULL,
+    Departure TEXT NOT NULL,
+    Arrival TEXT NOT NULL,
+    Flight_Status TEXT NOT NULL,
+    Departure_Airport_IATA TEXT NOT NULL,
+    Arrival_Airport_IATA TEXT NOT NULL,
+    PRIMARY KEY(Pilot_ID, Flight_ID)
+) WITHOUT ROWID
+""",
+    # Every insert, update and delete on Flights and Flight_Pilot, written by the triggers below in the same
+    # transaction as the change itself. AUTOINCREMENT means Sequence only ever goes up and is never reused, even
+    # after old changes are pruned, so consumers can read "everything after the last Sequence I saw" (see
+    # changeLog.py). Flight_ID and Pilot_ID identify the row changed; Old_Row and New_Row are the row before and after
+    # as JSON objects. A 'reset' change means the table was rewritten without the triggers, so consumers must re-read it
+    """
+CREATE TABLE IF NOT EXISTS Change_Log (
+    Sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+    Table_Name TEXT NOT NULL,
+    Operation TEXT NOT NULL,
+    Flight_ID INTEGER,
+    Pilot_ID INTEGER,
+    Old_Row TEXT,
+    New_Row TEXT,
+    Changed_At TEXT NOT NULL
+)
+""",
+    # How far each import file has got. Updated in the same transaction as each chunk of imported rows,
+    # so an interrupted import can carry on from exactly where it stopped
+    """
+CREATE TABLE IF NOT EXISTS Import_Progress (
+    Source TEXT PRIMARY KEY,
+    Line INTEGER NOT NULL,
+    Imported INTEGER NOT NULL,
+    Rejected INTEGER NOT NULL
+)
+"""
+]
+
+# Columns added to existing tables after they were first created, as (table, column, definition). They are added
+# with ALTER TABLE to databases that don't have them yet, so they always come after the original columns
+ADDED_COLUMNS = [
+    # Departure and Arrival as seconds since 1970-01-01 UTC, worked out from the local times and the airports'
+    # Timezone offsets by the triggers below. Unlike the local times these sort and compare correctly across
+    # timezones, so time windows across every airport are a single index range scan
+    ("Flights", "Departure_UTC", "INTEGER"),
+    ("Flights", "Arrival_UTC", "INTEGER")
+]
+
+# Expressions turning a flight's local Departure/Arrival into UTC epoch seconds. SQLite's date functions accept a
+# "+09:00" style offset after the time. ROW is NEW inside the triggers and Flights when backfilling
+_UTC_TIME = ("CAST(strftime('%s', ROW.{time} || (SELECT Timezone FROM Airports "
+             "WHERE Airports.Airport_IATA = ROW.{airport})) AS INTEGER)")
+_SET_UTC_TIMES = (f"Departure_UTC = {_UTC_TIME.format(time='Departure', airport='Departure_Airport_IATA')}, "
+                  f"Arrival_UTC = {_UTC_TIME.format(time='Arrival', airport='Arrival_Airport_IATA')}")
+
+
+def _set_utc_times(row):
+    return _SET_UTC_TIMES.replace("ROW.", f"{row}.")
+
+
+# Pilot_Schedule rows for the crew assignments picked out by a WHERE clause added to the end
+_INSERT_SCHEDULE_ROWS = f"INSERT OR REPLACE INTO Pilot_Schedule {SCHEDULE_ROWS}"
+
+
+# Statements adding (change = +1) or removing (change = -1) one flight from the airport counters, for use inside
+# the triggers. ROW is NEW or OLD depending on whether the flight is being added or removed
+_COUNTER_CHANGES = """
+    INSERT INTO Airport_Flight_Counts (Airport_IATA, Departures) VALUES (ROW.Departure_Airport_IATA, CHANGE)
+        ON CONFLICT(Airport_IATA) DO UPDATE SET Departures = Departures + CHANGE;
+    INSERT INTO Airport_Flight_Counts (Airport_IATA, Arrivals) VALUES (ROW.Arrival_Airport_IATA, CHANGE)
+        ON CONFLICT(Airport_IATA) DO UPDATE SET Arrivals = Arrivals + CHANGE;
+    INSERT INTO Airport_Status_Counts (Airport_IATA, Flight_Status, Departures) VALUES (ROW.Departure_Airport_IATA, ROW.Flight_Status, CHANGE)
+        ON CONFLICT(Airport_IATA, Flight_Status) DO UPDATE SET Departures = Departures + CHANGE;
+    INSERT INTO Airport_Status_Counts (Airport_IATA, Flight_Status, Arrivals) VALUES (ROW.Arrival_Airport_IATA, ROW.Flight_Status, CHANGE)
+        ON CONFLICT(Airport_IATA, Flight_Status) DO UPDATE SET Arrivals = Arrivals + CHANGE;
+"""
+
+
+def _counter_changes(row, change):
+    return _COUNTER_CHANGES.replace("ROW.", f"{row}.").replace("CHANGE", change)
+
+
+# Columns of each table recorded in Change_Log. Flights' UTC times are left out: they are worked out from the
+# other columns, and recording them would log every new flight twice (once more when its UTC times are filled in)
+_LOGGED_COLUMNS = {
+    "Flights": ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", "Departure", "Arrival", "Flight_Status",
+                "Departure_Airport_IATA", "Arrival_Airport_IATA"],
+    "Flight_Pilot": ["Flight_ID", "Pilot_ID", "Role"]
+}
+_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+
+# A statement adding one change to Change_Log. old and new are OLD and/or NEW, or None where there is no such row
+def _log_change(table, operation, old, new):
+    def row_json(row):
+        if row is None:
+            return "NULL"
+        return "json_object(" + ", ".join(f"'{column}', {row}.{column}" for column in _LOGGED_COLUMNS[table]) + ")"
+
+    key_row = new or old
+    pilot_id = f"{key_row}.Pilot_ID" if table == "Flight_Pilot" else "NULL"
+    return ("INSERT INTO Change_Log (Table_Name, Operation, Flight_ID, Pilot_ID, Old_Row, New_Row, Changed_At) "
+            f"VALUES ('{table}', '{operation}', {key_row}.Flight_ID, {pilot_id}, {row_json(old)}, {row_json(new)}, "
+            f"{_NOW});")
+
+
+# Change_Log triggers for a table. Updates are only recorded when a logged column actually changes value
+def _change_log_triggers(table, name):
+    columns = _LOGGED_COLUMNS[table]
+    changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+    return [
+        (f"trg_change_log_{name}_insert",
+         f"AFTER INSERT ON {table} BEGIN {_log_change(table, 'insert', None, 'NEW')} END"),
+        (f"trg_change_log_{name}_update",
+         f"AFTER UPDATE OF {', '.join(columns)} ON {table} WHEN {changed} "
+         f"BEGIN {_log_change(table, 'update', 'OLD', 'NEW')} END"),
+        (f"trg_change_log_{name}_delete",
+         f"AFTER DELETE ON {table} BEGIN {_log_change(table, 'delete', 'OLD', None)} END")
+    ]
+
+
+# Triggers keeping the summary tables in step with Flights, as (trigger name, definition).
+# The update trigger only fires when a column the counters depend on changes
+TRIGGERS = [
+    ("trg_flights_count_insert", f"AFTER INSERT ON Flights BEGIN {_counter_changes('NEW', '1')} END"),
+    ("trg_flights_count_delete", f"AFTER DELETE ON Flights BEGIN {_counter_changes('OLD', '-1')} END"),
+    ("trg_flights_count_update",
+     "AFTER UPDATE OF Flight_Status, Departure_Airport_IATA, Arrival_Airport_IATA ON Flights "
+     f"BEGIN {_counter_changes('OLD', '-1')} {_counter_changes('NEW', '1')} END"),
+    # Flights inserted with an ID chosen elsewhere (e.g. imports that include Flight_ID), or given a new ID by an
+    # update, push the sequence past that ID so it is never handed out again
+    ("trg_flights_id_sequence",
+     "AFTER INSERT ON Flights BEGIN "
+     "UPDATE Flight_ID_Sequence SET Next_ID = NEW.Flight_ID + 1 WHERE Next_ID <= NEW.Flight_ID; END"),
+    ("trg_flights_id_sequence_update",
+     "AFTER UPDATE OF Flight_ID ON Flights BEGIN "
+     "UPDATE Flight_ID_Sequence SET Next_ID = NEW.Flight_ID + 1 WHERE Next_ID <= NEW.Flight_ID; END"),
+    # Work out the UTC times when a flight is added or its times or airports change, and for every flight at an
+    # airport whose Timezone changes
+    ("trg_flights_utc_insert",
+     f"AFTER INSERT ON Flights BEGIN UPDATE Flights SET {_set_utc_times('NEW')} WHERE Flight_ID = NEW.Flight_ID; END"),
+    ("trg_flights_utc_update",
+     "AFTER UPDATE OF Departure, Arrival, Departure_Airport_IATA, Arrival_Airport_IATA ON Flights "
+     f"BEGIN UPDATE Flights SET {_set_utc_times('NEW')} WHERE Flight_ID = NEW.Flight_ID; END"),
+    ("trg_airports_utc_update",
+     "AFTER UPDATE OF Timezone ON Airports "
+     f"BEGIN UPDATE Flights SET {_set_utc_times('Flights')} "
+     "WHERE Departure_Airport_IATA = NEW.Airport_IATA OR Arrival_Airport_IATA = NEW.Airport_IATA; END"),
+    # Keep Crew_Intervals in step with crew assignments and flight times. Flights without UTC times (their airport
+    # isn't in Airports) can't be placed in time so they are left out. Each statement finds its rows through the
+    # Crew_Intervals primary key, using Flight_Pilot to find the pilots on a flight
+    ("trg_crew_intervals_assign",
+     "AFTER INSERT ON Flight_Pilot BEGIN "
+     "INSERT OR IGNORE INTO Crew_Intervals (Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID) "
+     "SELECT NEW.Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID FROM Flights "
+     "WHERE Flight_ID = NEW.Flight_ID AND Departure_UTC IS NOT NULL AND Arrival_UTC IS NOT NULL; END"),
+    ("trg_crew_intervals_unassign",
+     "AFTER DELETE ON Flight_Pilot BEGIN "
+     "DELETE FROM Crew_Intervals WHERE Pilot_ID = OLD.Pilot_ID AND Flight_ID = OLD.Flight_ID "
+     "AND Departure_UTC = (SELECT Departure_UTC FROM Flights WHERE Flight_ID = OLD.Flight_ID); END"),
+    ("trg_crew_intervals_flight_delete",
+     "AFTER DELETE ON Flights BEGIN "
+     "DELETE FROM Crew_Intervals WHERE Pilot_ID IN (SELECT Pilot_ID FROM Flight_Pilot WHERE Flight_ID = OLD.Flight_ID) "
+     "AND Departure_UTC = OLD.Departure_UTC AND Flight_ID = OLD.Flight_ID; END"),
+    ("trg_crew_intervals_flight_times",
+     "AFTER UPDATE OF Flight_ID, Departure_UTC, Arrival_UTC ON Flights BEGIN "
+     "DELETE FROM Crew_Intervals WHERE Pilot_ID IN (SELECT Pilot_ID FROM Flight_Pilot WHERE Flight_ID = OLD.Flight_ID) "
+     "AND Departure_UTC = OLD.Departure_UTC AND Flight_ID = OLD.Flight_ID; "
+     "INSERT OR IGNORE INTO Crew_Intervals (Pilot_ID, Departure_UTC, Arrival_UTC, Flight_ID) "
+     "SELECT Pilot_ID, NEW.Departure_UTC, NEW.Arrival_UTC, NEW.Flight_ID FROM Flight_Pilot "
+     "WHERE Flight_ID = NEW.Flight_ID AND NEW.Departure_UTC IS NOT NULL AND NEW.Arrival_UTC IS NOT NULL; END"),
+    # Keep Pilot_Schedule in step. A changed flight has its schedule rows replaced for every pilot on it
+    ("trg_pilot_schedule_assign",
+     f"AFTER INSERT ON Flight_Pilot BEGIN {_INSERT_SCHEDULE_ROWS} "
+     "WHERE Flight_Pilot.Flight_ID = NEW.Flight_ID AND Flight_Pilot.Pilot_ID = NEW.Pilot_ID; END"),
+    ("trg_pilot_schedule_unassign",
+     "AFTER DELETE ON Flight_Pilot BEGIN "
+     "DELETE FROM Pilot_Schedule WHERE Pilot_ID = OLD.Pilot_ID AND Flight_ID = OLD.Flight_ID; END"),
+    ("trg_pilot_schedule_flight_update",
+     "AFTER UPDATE OF Flight_ID, Flight_Number, Departure, Arrival, Flight_Status, Departure_Airport_IATA, "
+     "Arrival_Airport_IATA ON Flights BEGIN "
+     "DELETE FROM Pilot_Schedule WHERE Pilot_ID IN (SELECT Pilot_ID FROM Flight_Pilot WHERE Flight_ID = OLD.Flight_ID) "
+     "AND Flight_ID = OLD.Flight_ID; "
+     f"{_INSERT_SCHEDULE_ROWS} WHERE Flight_Pilot.Flight_ID = NEW.Flight_ID; END"),
+    ("trg_pilot_schedule_flight_delete",
+     "AFTER DELETE ON Flights BEGIN "
+     "DELETE FROM Pilot_Schedule WHERE Pilot_ID IN (SELECT Pilot_ID FROM Flight_Pilot WHERE Flight_ID = OLD.Flight_ID) "
+     "AND Flight_ID = OLD.Flight_ID; END"),
+    ("trg_pilot_schedule_pilot_update",
+     "AFTER UPDATE OF Full_Name ON Pilots BEGIN "
+     "UPDATE Pilot_Schedule SET Full_Name = NEW.Full_Name WHERE Pilot_ID = NEW.Pilot_ID; END"),
+    ("trg_pilot_schedule_pilot_delete",
+     "AFTER DELETE ON Pilots BEGIN DELETE FROM Pilot_Schedule WHERE Pilot_ID = OLD.Pilot_ID; END")
+] + _change_log_triggers("Flights", "flight") + _change_log_triggers("Flight_Pilot", "crew")
+
+# Secondary indexes for the columns the application filters and joins on, as (index name, table(columns)).
+# Without these every lookup by destination, origin, departure time or status is a full scan of Flights.
+# The composite indexes put an equality column first and a time second, so flight searches that combine the two
+# (e.g. "flights out of DXB next week") read only the matching range, already sorted by time. Each one also serves
+# plain lookups on its first column
+INDEXES = [
+    # Used by view_destination_info and number_of_flights_to_destination
+    ("idx_flights_arrival_airport_time", "Flights(Arrival_Airport_IATA, Arrival)"),
+    ("idx_flights_departure_airport_time", "Flights(Departure_Airport_IATA, Departure)"),
+    ("idx_flights_airline_departure", "Flights(Airline_Name, Departure)"),
+    ("idx_flights_status_departure", "Flights(Flight_Status, Departure)"),
+    ("idx_flights_departure", "Flights(Departure)"),
+    # Time windows across all airports, e.g. departures_between()
+    ("idx_flights_departure_utc", "Flights(Departure_UTC)"),
+    ("idx_flights_arrival_utc", "Flights(Arrival_UTC)")
+]
+
+# Indexes that have been replaced by one of the above and are dropped if an older database still has them
+# (idx_flight_pilot_schedule served pilot schedules, which are now read from Pilot_Schedule)
+OBSOLETE_INDEXES = ["idx_flight_pilot_pilot", "idx_flights_arrival_airport", "idx_flights_departure_airport",
+                    "idx_flights_status", "idx_flight_pilot_schedule"]
+
+
+# Create any missing tables, and add any missing columns to existing ones
+def create_tables(connection):
+    cursor = connection.cursor()
+    for statement in TABLES:
+        cursor.execute(statement)
+    for table, column, definition in ADDED_COLUMNS:
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    connection.commit()
+    cursor.close()
+
+
+# Create any missing secondary indexes
+def create_indexes(connection):
+    cursor = connection.cursor()
+    for name in OBSOLETE_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, definition in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    connection.commit()
+    # Gather statistics if any index doesn't have them yet, so the query planner can tell which of several indexes
+    # is the most selective for a search. analysis_limit keeps ANALYZE quick on large tables
+    analysed = set()
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        analysed = {name for (name,) in cursor.execute("SELECT idx FROM sqlite_stat1")}
+    if any(name not in analysed for name, definition in INDEXES):
+        cursor.execute("PRAGMA analysis_limit = 1000")
+        cursor.execute("ANALYZE")
+        connection.commit()
+    cursor.close()
+
+
+# Drop the secondary indexes. Bulk loads are much faster if the indexes are built once afterwards
+# rather than updated for every inserted row
+def drop_indexes(connection):
+    cursor = connection.cursor()
+    for name, definition in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    connection.commit()
+    cursor.close()
+
+
+# Create any missing triggers, and replace any whose definition has changed
+def create_triggers(connection):
+    cursor = connection.cursor()
+    existing = dict(cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"))
+    for name, definition in TRIGGERS:
+        # A trigger whose definition has changed since it was created is replaced with the new one
+        if name in existing and existing[name] != f"CREATE TRIGGER {name} {definition}":
+            cursor.execute(f"DROP TRIGGER {name}")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {definition}")
+    connection.commit()
+    cursor.close()
+
+
+# Drop the triggers, e.g. so a bulk load doesn't pay for them on every row. Anything they maintain must be
+# rebuilt afterwards
+def drop_triggers(connection):
+    cursor = connection.cursor()
+    for name, definition in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    connection.commit()
+    cursor.close()
+
+
+# Make sure the Flight_ID sequence exists and is ahead of every Flight_ID in the table. Needed after loading
+# flights with the triggers dropped; otherwise the trigger above keeps it ahead
+def sync_flight_id_sequence(connection):
+    next_id = connection.execute("SELECT COALESCE(MAX(Flight_ID), 0) + 1 FROM Flights").fetchone()[0]
+    if connection.execute("SELECT 1 FROM Flight_ID_Sequence").fetchone() is None:
+        connection.execute("INSERT INTO Flight_ID_Sequence (Next_ID) VALUES (?)", (next_id,))
+    else:
+        connection.execute("UPDATE Flight_ID_Sequence SET Next_ID = ? WHERE Next_ID < ?", (next_id, next_id))
+    connection.commit()
+
+
+# Work out Departure_UTC and Arrival_UTC for flights that don't have them yet, e.g. when the columns have just been
+# added to an existing database or after loading flights with the triggers dropped. Pass everything=True to
+# recalculate every flight. Returns the number of flights updated
+def fill_utc_times(connection, everything=False):
+    condition = "" if everything else " WHERE Departure_UTC IS NULL OR Arrival_UTC IS NULL"
+    updated = connection.execute(f"UPDATE Flights SET {_set_utc_times('Flights')}{condition}").rowcount
+    connection.commit()
+    return updated
+
+
+# Record in Change_Log that tables were rewritten with the triggers dropped (e.g. by the data generator), so
+# anything following the log knows to re-read them
+def log_reset(connection, tables):
+    connection.executemany(f"INSERT INTO Change_Log (Table_Name, Operation, Changed_At) VALUES (?, 'reset', {_NOW})",
+                           [(table,) for table in tables])
+    connection.commit()
+
+
+# Create any missing tables, indexes and triggers. Safe to call every time the application starts.
+# The airport counters, crew intervals and pilot schedules are filled in the first time they are created on a database that already
+# has flights
+def create_schema(connection):
+    create_tables(connection)
+    create_indexes(connection)
+    create_triggers(connection)
+    sync_flight_id_sequence(connection)
+    fill_utc_times(connection)
+    if connection.execute("SELECT 1 FROM Airport_Flight_Counts LIMIT 1").fetchone() is None:
+        rebuild_counters(connection)
+    if connection.execute("SELECT 1 FROM Crew_Intervals LIMIT 1").fetchone() is None:
+        rebuild_crew_intervals(connection)
+    if connection.execute("SELECT 1 FROM Pilot_Schedule LIMIT 1").fetchone() is None:
+        rebuild_pilot_schedule(connection)
+
+
+# Allows the schema to be created on its own with "python databaseSchema.py"
+if __name__ == "__main__":
+    connection = sqlite3.connect("FlightManagement.db")
+    create_schema(connection)
+    connection.close()
+    print("Schema and indexes created.")
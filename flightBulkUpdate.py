@@ -0,0 +1,54 @@
+import argparse
+import csv
+import time
+from collections import Counter
+from connectionPool import configure_pool
+from flightImport import read_records
+import flightQueries
+
+# Apply a file of flight changes in one transaction, e.g. a batch of status changes during disruption.
+# Each row of the CSV or JSON Lines file has Flight_ID, Column and Value. With --column, rows only need
+# Flight_ID and Value, e.g. --column Flight_Status for a file of status updates
+
+
+# Turn the records from the file into (Flight_ID, column, value) changes
+def read_changes(path, file_format=None, column=None):
+    changes = []
+    lines = []
+    for line_number, record in read_records(path, file_format):
+        record = record or {}
+        changes.append((record.get("Flight_ID"), column or record.get("Column"), record.get("Value")))
+        lines.append(line_number)
+    return lines, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply many flight updates in a single transaction.")
+    parser.add_argument("path", help="CSV or JSON Lines file of changes")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="File format (worked out from the extension if not given)")
+    parser.add_argument("--column", help="Column every change applies to, if the file has no Column field")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to update")
+    parser.add_argument("--outcomes", help="CSV file to write the outcome of every change to")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    lines, changes = read_changes(args.path, args.format, args.column)
+
+    started = time.perf_counter()
+    outcomes = flightQueries.update_flights(changes)
+    elapsed = time.perf_counter() - started
+
+    if args.outcomes:
+        with open(args.outcomes, "w", newline="") as outcomes_file:
+            writer = csv.writer(outcomes_file)
+            writer.writerow(["Line", "Flight_ID", "Column", "Outcome"])
+            for line_number, (flight_id, column, value), outcome in zip(lines, changes, outcomes):
+                writer.writerow([line_number, flight_id, column, outcome])
+
+    print(f"Processed {len(changes)} changes in {elapsed:.2f}s:")
+    for outcome, count in Counter(outcomes).most_common():
+        print(f" - {count} {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+from connectionPool import configure_pool, connect_to_db
+
+# Rebuild and consistency checks for the per-airport flight counters (Airport_Flight_Counts and
+# Airport_Status_Counts). The counters are normally maintained by triggers on Flights - see databaseSchema.py
+
+# The counters worked out from scratch from Flights: one row per (airport, status) with departures and arrivals
+EXPECTED_STATUS_COUNTS_QUERY = """
+    SELECT Airport_IATA, Flight_Status, SUM(Departures), SUM(Arrivals) FROM (
+        SELECT Departure_Airport_IATA AS Airport_IATA, Flight_Status, 1 AS Departures, 0 AS Arrivals FROM Flights
+        UNION ALL
+        SELECT Arrival_Airport_IATA, Flight_Status, 0, 1 FROM Flights
+    )
+    GROUP BY Airport_IATA, Flight_Status"""
+
+
+# Throw away the counters and recalculate them from Flights in one transaction
+def rebuild_counters(connection):
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM Airport_Status_Counts")
+    cursor.execute("DELETE FROM Airport_Flight_Counts")
+    cursor.execute(f"INSERT INTO Airport_Status_Counts (Airport_IATA, Flight_Status, Departures, Arrivals) "
+                   f"{EXPECTED_STATUS_COUNTS_QUERY}")
+    # Per-airport totals are the sum of the per-status counts
+    cursor.execute("""INSERT INTO Airport_Flight_Counts (Airport_IATA, Departures, Arrivals)
+                      SELECT Airport_IATA, SUM(Departures), SUM(Arrivals) FROM Airport_Status_Counts
+                      GROUP BY Airport_IATA""")
+    connection.commit()
+    cursor.close()
+
+
+# Compare the stored counters with the ones worked out from Flights. Returns a list of
+# (table, key, stored (departures, arrivals), expected (departures, arrivals)) for every difference.
+# Rows whose counts have dropped to zero are treated the same as missing rows
+def verify_counters(connection):
+    expected_status = {}
+    expected_totals = {}
+    for airport, status, departures, arrivals in connection.execute(EXPECTED_STATUS_COUNTS_QUERY):
+        expected_status[(airport, status)] = (departures, arrivals)
+        total = expected_totals.get(airport, (0, 0))
+        expected_totals[airport] = (total[0] + departures, total[1] + arrivals)
+
+    stored_status = {(airport, status): (departures, arrivals) for airport, status, departures, arrivals
+                     in connection.execute("SELECT Airport_IATA, Flight_Status, Departures, Arrivals FROM Airport_Status_Counts")}
+    stored_totals = {airport: (departures, arrivals) for airport, departures, arrivals
+                     in connection.execute("SELECT Airport_IATA, Departures, Arrivals FROM Airport_Flight_Counts")}
+
+    differences = []
+    for table, stored, expected in [("Airport_Status_Counts", stored_status, expected_status),
+                                    ("Airport_Flight_Counts", stored_totals, expected_totals)]:
+        for key in sorted(set(stored) | set(expected), key=str):
+            stored_counts = stored.get(key, (0, 0))
+            expected_counts = expected.get(key, (0, 0))
+            if stored_counts != expected_counts:
+                differences.append((table, key, stored_counts, expected_counts))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or check the per-airport flight counters.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    connection = connect_to_db()
+    try:
+        if args.command == "rebuild":
+            rebuild_counters(connection)
+            print("Airport flight counters rebuilt.")
+        else:
+            differences = verify_counters(connection)
+            for table, key, stored, expected in differences:
+                print(f"{table} {key}: stored departures/arrivals {stored}, expected {expected}")
+            if differences:
+                print(f"{len(differences)} counters are out of step - run 'python flightCounters.py rebuild' to fix them.")
+                raise SystemExit(1)
+            else:
+                print("All airport flight counters match the Flights table.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from connectionPool import configure_pool, connect_to_db
+from databaseSchema import create_schema
+import flightQueries
+
+# Bulk import of flights from CSV or JSON Lines files. Files are read a row at a time, checked against the airports
+# and aircraft already in the database, and inserted in chunks - each chunk is one transaction that also records
+# how far through the file the import has got, so an interrupted import can be resumed with --resume.
+#
+# Each row needs the Flights columns below. Flight_ID is optional - rows without one are given IDs from a block
+# reserved from the database's Flight_ID sequence
+REQUIRED_COLUMNS = ["Flight_Number", "Airline_Name", "Aircraft_ID", "Departure", "Arrival", "Flight_Status",
+                    "Departure_Airport_IATA", "Arrival_Airport_IATA"]
+
+INSERT_FLIGHT = f"INSERT INTO Flights ({', '.join(flightQueries.FLIGHT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+# Read a CSV file, yielding (line number, record) for every row. Records are dicts keyed by the header row
+def read_csv(path):
+    with open(path, newline="") as source:
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+
+
+# Read a JSON Lines file, yielding (line number, record). Lines that aren't valid JSON objects give a record of
+# None so they are rejected rather than stopping the import
+def read_jsonl(path):
+    with open(path) as source:
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+
+def read_records(path, file_format=None):
+    if file_format is None:
+        file_format = "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    return read_jsonl(path) if file_format == "jsonl" else read_csv(path)
+
+
+# Check one record and turn it into a row for INSERT_FLIGHT. Returns (row, None) if it is valid or
+# (None, reason) if it isn't. airports and aircrafts are sets of the IATA codes and Aircraft_IDs in the database
+def validate(record, airports, aircrafts):
+    if record is None:
+        return None, "not a valid JSON object"
+
+    missing = [column for column in REQUIRED_COLUMNS if record.get(column) in (None, "")]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+
+    try:
+        flight_number = int(record["Flight_Number"])
+        aircraft_id = int(record["Aircraft_ID"])
+        flight_id = record.get("Flight_ID")
+        flight_id = int(flight_id) if flight_id not in (None, "") else None
+    except (TypeError, ValueError):
+        return None, "Flight_ID, Flight_Number and Aircraft_ID must be whole numbers"
+
+    departure_airport = str(record["Departure_Airport_IATA"]).strip().upper()
+    arrival_airport = str(record["Arrival_Airport_IATA"]).strip().upper()
+    if departure_airport not in airports:
+        return None, f"unknown departure airport {departure_airport}"
+    if arrival_airport not in airports:
+        return None, f"unknown arrival airport {arrival_airport}"
+    if departure_airport == arrival_airport:
+        return None, "departure and arrival airports are the same"
+    if aircraft_id not in aircrafts:
+        return None, f"unknown aircraft {aircraft_id}"
+
+    # Dates and times must be ISO 8601 (YYYY-MM-DDThh:mm) like the rest of the database
+    try:
+        departure = datetime.strptime(str(record["Departure"]), "%Y-%m-%dT%H:%M")
+        arrival = datetime.strptime(str(record["Arrival"]), "%Y-%m-%dT%H:%M")
+    except ValueError:
+        return None, "Departure and Arrival must be in ISO 8601 format (YYYY-MM-DDThh:mm)"
+
+    return (flight_id, flight_number, str(record["Airline_Name"]), aircraft_id, departure.strftime("%Y-%m-%dT%H:%M"),
+            arrival.strftime("%Y-%m-%dT%H:%M"), str(record["Flight_Status"]), departure_airport, arrival_airport), None
+
+
+# Reject rows in a chunk whose Flight_ID is already used, either in the database or earlier in the chunk.
+# The existing IDs are found with one query per chunk. Returns the rows that can be inserted
+def remove_duplicate_ids(connection, chunk, rejects):
+    ids = [row[0] for line_number, row in chunk if row[0] is not None]
+    if not ids:
+        return chunk
+
+    existing = set()
+    # SQLite limits the number of ? placeholders in one statement, so look the IDs up in groups
+    for start in range(0, len(ids), 500):
+        group = ids[start:start + 500]
+        existing.update(flight_id for (flight_id,) in connection.execute(
+            f"SELECT Flight_ID FROM Flights WHERE Flight_ID IN ({', '.join('?' * len(group))})", group))
+
+    accepted = []
+    for line_number, row in chunk:
+        if row[0] is not None:
+            if row[0] in existing:
+                rejects.append((line_number, f"Flight_ID {row[0]} already exists"))
+                continue
+            existing.add(row[0])
+        accepted.append((line_number, row))
+    return accepted
+
+
+# Import every record from path. Returns a summary dict with the numbers of rows imported and rejected, the time
+# taken, rows per second and how often each rejection reason came up. Rejected rows' line numbers are written to
+# rejects_path (CSV) with the reason
+def import_flights(connection, path, file_format=None, chunk_size=5000, resume=False, rejects_path=None):
+    source = os.path.abspath(path)
+    airports = {iata for (iata,) in connection.execute("SELECT Airport_IATA FROM Airports")}
+    aircrafts = {aircraft_id for (aircraft_id,) in connection.execute("SELECT Aircraft_ID FROM Aircrafts")}
+
+    # Work out where to start - after the last committed line if resuming, otherwise from the beginning
+    start_line, imported, rejected = 0, 0, 0
+    progress = connection.execute("SELECT Line, Imported, Rejected FROM Import_Progress WHERE Source = ?",
+                                  (source,)).fetchone()
+    if resume and progress is not None:
+        start_line, imported, rejected = progress
+
+    rejects_file = None
+    rejects_writer = None
+    if rejects_path:
+        # Append to the existing rejects file when resuming so earlier rejects aren't lost
+        rejects_file = open(rejects_path, "a" if resume and progress is not None else "w", newline="")
+        rejects_writer = csv.writer(rejects_file)
+        if rejects_file.tell() == 0:
+            rejects_writer.writerow(["Line", "Reason"])
+
+    records = ((line_number, record) for line_number, record in read_records(path, file_format)
+               if line_number > start_line)
+    started = time.perf_counter()
+    newly_imported = 0
+    reasons = Counter()
+    try:
+        while True:
+            batch = list(islice(records, chunk_size))
+            if not batch:
+                break
+
+            chunk = []
+            rejects = []
+            for line_number, record in batch:
+                row, reason = validate(record, airports, aircrafts)
+                if reason is None:
+                    chunk.append((line_number, row))
+                else:
+                    rejects.append((line_number, reason))
+            chunk = remove_duplicate_ids(connection, chunk, rejects)
+
+            # Rows without a Flight_ID get one from a block reserved in the same transaction as the insert
+            rows = [row for line_number, row in chunk]
+            missing_ids = sum(1 for row in rows if row[0] is None)
+            if missing_ids:
+                next_id = flightQueries.reserve_flight_ids(missing_ids, connection)
+                for index, row in enumerate(rows):
+                    if row[0] is None:
+                        rows[index] = (next_id,) + row[1:]
+                        next_id += 1
+
+            # Insert the chunk and record progress in one transaction
+            connection.executemany(INSERT_FLIGHT, rows)
+            imported += len(chunk)
+            rejected += len(rejects)
+            newly_imported += len(chunk)
+            connection.execute("""INSERT INTO Import_Progress (Source, Line, Imported, Rejected) VALUES (?, ?, ?, ?)
+                                  ON CONFLICT(Source) DO UPDATE SET Line = excluded.Line,
+                                  Imported = excluded.Imported, Rejected = excluded.Rejected""",
+                               (source, batch[-1][0], imported, rejected))
+            connection.commit()
+
+            reasons.update(reason for line_number, reason in rejects)
+            if rejects_writer:
+                rejects_writer.writerows(sorted(rejects))
+    finally:
+        if rejects_file:
+            rejects_file.close()
+        if newly_imported:
+            flightQueries.notify_write("Flights")
+
+    elapsed = time.perf_counter() - started
+    return {"imported": imported, "rejected": rejected, "seconds": elapsed,
+            "rows_per_second": newly_imported / elapsed if elapsed else None, "reasons": reasons}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import flights from a CSV or JSON Lines file.")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="File format (worked out from the extension if not given)")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to import into")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows inserted per transaction")
+    parser.add_argument("--resume", action="store_true", help="Carry on from where a previous import of this file stopped")
+    parser.add_argument("--rejects", help="CSV file to write rejected rows and the reasons to")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    connection = connect_to_db()
+    try:
+        create_schema(connection)
+        summary = import_flights(connection, args.path, args.format, args.chunk_size, args.resume, args.rejects)
+    finally:
+        connection.close()
+
+    rate = f"{summary['rows_per_second']:,.0f}" if summary["rows_per_second"] else "n/a"
+    print(f"Imported {summary['imported']} flights and rejected {summary['rejected']} rows "
+          f"in {summary['seconds']:.1f}s ({rate} rows/s)")
+    for reason, count in summary["reasons"].most_common(10):
+        print(f" - {count} rejected: {reason}")
+
+
+if __name__ == "__main__":
+    main()
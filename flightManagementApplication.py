@@ -1,10 +1,11 @@
-import sqlite3
-from datetime import datetime
-from tabulate import tabulate # Used for formatting output
-
-# Connect to the database
-def connect_to_db():
-    return sqlite3.connect("FlightManagement.db")
+import argparse
+from connectionPool import get_pool, connect_to_db
+from databaseSchema import create_schema
+import flightQueries # All SQL lives here - the functions below only handle input and output
+from tableOutput import print_table, print_pages, set_output_mode, OUTPUT_MODES
+import queryTracing
+import flightStore
+import routeNetwork
 
 # Function to format datetime in ISO 8601 format and convert to UTC
 # This function will be used when users input data to ensure its in ISO 8601 format
@@ -15,111 +16,91 @@ def connect_to_db():
 # Function to view flights by criteria
 def view_flights():
 
-    # Establish connection with database
-    connection = connect_to_db()
-
-    # Create cursor object to execute SQL commands and queries
-    cursor = connection.cursor()
-
     # Get user input for criteria
     print("The available criteria for flights are:\n - Flight_ID\n - Flight_Number\n - Airline_Name\n - Aircraft_ID\n - Departure\n - Arrival\n - Flight_Status\n - Departure_Airport_IATA\n - Arrival_Airport_IATA\n\n")
-    criteria = input(f"Please enter a criteria or type 'ALL' to see all flights. Note, ensure your criteria matches with one of the above crieria:\n ")
-    
-
-    # Print all flights if user types 'ALL'
-    if (criteria.upper() == 'ALL'):
+    criteria = input(f"Please enter a criteria or type 'ALL' to see all flights or 'SEARCH' to combine several criteria. Note, ensure your criteria matches with one of the above crieria:\n ")
 
-        # Use the cursor object to run SQL commands. execute() runs it as a string literal so we can directly type the SQL command
-        cursor.execute("SELECT * FROM Flights;")
+    # Combine several criteria if user types 'SEARCH'
+    if (criteria.upper() == 'SEARCH'):
+        search_flights()
 
-        # Store all the flights
-        flights = cursor.fetchall()
-
-        # Check if any flights were found
-        if flights:
-            # Print all the flights and format with tabulate
-            headers = ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-            print(tabulate(flights, headers=headers, tablefmt="grid"))
+    # Print all flights if user types 'ALL'
+    elif (criteria.upper() == 'ALL'):
 
-        else:
+        # Print all the flights a page at a time as they are read, so large tables start printing straight away
+        if not print_pages(flightQueries.iter_flight_pages(), flightQueries.FLIGHT_COLUMNS):
             print("No flights found for the given criteria.")
 
-        # Close connection to database and cursor - note close cursor first so that the connection cannot be closed while the cursor is in use
-        cursor.close()
-        connection.close()
-        print("\n\n")
-
-    # If user didn't type 'ALL'
-    else:
-
-        #  Check that criteria exists as a column header in the Flights table
-        valid_criteria = ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", 
-        "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-        if (criteria in valid_criteria):
+    #  Otherwise check that criteria exists as a column header in the Flights table
+    elif (criteria in flightQueries.FLIGHT_COLUMNS):
 
-            # Instruct user to input any datetime strings in ISO 8601 format
-            if ((criteria == 'Arrival') or (criteria == 'Departure')):
-                print(f"Ensure you type the date and time of {criteria} in ISO8601 format: YYYY-MM-DDThh:mm")
+        # Instruct user to input any datetime strings in ISO 8601 format
+        if ((criteria == 'Arrival') or (criteria == 'Departure')):
+            print(f"Ensure you type the date and time of {criteria} in ISO8601 format: YYYY-MM-DDThh:mm")
 
-            # Get specific criteria user wants to see (e.g., all flights going to New York)
-            # Note we use a formatted string 
-            criteriaSelection = input(f"Please enter the specific value for the {criteria}. E.g., for Destination_Airport_IATA you could select 'LGW' for London Gatwick Airport:\n")
-
-            # Ensure date is in ISO8601 format
-            # if ((criteria == "Departure") or (criteria == "Arrival")):
-            #     criteriaSelection = format_datetime_iso_8601(criteriaSelection)
-
-            # Formulate the SQL Query - note the formatted string to pass in the criteria
-            query = f"SELECT * FROM Flights WHERE {criteria} = ?"
-
-            # Pass the SQL Query into the execute function where the place holder value is the criteria selection the user chooses
-            cursor.execute(query, (criteriaSelection,))
-
-            # Print the flights 
-            flights = cursor.fetchall()
-            if flights:
-                 headers = ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-                 print(tabulate(flights, headers=headers, tablefmt="grid"))
-            else:
-                print("No flights exist for the given criteria.")
+        # Get specific criteria user wants to see (e.g., all flights going to New York)
+        criteriaSelection = input(f"Please enter the specific value for the {criteria}. E.g., for Destination_Airport_IATA you could select 'LGW' for London Gatwick Airport:\n")
 
+        # Print the flights
+        flights = flightQueries.find_flights(criteria, criteriaSelection)
+        if flights:
+            print_table(flights, flightQueries.FLIGHT_COLUMNS)
         else:
-            print("That criteria does not exist! Make sure you type the criteria exactly as it appears in the Flights table.")
+            print("No flights exist for the given criteria.")
 
-        # Close cursor then connection to database
-        cursor.close()
-        connection.close()
-        print("\n\n")
+    else:
+        print("That criteria does not exist! Make sure you type the criteria exactly as it appears in the Flights table.")
 
-# Function to create new flight id - obeys the constraint of flight_ID being a primary key so must be unique
-def create_new_flight_id():
+    print("\n\n")
 
-     # Establish connection and creat cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
+# Function to search flights with several criteria at once, e.g. delayed Emirates flights out of DXB next week
+def search_flights():
 
-    # SQL Query returns the maximum value of Flight_ID
-    cursor.execute("SELECT MAX(Flight_ID) FROM Flights")
+    print("Enter one filter per line, then press Enter on an empty line to search. Filters can be:\n"
+          " - Criteria=value, e.g. Airline_Name=Emirates\n"
+          " - Criteria=value,value,... to match any of several values, e.g. Flight_Status=Delayed,Cancelled\n"
+          " - Criteria>=value or Criteria<value for a range, e.g. Departure>=2025-01-06 and Departure<2025-01-13\n")
 
-    # Store the previous flight ID by fetching the value produced by the cursor.execute
-    previous_ID = cursor.fetchone()[0]
+    equals, one_of, between = {}, {}, {}
+    while True:
+        search_filter = input("Filter: ").strip()
+        if not search_filter:
+            break
 
-    # Return the next Flight_ID or return 1 if there are none
-    if previous_ID is None:
-        return 1
+        # Split the filter into criteria, operator and value
+        for operator in (">=", "<", "="):
+            criteria, found, value = search_filter.partition(operator)
+            if found:
+                break
+        criteria, value = criteria.strip(), value.strip()
+        if not found or criteria not in flightQueries.FLIGHT_COLUMNS:
+            print("That filter wasn't understood. Check the criteria matches one of the columns exactly.")
+            continue
+
+        if operator == "=" and "," in value:
+            one_of[criteria] = [item.strip() for item in value.split(",")]
+        elif operator == "=":
+            equals[criteria] = value
+        else:
+            start, end = between.get(criteria, (None, None))
+            between[criteria] = (value, end) if operator == ">=" else (start, value)
+
+    order_by = input("Criteria to sort by (press Enter for Departure): ").strip() or "Departure"
+    if order_by not in flightQueries.FLIGHT_COLUMNS:
+        print("That criteria does not exist! Sorting by Departure instead.")
+        order_by = "Departure"
+    limit = input(f"Maximum number of flights to show (press Enter for {flightQueries.DEFAULT_PAGE_SIZE}): ").strip()
+
+    flights = flightQueries.search_flights(equals, one_of, between, order_by,
+                                           limit=int(limit) if limit.isdigit() else flightQueries.DEFAULT_PAGE_SIZE)
+    if flights:
+        print_table(flights, flightQueries.FLIGHT_COLUMNS)
     else:
-        return previous_ID + 1
+        print("No flights match all of those criteria.")
 
 # Function to add flights
 def add_flight():
 
-    # Establish connection and creat cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
-
-    # Generate a new Flight_ID
-    new_flight_id = create_new_flight_id()
-
     # Get user to input flight info
     new_flight_number = input("Enter flight number: ")
     new_airline_name = input("Enter airline name: ")
@@ -131,74 +112,36 @@ def add_flight():
     new_flight_status = input("Enter flight status: ")
 
     # Add all of this data to a new row in the Flights table
-    # Need to ensure that the names of the values to be inserted are in the same order as the column names in the Flights table
-    cursor.execute("""
-        INSERT INTO FLIGHTS (Flight_ID, Flight_Number, Airline_Name, Aircraft_ID, Departure, Arrival, Flight_Status, 
-                   Departure_Airport_IATA, Arrival_Airport_IATA)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (new_flight_id, new_flight_number, new_airline_name, new_aircraft_id, new_departure_time,
-        new_arrival_time, new_flight_status, new_departure_airport, new_arrival_airport))
-    
-    # Commit the changes and close the connection
-    connection.commit()
+    flightQueries.add_flight(new_flight_number, new_airline_name, new_aircraft_id, new_departure_time,
+                             new_arrival_time, new_flight_status, new_departure_airport, new_arrival_airport)
     print("Flight added successfully!")
-    cursor.close()
-    connection.close()
 
 # Function to remove flights
 def remove_flight():
-    
-    # Establish connection and creat cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
 
     # Get user input, ask for flight_ID as this is unique for every flight and avoids removing multiple flights
     flight_id_remove = input("Please enter the ID of the flight that you wish to remove: ")
 
-    # CHeck that flight ID exists
-    cursor.execute("SELECT 1 FROM Flights WHERE Flight_ID = ?", (flight_id_remove,))
-    flight_exists = cursor.fetchone() # This returns none if no flight ID exists for user input
-
-    #Proceed with update if flight exists
-    if flight_exists:
-
-        cursor.execute("DELETE FROM Flights WHERE Flight_ID = ?",
-                    (flight_id_remove,))
-
-        # Commit the changes and close the connection
-        connection.commit()
+    # remove_flight() returns False if no flight exists with that ID
+    if flightQueries.remove_flight(flight_id_remove):
         print("Flight removed successfully!")
-
     else:
         print(f"No flight found with ID {flight_id_remove}. Please check the ID and try again.")
-    
-    cursor.close()
-    connection.close()
 
 # Function to update flight information
 def update_flight_info():
 
-    # Establish connection and create cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
-
     # Prompt user to input ID of flight they are updating
     flight_id = input("Please enter the ID of the flight you are updating the information for: ")
 
-     # CHeck that flight ID exists
-    cursor.execute("SELECT 1 FROM Flights WHERE Flight_ID = ?", (flight_id,))
-    flight_exists = cursor.fetchone() # This returns none if no flight ID exists for user input
-
-     #Proceed with update if flight exists
-    if flight_exists:
+    # Check that flight ID exists before asking for the rest of the details
+    if flightQueries.flight_exists(flight_id):
 
         # Prompt user to enter what criteria they are updating
         criteria = input("The criteria you can update are: \n - Flight_ID\n - Flight_Number\n - Airline_Name\n - Aircraft_ID\n - Departure\n - Arrival\n - Flight_Status\n - Departure_Airport_IATA\n - Arrival_Airport_IATA\n\nPlease enter the criteria you are updating: ")
 
         #  Check that criteria exists as a column header in the Flights table
-        valid_criteria = ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", 
-            "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-        if (criteria in valid_criteria):
+        if (criteria in flightQueries.FLIGHT_COLUMNS):
 
             # Instruct user to input any datetime strings in ISO 8601 format
             if ((criteria == 'Arrival') or (criteria == 'Departure')):
@@ -207,84 +150,45 @@ def update_flight_info():
             # Prompt user to enter the new value for the specified criteria
             new_value = input(f"Please enter the new value for {criteria}: ")
 
-            cursor.execute(f"UPDATE Flights SET {criteria} = ? WHERE Flight_ID = ?",
-                        (new_value, flight_id,))
-        
-            # Commit the changes and close the connection
-            connection.commit()
+            flightQueries.update_flight(flight_id, criteria, new_value)
             print("Flight updated successfully!")
 
         else:
             print("That criteria does not exist! Make sure you type the criteria exactly as it appears in the Flights table.")
-    
+
     else:
         print(f"No flight found with ID {flight_id}. Please check the ID and try again.")
-    
-    cursor.close()
-    connection.close()
 
 # Function to assign a pilot to a flight
 def assign_pilot_to_flight():
-    
-    # Establish connection and create cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
 
     # Get user to input flight
     flight_id = input("Enter the ID number of the flight you are assigning a pilot to: ")
 
-     # CHeck that flight ID exists
-    cursor.execute("SELECT 1 FROM Flights WHERE Flight_ID = ?", (flight_id,))
-    flight_exists = cursor.fetchone() # This returns none if no flight ID exists for user input
-
-    # If flight exists for that ID
-    if flight_exists:
-
-        # Get user to input Pilot info
-        pilot_id = input(f"Enter the ID number of the pilot which you are assigning to flight {flight_id}: ")
-
-        # Check an ID for this pilot exists
-        cursor.execute("SELECT 1 FROM Pilots WHERE Pilot_ID = ?", (pilot_id,))
-        pilot_exists = cursor.fetchone()
-
-        # Get the pilot role for this flight
-        role = input(f"Input Pilot {pilot_id}'s role for this flight (Captain or First Officer): ")
-
-        # If it does, assign pilot to flight
-        if pilot_exists:
-            
-            # Check if the pilot has already been assigned to flight so we don't break composite primary key constraint
-            cursor.execute("SELECT 1 FROM Flight_Pilot WHERE Flight_ID = ? AND Pilot_ID = ?", (flight_id, pilot_id))
-            assignment_exists = cursor.fetchone()
-
-            # If there is no existing assignment of pilot to flight, perfomr the assignment
-            if not assignment_exists:
-
-                cursor.execute("""INSERT INTO Flight_Pilot (Flight_ID, Pilot_ID, Role)
-                            VALUES(?, ?, ?)""",
-                            (flight_id, pilot_id, role))
-                connection.commit()
-                print(f"Pilot {pilot_id} successfully assigned to flight {flight_id}")
-
-            # If this assignment already exists, tell the user
-            else:
-                print(f"Pilot {pilot_id} is already assigned to flight {flight_id}.")
-
-        else:
-            print(f"No pilot found with ID {pilot_id}. Please check the ID and try again.")
-
+    # Check that flight ID exists
+    if not flightQueries.flight_exists(flight_id):
+        print(f"No flight found with ID {flight_id}. Please check the ID and try again.")
+        return
+
+    # Get user to input Pilot info and the pilot's role for this flight
+    pilot_id = input(f"Enter the ID number of the pilot which you are assigning to flight {flight_id}: ")
+    role = input(f"Input Pilot {pilot_id}'s role for this flight (Captain or First Officer): ")
+
+    # Perform the assignment and tell the user what happened
+    outcome = flightQueries.assign_pilot(flight_id, pilot_id, role)
+    if outcome == flightQueries.ASSIGNED:
+        print(f"Pilot {pilot_id} successfully assigned to flight {flight_id}")
+    elif outcome == flightQueries.ALREADY_ASSIGNED:
+        print(f"Pilot {pilot_id} is already assigned to flight {flight_id}.")
+    elif outcome == flightQueries.SCHEDULE_CONFLICT:
+        print(f"Pilot {pilot_id} is already flying at the same time as flight {flight_id}:")
+        print_table(flightQueries.pilot_conflicts(pilot_id, flight_id), flightQueries.FLIGHT_COLUMNS)
+    elif outcome == flightQueries.NO_SUCH_PILOT:
+        print(f"No pilot found with ID {pilot_id}. Please check the ID and try again.")
     else:
         print(f"No flight found with ID {flight_id}. Please check the ID and try again.")
 
-    # Close cursor and connection
-    cursor.close()
-    connection.close()
-
 def view_pilot_schedule():
-    
-    # Establish connection and create cursor
-    connection = connect_to_db()
-    cursor = connection.cursor()
 
     #Get user input and check that pilot_ID exists
     pilot_id = input("Enter 'ALL' to see all pilot's schedules or enter the pilot ID number for the pilot who you wish to see the schedule for: ")
@@ -292,54 +196,24 @@ def view_pilot_schedule():
     # If user types 'ALL' show whole schedule
     if pilot_id.upper() == "ALL":
 
-        cursor.execute("""SELECT Pilot_ID, Full_Name, Flight_ID, Flight_Number, Departure, Arrival, Flight_Status,
-                       Departure_Airport_IATA, Arrival_Airport_IATA
-                       FROM (Pilots NATURAL JOIN Flight_Pilot NATURAL JOIN Flights)
-                       ORDER BY Pilot_ID, Flight_ID""")
-        schedule = cursor.fetchall()
+        # Print the schedule a page at a time, or say there isn't one if nothing was printed
+        if not print_pages(flightQueries.iter_schedule_pages(), flightQueries.SCHEDULE_COLUMNS):
+            print("There is currently no flight schedule")
 
-        # Check if there is a schedule and print is there is
-        if schedule:
-            headers = ["Pilot_ID", "Full_Name", "Flight_ID", "Flight_Number", "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-            print(tabulate(schedule, headers=headers, tablefmt="grid"))
-        else:
-            print("There is currently no flight schedule") 
-        
-
-    # Check an ID for this pilot exists
-    cursor.execute("SELECT 1 FROM Pilots WHERE Pilot_ID = ?", (pilot_id,))
-    pilot_exists = cursor.fetchone()
-
-    # If pilot exists, display their sechedule
-    if pilot_exists:
-
-        # Grab all the relevant items from the tables
-        cursor.execute("""SELECT Pilot_ID, Full_Name, Flight_ID, Flight_Number, Departure, Arrival, Flight_Status,
-                       Departure_Airport_IATA, Arrival_Airport_IATA
-                       FROM (Pilots NATURAL JOIN Flight_Pilot NATURAL JOIN Flights)
-                       WHERE Pilot_ID = ?
-                       ORDER BY Pilot_ID, Flight_ID""", (pilot_id,))
-        # Store all of these in the schedule list
-        schedule = cursor.fetchall()
-
-        # If data has been collected it print it, if not, no data exists for that pilot
+    else:
+
+        schedule = flightQueries.pilot_schedule(pilot_id)
+
+        # If data has been collected print it. Only an empty schedule needs a second query to find out whether the
+        # pilot exists at all
         if schedule:
-            headers = ["Pilot_ID", "Full_Name", "Flight_ID", "Flight_Number", "Departure", "Arrival", "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
-            print(tabulate(schedule, headers=headers, tablefmt="grid"))
-        else:
+            print_table(schedule, flightQueries.SCHEDULE_COLUMNS)
+        elif flightQueries.pilot_exists(pilot_id):
             print(f"Pilot with ID number {pilot_id} has no schedule.")
-    else:
-        print(f"Pilot with ID number {pilot_id} does not exist! Check the ID and try again")
+        else:
+            print(f"Pilot with ID number {pilot_id} does not exist! Check the ID and try again")
 
-    # Close connection and cursor
-    cursor.close()
-    connection.close()
-    
 def view_destination_info():
-    
-    # Create connection and cursor object
-    connection = connect_to_db()
-    cursor = connection.cursor()
 
     # Ask user what destination they want to see flights for
     destination = input("Enter the IATA of the destination airport (e.g. Sydney is SYD): ")
@@ -349,57 +223,80 @@ def view_destination_info():
 
     else:
 
-        # Grab all relevant items from table by joining Airport_IATA in Airport with Arrival_Airport_IATA in FLights
-        cursor.execute("""SELECT 
-                    Flights.Flight_Number,
-                    Flights.Departure_Airport_IATA AS "Origin",
-                    Airports.City AS "Origin City",
-                    Airports.Country AS "Origin Country",
-                    Flights.Airline_Name, 
-                    Flights.Arrival,
-                    Flights.Flight_Status
-                    FROM Flights JOIN Airports ON Flights.Departure_Airport_IATA = Airports.Airport_IATA 
-                    WHERE Flights.Arrival_Airport_IATA = ?""", (destination,))
-        flights = cursor.fetchall()
+        flights = flightQueries.flights_to(destination)
 
         if flights:
-            headers = ["Flight Number", "Origin Airport", "Origin City", "Origin Country", "Airline Name", "Arrival", "Flight Status"]
             print(f"Flights going to {destination} airport:\n")
-            print(tabulate(flights, headers=headers, tablefmt="grid"))
+            print_table(flights, flightQueries.DESTINATION_COLUMNS)
         else:
             print(f"No flights to {destination} in the database")
 
-    # Close connection and cursor
-    cursor.close()
-    connection.close()
-
 def number_of_flights_to_destination():
 
-    # Create connection
-    connection = connect_to_db()
-    cursor = connection.cursor()
-
     airport = input("Enter the IATA code of the airport you want to check the number of flights to. ")
 
-    # Check there is an IATA code of that in the Flights table
-    cursor.execute("SELECT 1 FROM Flights WHERE Arrival_Airport_IATA = ?", (airport,))
-    airport_exists = cursor.fetchone()
-
-    # If there is, return the number of flights, if not print that this flight does not exist
-    if airport_exists:
-        cursor.execute("SELECT COUNT(*) FROM Flights WHERE Arrival_Airport_IATA = ?", (airport,))
-        result = cursor.fetchone()
-        count = result[0]
+    # If there are flights to that airport print how many, if not print that this flight does not exist
+    count = flightQueries.count_flights_to(airport)
+    if count:
         print(f"There are {count} flights to {airport}\n\n")
     else:
         print("No flights match this destination! Please check you used the correct airport IATA.")
 
-    cursor.close()
-    connection.close()
+def find_connections():
+
+    origin = input("Enter the IATA code of the airport you are leaving from: ").strip().upper()
+    destination = input("Enter the IATA code of the airport you are travelling to: ").strip().upper()
+    after = input("Enter the earliest departure time in ISO 8601 format (e.g. 2025-01-06T09:00, UTC unless an offset "
+                  "like +01:00 is given): ").strip()
+
+    try:
+        itineraries = routeNetwork.find_connections(origin, destination, after)
+    except ValueError:
+        print("Invalid time! Please use the ISO 8601 format, e.g. 2025-01-06T09:00.")
+        return
+
+    if not itineraries:
+        print(f"No connections from {origin} to {destination} within a day of {after} with at most "
+              f"{routeNetwork.DEFAULT_MAX_LEGS} flights.")
+    for number, itinerary in enumerate(itineraries, 1):
+        print(f"Option {number}: {len(itinerary)} flight{'s' if len(itinerary) > 1 else ''}, "
+              f"departing {itinerary[0][4]} and arriving {itinerary[-1][5]} (local times)")
+        print_table(itinerary, flightQueries.FLIGHT_COLUMNS)
+
+def query_statistics():
+
+    tracer = queryTracing.current_tracer()
+    if tracer is None:
+        print("Query tracing is turned off.")
+        return
+
+    limit = input("How many of the slowest statements do you want to see? (press enter for 10) ").strip()
+    show_plans = input("Show their query plans? (Y/N) ").strip().upper() == "Y"
+    queryTracing.print_stats(tracer, int(limit) if limit.isdigit() else 10, show_plans)
 
 
 # Main function to display terminal and implement functions
 def main():
+    parser = argparse.ArgumentParser(description="Menu for viewing and managing the flight database.")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="grid",
+                        help="How tables are printed: grid (tabulate), fast (streamed grid), plain, tsv or json")
+    parser.add_argument("--flight-store", action="store_true",
+                        help="Hold Flights in memory and answer lookups from there (only when no other process writes)")
+    args = parser.parse_args()
+    set_output_mode(args.output)
+
+    # Make sure the tables and indexes exist before showing the menu
+    connection = connect_to_db()
+    create_schema(connection)
+    connection.close()
+
+    # Time every query from here on so option 10 can show which ones are slow
+    queryTracing.enable_tracing()
+
+    if args.flight_store:
+        store = flightStore.enable_flight_store()
+        print(f"Holding {len(store):,} flights in memory.\n")
+
     # Menu is constantly printed until user exits
     while True:
         # Options
@@ -412,7 +309,9 @@ def main():
         print("6) View pilot schedule")
         print("7) View destination information (shows all flights to a particular destination)")
         print("8) View number of flights to a particular destination")
-        print("9) Quit")
+        print("9) Find connecting flights between two airports")
+        print("10) Show query statistics")
+        print("11) Quit")
 
         # Get user input
         choice = input("Enter the number of the option you wish to execute: ")
@@ -436,7 +335,13 @@ def main():
         elif choice == "8":
             number_of_flights_to_destination()
         elif choice == "9":
+            find_connections()
+        elif choice == "10":
+            query_statistics()
+        elif choice == "11":
             print("Exitted Program")
+            # Close the pooled connections before exiting
+            get_pool().close()
             break
         else:
             print("Invalid Input! Make sure you enter the number as a digit for the option you wish to execute.")
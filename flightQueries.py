@@ -0,0 +1,480 @@
+import json
+from datetime import datetime, timezone
+from connectionPool import connect_to_db
+from queryCache import QueryCache
+
+# Data-access layer for the flight management database. Every function here takes plain values and returns
+# rows (tuples in the column order given below) or simple results, without prompting for input or printing,
+# so the operations can be called from the menu, scripts, benchmarks or services alike
+
+# Columns of the Flights table, in table order. These are also the only columns that can be searched or updated,
+# which stops user input being placed into the SQL as a column name
+FLIGHT_COLUMNS = ["Flight_ID", "Flight_Number", "Airline_Name", "Aircraft_ID", "Departure", "Arrival",
+                  "Flight_Status", "Departure_Airport_IATA", "Arrival_Airport_IATA"]
+
+# Departure and Arrival as UTC epoch seconds. The database fills these in, so they can be searched and sorted on
+# but not updated
+UTC_COLUMNS = ["Departure_UTC", "Arrival_UTC"]
+SEARCH_COLUMNS = FLIGHT_COLUMNS + UTC_COLUMNS
+
+# Columns returned by pilot_schedule() and flights_to()
+SCHEDULE_COLUMNS = ["Pilot_ID", "Full_Name", "Flight_ID", "Flight_Number", "Departure", "Arrival", "Flight_Status",
+                    "Departure_Airport_IATA", "Arrival_Airport_IATA"]
+DESTINATION_COLUMNS = ["Flight Number", "Origin Airport", "Origin City", "Origin Country", "Airline Name", "Arrival",
+                       "Flight Status"]
+
+# Number of rows per page when listings are streamed
+DEFAULT_PAGE_SIZE = 500
+
+# Smaller than any key in the database, used as the starting point for keyset pagination
+FIRST_KEY = -(2 ** 63)
+
+# Largest number of values allowed in one IN-list of search_flights(), well under SQLite's limit on ? placeholders
+MAX_IN_VALUES = 1000
+
+# Possible results of assign_pilot()
+ASSIGNED = "assigned"
+NO_SUCH_FLIGHT = "no such flight"
+NO_SUCH_PILOT = "no such pilot"
+ALREADY_ASSIGNED = "already assigned"
+SCHEDULE_CONFLICT = "schedule conflict"
+
+# Possible outcomes of each change passed to update_flights()
+UPDATED = "updated"
+INVALID_COLUMN = "invalid column"
+INVALID_FLIGHT_ID = "invalid Flight_ID"
+
+# The SQL used by the functions below
+ALL_FLIGHTS_QUERY = f"SELECT {', '.join(FLIGHT_COLUMNS)} FROM Flights"
+FIND_FLIGHTS_QUERY = f"SELECT {', '.join(FLIGHT_COLUMNS)} FROM Flights WHERE {{criteria}} = ? ORDER BY Flight_ID"
+SEARCH_FLIGHTS_QUERY = f"SELECT {', '.join(FLIGHT_COLUMNS)} FROM Flights"
+# json_each turns one JSON array parameter into a table, so any number of IDs can be looked up in one query
+# without hitting SQLite's limit on the number of ? placeholders
+FLIGHTS_BY_ID_QUERY = ALL_FLIGHTS_QUERY + " WHERE Flight_ID IN (SELECT value FROM json_each(?))"
+FLIGHT_EXISTS_QUERY = "SELECT 1 FROM Flights WHERE Flight_ID = ?"
+PILOT_EXISTS_QUERY = "SELECT 1 FROM Pilots WHERE Pilot_ID = ?"
+ASSIGNMENT_EXISTS_QUERY = "SELECT 1 FROM Flight_Pilot WHERE Flight_ID = ? AND Pilot_ID = ?"
+# New flights read their ID from Flight_ID_Sequence inside the INSERT statement. SQLite takes the write lock before
+# the statement runs, and the trigger on Flights moves the sequence on within the same statement, so two writers -
+# even in different processes - can't both read the same value
+INSERT_FLIGHT_QUERY = (f"INSERT INTO Flights ({', '.join(FLIGHT_COLUMNS)}) "
+                       "VALUES ((SELECT Next_ID FROM Flight_ID_Sequence), ?, ?, ?, ?, ?, ?, ?, ?)")
+# Reserve a block of IDs in one statement, returning the first ID in the block
+RESERVE_FLIGHT_IDS_QUERY = "UPDATE Flight_ID_Sequence SET Next_ID = Next_ID + ? RETURNING Next_ID - ?"
+# Schedules are read from Pilot_Schedule, which holds every crew assignment already joined to the pilot and flight
+# and is kept up to date by triggers. Its primary key is (Pilot_ID, Flight_ID), so a pilot's schedule is one range
+# of the key and the whole schedule comes out in order without sorting
+SCHEDULE_QUERY = f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM Pilot_Schedule"
+SCHEDULE_ORDER = " ORDER BY Pilot_ID, Flight_ID"
+ALL_SCHEDULES_QUERY = SCHEDULE_QUERY + SCHEDULE_ORDER
+PILOT_SCHEDULE_QUERY = SCHEDULE_QUERY + " WHERE Pilot_ID = ?" + SCHEDULE_ORDER
+# Flights departing or arriving in a window of UTC time, across every airport, in UTC order
+DEPARTURES_BETWEEN_QUERY = ALL_FLIGHTS_QUERY + " WHERE Departure_UTC >= ? AND Departure_UTC < ? ORDER BY Departure_UTC"
+ARRIVALS_BETWEEN_QUERY = ALL_FLIGHTS_QUERY + " WHERE Arrival_UTC >= ? AND Arrival_UTC < ? ORDER BY Arrival_UTC"
+# A pilot's flights that overlap a time window [start, end), from Crew_Intervals where each pilot's flights are
+# sorted by departure. A pilot's flights never overlap each other (assign_pilot() makes sure of that), so the
+# only flights that can overlap the window are the ones departing inside it plus the last one departing before it.
+# Both are found with a seek on the primary key, without reading the rest of the pilot's flights
+CONFLICTING_FLIGHTS_QUERY = f"""SELECT {', '.join(FLIGHT_COLUMNS)} FROM Flights WHERE Flight_ID IN (
+                                    SELECT Flight_ID FROM Crew_Intervals
+                                    WHERE Pilot_ID = :pilot AND Departure_UTC >= :start AND Departure_UTC < :end
+                                    UNION ALL
+                                    SELECT Flight_ID FROM Crew_Intervals
+                                    WHERE Pilot_ID = :pilot AND Arrival_UTC > :start AND Departure_UTC = (
+                                        SELECT MAX(Departure_UTC) FROM Crew_Intervals
+                                        WHERE Pilot_ID = :pilot AND Departure_UTC < :start))
+                                AND Flight_ID != :flight ORDER BY Departure_UTC"""
+FLIGHT_TIMES_QUERY = "SELECT Departure_UTC, Arrival_UTC FROM Flights WHERE Flight_ID = ?"
+# Keyset pagination - each page starts after the last key of the previous page, so fetching a page costs the
+# same however far through the table it is, unlike LIMIT/OFFSET which re-reads every skipped row
+FLIGHTS_PAGE_QUERY = ALL_FLIGHTS_QUERY + " WHERE Flight_ID > ? ORDER BY Flight_ID LIMIT ?"
+SCHEDULE_PAGE_QUERY = SCHEDULE_QUERY + " WHERE (Pilot_ID, Flight_ID) > (?, ?)" + SCHEDULE_ORDER + " LIMIT ?"
+# Join Airport_IATA in Airports with Departure_Airport_IATA in Flights to get details of where each flight comes from
+FLIGHTS_TO_QUERY = """SELECT Flights.Flight_Number, Flights.Departure_Airport_IATA, Airports.City, Airports.Country,
+                             Flights.Airline_Name, Flights.Arrival, Flights.Flight_Status
+                      FROM Flights JOIN Airports ON Flights.Departure_Airport_IATA = Airports.Airport_IATA
+                      WHERE Flights.Arrival_Airport_IATA = ?"""
+# Flight counts come from the trigger-maintained summary tables rather than counting rows of Flights
+COUNT_FLIGHTS_TO_QUERY = "SELECT Arrivals FROM Airport_Flight_Counts WHERE Airport_IATA = ?"
+COUNT_FLIGHTS_TO_WITH_STATUS_QUERY = "SELECT Arrivals FROM Airport_Status_Counts WHERE Airport_IATA = ? AND Flight_Status = ?"
+
+
+# Results of frequently repeated lookups are cached here until the tables they read from are written to
+query_cache = QueryCache()
+
+# Functions called with a table name, and the primary keys of the rows written if they are known, whenever one of
+# the write functions below changes that table.
+# The query cache is always registered; other in-process copies of the data can add their own with add_write_listener()
+_write_listeners = [query_cache.invalidate]
+
+
+# In-process replica of Flights that answers the lookups below instead of the database, while it is enabled
+# (see flightStore.enable_flight_store())
+flight_store = None
+
+
+def add_write_listener(listener):
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    _write_listeners.remove(listener)
+
+
+# Tell every listener that a table has changed. keys lists the primary keys of the rows that were inserted, updated
+# or deleted, or is None if they aren't known. Anything that writes to the database outside the functions in this
+# module (e.g. bulk imports) should call this afterwards
+def notify_write(table, keys=None):
+    for listener in _write_listeners:
+        listener(table, keys)
+
+
+# Raise a ValueError unless column is one of the Flights columns
+def check_flight_column(column, columns=FLIGHT_COLUMNS):
+    if column not in columns:
+        raise ValueError(f"{column!r} is not a column of the Flights table.")
+
+
+# Turn a point in time into UTC epoch seconds. Accepts epoch seconds, a datetime (naive ones are taken to be UTC)
+# or an ISO 8601 string, which may end with an offset such as +09:00 and is otherwise taken to be UTC
+def to_utc_epoch(moment):
+    if isinstance(moment, (int, float)):
+        return int(moment)
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+# Run a read query on a pooled connection and return all the rows
+def _fetch_all(query, parameters=()):
+    connection = connect_to_db()
+    try:
+        return connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+
+
+# Run a read query on a pooled connection and return the first row, or None if there isn't one
+def _fetch_one(query, parameters=()):
+    connection = connect_to_db()
+    try:
+        return connection.execute(query, parameters).fetchone()
+    finally:
+        connection.close()
+
+
+# Every flight
+def all_flights():
+    return _fetch_all(ALL_FLIGHTS_QUERY)
+
+
+# One page of at most page_size flights with a Flight_ID greater than after, in Flight_ID order
+def flights_page(after=FIRST_KEY, page_size=DEFAULT_PAGE_SIZE):
+    return _fetch_all(FLIGHTS_PAGE_QUERY, (after, page_size))
+
+
+# Every flight, as a sequence of pages (lists of at most page_size rows) in Flight_ID order.
+# Only one page is held in memory at a time, and the connection is returned to the pool between pages
+def iter_flight_pages(page_size=DEFAULT_PAGE_SIZE):
+    last_flight_id = FIRST_KEY
+    while True:
+        page = flights_page(last_flight_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_flight_id = page[-1][0]
+
+
+# Flights where the given column equals value, in Flight_ID order, e.g. find_flights("Arrival_Airport_IATA", "SYD")
+def find_flights(criteria, value):
+    check_flight_column(criteria)
+    if flight_store is not None:
+        return flight_store.find_flights(criteria, value)
+    return _fetch_all(FIND_FLIGHTS_QUERY.format(criteria=criteria), (value,))
+
+
+# The flights with the given IDs, in Flight_ID order. IDs with no flight are left out
+def flights_by_id(flight_ids):
+    if flight_store is not None:
+        return flight_store.flights_by_id(flight_ids)
+    return _fetch_all(FLIGHTS_BY_ID_QUERY, (json.dumps([int(flight_id) for flight_id in flight_ids]),))
+
+
+# Build the SQL and parameters for search_flights(). Conditions are ANDed together:
+#  - equals: {column: value} - column = value
+#  - one_of: {column: [values]} - column IN (values)
+#  - between: {column: (start, end)} - start <= column < end, where either end can be None to leave it open.
+#    Departure and Arrival are local ISO 8601 strings; Departure_UTC and Arrival_UTC are UTC epoch seconds, and
+#    their bounds can be anything to_utc_epoch() accepts (ValueError if not)
+# Results are sorted by order_by (then Flight_ID so the order is always the same) and cut off after limit rows.
+# The composite indexes in databaseSchema.py put the columns usually compared with = first and Departure/Arrival
+# last, so a search like "Emirates flights out of DXB departing next week, in departure order" reads just the
+# matching index entries in order
+def build_flight_search(equals=None, one_of=None, between=None, order_by="Departure", descending=False,
+                        limit=DEFAULT_PAGE_SIZE):
+    conditions = []
+    parameters = []
+    for column, value in (equals or {}).items():
+        check_flight_column(column, SEARCH_COLUMNS)
+        conditions.append(f"{column} = ?")
+        parameters.append(value)
+
+    for column, values in (one_of or {}).items():
+        check_flight_column(column, SEARCH_COLUMNS)
+        values = list(values)
+        if len(values) > MAX_IN_VALUES:
+            raise ValueError(f"At most {MAX_IN_VALUES} values can be given for {column}.")
+        conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+        parameters.extend(values)
+
+    for column, (start, end) in (between or {}).items():
+        check_flight_column(column, SEARCH_COLUMNS)
+        if column in UTC_COLUMNS:
+            start, end = (None if bound is None else to_utc_epoch(bound) for bound in (start, end))
+        if start is not None:
+            conditions.append(f"{column} >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append(f"{column} < ?")
+            parameters.append(end)
+
+    check_flight_column(order_by, SEARCH_COLUMNS)
+    direction = " DESC" if descending else ""
+    query = SEARCH_FLIGHTS_QUERY
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_by}{direction}"
+    if order_by != "Flight_ID":
+        query += f", Flight_ID{direction}"
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters.append(int(limit))
+    return query, parameters
+
+
+# Flights matching every condition given, e.g.
+#   search_flights(equals={"Airline_Name": "Emirates", "Flight_Status": "Delayed", "Departure_Airport_IATA": "DXB"},
+#                  between={"Departure": ("2025-01-06", "2025-01-13")})
+# See build_flight_search() for the arguments. Raises ValueError for a column that isn't in FLIGHT_COLUMNS
+def search_flights(equals=None, one_of=None, between=None, order_by="Departure", descending=False,
+                   limit=DEFAULT_PAGE_SIZE):
+    return _fetch_all(*build_flight_search(equals, one_of, between, order_by, descending, limit))
+
+
+# Flights departing from any airport at or after start and before end, in the order they actually depart.
+# start and end can be anything to_utc_epoch() accepts, e.g. departures_between("2025-01-06T09:00+01:00",
+# "2025-01-06T12:00+01:00"). Answered from the Departure_UTC index
+def departures_between(start, end):
+    return _fetch_all(DEPARTURES_BETWEEN_QUERY, (to_utc_epoch(start), to_utc_epoch(end)))
+
+
+# Flights arriving anywhere at or after start and before end, in the order they actually arrive
+def arrivals_between(start, end):
+    return _fetch_all(ARRIVALS_BETWEEN_QUERY, (to_utc_epoch(start), to_utc_epoch(end)))
+
+
+def flight_exists(flight_id):
+    return _fetch_one(FLIGHT_EXISTS_QUERY, (flight_id,)) is not None
+
+
+def pilot_exists(pilot_id):
+    return _fetch_one(PILOT_EXISTS_QUERY, (pilot_id,)) is not None
+
+
+# Reserve count consecutive Flight_IDs for a bulk load and return the first one. The IDs are never handed out
+# again, even if they end up unused. If a connection is passed the reservation becomes part of its current
+# transaction (and is undone if that transaction is rolled back); otherwise it is committed straight away
+def reserve_flight_ids(count, connection=None):
+    if connection is not None:
+        return connection.execute(RESERVE_FLIGHT_IDS_QUERY, (count, count)).fetchone()[0]
+
+    connection = connect_to_db()
+    try:
+        first_id = connection.execute(RESERVE_FLIGHT_IDS_QUERY, (count, count)).fetchone()[0]
+        connection.commit()
+    finally:
+        connection.close()
+    return first_id
+
+
+# Add a flight and return its new Flight_ID, which is allocated by the database
+def add_flight(flight_number, airline_name, aircraft_id, departure, arrival, flight_status,
+               departure_airport, arrival_airport):
+    connection = connect_to_db()
+    try:
+        flight_id = connection.execute(INSERT_FLIGHT_QUERY, (flight_number, airline_name, aircraft_id, departure,
+                                                             arrival, flight_status, departure_airport,
+                                                             arrival_airport)).lastrowid
+        connection.commit()
+    finally:
+        connection.close()
+    notify_write("Flights", [flight_id])
+    return flight_id
+
+
+# Remove a flight. Returns False if there was no flight with that ID
+def remove_flight(flight_id):
+    connection = connect_to_db()
+    try:
+        removed = connection.execute("DELETE FROM Flights WHERE Flight_ID = ?", (flight_id,)).rowcount
+        connection.commit()
+    finally:
+        connection.close()
+    if removed:
+        notify_write("Flights", [flight_id])
+    return removed > 0
+
+
+# Set one column of a flight to a new value. Returns False if there was no flight with that ID
+def update_flight(flight_id, column, value):
+    check_flight_column(column)
+    connection = connect_to_db()
+    try:
+        updated = connection.execute(f"UPDATE Flights SET {column} = ? WHERE Flight_ID = ?",
+                                     (value, flight_id)).rowcount
+        connection.commit()
+    finally:
+        connection.close()
+    if updated:
+        # Changing the Flight_ID moves the row, so both the old and the new key have changed
+        notify_write("Flights", [flight_id, value] if column == "Flight_ID" else [flight_id])
+    return updated > 0
+
+
+# Apply many (Flight_ID, column, value) changes at once, e.g. a batch of Flight_Status updates.
+# Every Flight_ID is checked with a single query, and all the valid changes are applied in one transaction with
+# one executemany per column. Returns a list with the outcome of each change, in the same order: UPDATED,
+# NO_SUCH_FLIGHT, INVALID_COLUMN or INVALID_FLIGHT_ID.
+# Flight_ID itself can't be changed this way because the result would depend on the order of the changes
+def update_flights(changes):
+    outcomes = [None] * len(changes)
+    flight_ids = []
+    for index, (flight_id, column, value) in enumerate(changes):
+        if column not in FLIGHT_COLUMNS or column == "Flight_ID":
+            outcomes[index] = INVALID_COLUMN
+            continue
+        try:
+            flight_ids.append(int(flight_id))
+        except (TypeError, ValueError):
+            outcomes[index] = INVALID_FLIGHT_ID
+
+    connection = connect_to_db()
+    try:
+        # json_each turns one JSON array parameter into a table, so any number of IDs can be checked in one
+        # query without hitting SQLite's limit on the number of ? placeholders
+        existing = {flight_id for (flight_id,) in connection.execute(
+            "SELECT Flight_ID FROM Flights WHERE Flight_ID IN (SELECT value FROM json_each(?))",
+            (json.dumps(flight_ids),))}
+
+        # Group the valid changes by column, keeping their order, so each column needs one prepared statement
+        changes_by_column = {}
+        for index, (flight_id, column, value) in enumerate(changes):
+            if outcomes[index] is not None:
+                continue
+            if int(flight_id) not in existing:
+                outcomes[index] = NO_SUCH_FLIGHT
+                continue
+            changes_by_column.setdefault(column, []).append((value, int(flight_id)))
+            outcomes[index] = UPDATED
+
+        for column, rows in changes_by_column.items():
+            connection.executemany(f"UPDATE Flights SET {column} = ? WHERE Flight_ID = ?", rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+    if UPDATED in outcomes:
+        notify_write("Flights", sorted({int(changes[index][0]) for index, outcome in enumerate(outcomes)
+                                        if outcome == UPDATED}))
+    return outcomes
+
+
+# The flights a pilot is already assigned to that overlap the given flight, in departure order
+def _conflicting_flights(connection, pilot_id, flight_id):
+    times = connection.execute(FLIGHT_TIMES_QUERY, (flight_id,)).fetchone()
+    if times is None or None in times:
+        return []
+    return connection.execute(CONFLICTING_FLIGHTS_QUERY, {"pilot": pilot_id, "flight": flight_id,
+                                                          "start": times[0], "end": times[1]}).fetchall()
+
+
+# The flights a pilot is already assigned to that would overlap flight_id if they were assigned to it too
+def pilot_conflicts(pilot_id, flight_id):
+    connection = connect_to_db()
+    try:
+        return _conflicting_flights(connection, pilot_id, flight_id)
+    finally:
+        connection.close()
+
+
+# Assign a pilot to a flight with the given role. Returns ASSIGNED, or NO_SUCH_FLIGHT, NO_SUCH_PILOT,
+# ALREADY_ASSIGNED or SCHEDULE_CONFLICT (the pilot is on another flight at the same time - see pilot_conflicts())
+# if the assignment couldn't be made
+def assign_pilot(flight_id, pilot_id, role):
+    connection = connect_to_db()
+    try:
+        # Take the write lock before checking, so another writer can't book the pilot between the check and insert
+        connection.execute("BEGIN IMMEDIATE")
+        if connection.execute(FLIGHT_EXISTS_QUERY, (flight_id,)).fetchone() is None:
+            return NO_SUCH_FLIGHT
+        if connection.execute(PILOT_EXISTS_QUERY, (pilot_id,)).fetchone() is None:
+            return NO_SUCH_PILOT
+        # Check the pilot isn't already on this flight so we don't break the composite primary key constraint
+        if connection.execute(ASSIGNMENT_EXISTS_QUERY, (flight_id, pilot_id)).fetchone() is not None:
+            return ALREADY_ASSIGNED
+        if _conflicting_flights(connection, pilot_id, flight_id):
+            return SCHEDULE_CONFLICT
+
+        connection.execute("INSERT INTO Flight_Pilot (Flight_ID, Pilot_ID, Role) VALUES (?, ?, ?)",
+                           (flight_id, pilot_id, role))
+        connection.commit()
+    finally:
+        connection.close()
+    notify_write("Flight_Pilot")
+    return ASSIGNED
+
+
+# The schedule for one pilot, or for every pilot if pilot_id is None. Rows are in SCHEDULE_COLUMNS order
+def pilot_schedule(pilot_id=None):
+    if pilot_id is None:
+        return _fetch_all(ALL_SCHEDULES_QUERY)
+    return _fetch_all(PILOT_SCHEDULE_QUERY, (pilot_id,))
+
+
+# Every pilot's schedule as a sequence of pages, in the same order as pilot_schedule()
+def iter_schedule_pages(page_size=DEFAULT_PAGE_SIZE):
+    last_key = (FIRST_KEY, FIRST_KEY)
+    while True:
+        page = _fetch_all(SCHEDULE_PAGE_QUERY, last_key + (page_size,))
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        # Pilot_ID and Flight_ID are the first and third schedule columns
+        last_key = (page[-1][0], page[-1][2])
+
+
+# Every flight arriving at an airport, with the city and country it departs from (DESTINATION_COLUMNS order)
+@query_cache.cached("Flights", "Airports")
+def flights_to(iata):
+    if flight_store is not None:
+        return flight_store.flights_to(iata)
+    return _fetch_all(FLIGHTS_TO_QUERY, (iata,))
+
+
+# The number of flights arriving at an airport, optionally only those with the given Flight_Status
+@query_cache.cached("Flights")
+def count_flights_to(iata, flight_status=None):
+    if flight_store is not None:
+        return flight_store.count_flights_to(iata, flight_status)
+    if flight_status is None:
+        row = _fetch_one(COUNT_FLIGHTS_TO_QUERY, (iata,))
+    else:
+        row = _fetch_one(COUNT_FLIGHTS_TO_WITH_STATUS_QUERY, (iata, flight_status))
+    # Airports that have never had a flight have no counter row
+    return 0 if row is None else row[0]
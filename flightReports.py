@@ -0,0 +1,251 @@
+import argparse
+import time
+import numpy as np
+from connectionPool import configure_pool, connect_to_db
+from flightSnapshot import Dictionary, NULL_INT, load_snapshot
+from tableOutput import print_table, set_output_mode, OUTPUT_MODES
+
+# Reports on how reliable flights are: the share of flights On Time, Delayed and Cancelled per airline, route,
+# aircraft model, aircraft age and airport per day.
+#
+# The flights are read once, in chunks, into NumPy arrays with one entry per flight. Text columns are dictionary
+# encoded as they are read - each distinct value gets a small integer code and only the codes are kept - so memory
+# stays at a few bytes per flight and no chunk's rows outlive the chunk. Every report is then a handful of vectorised
+# operations: the grouping columns are combined into one group number per flight and np.bincount counts the flights
+# of each (group, status) pair in a single pass. Aircraft and airport details are joined on by array lookups.
+# Reading the rows out of SQLite takes most of the time, so all the reports are worked out from one load, or from a
+# snapshot written by flightSnapshot, whose columns are already encoded and only need to be memory-mapped
+
+# Statuses given a column of their own in every report, in this order. Any other status only counts towards Flights
+STATUSES = ["On Time", "Delayed", "Cancelled"]
+
+CHUNK_SIZE = 65536
+
+# Above this many possible groups the group numbers are compacted with np.unique instead of counting into a
+# dense array with one slot per possible group
+MAX_DENSE_GROUPS = 10_000_000
+
+AGE_BAND_YEARS = 5
+
+FLIGHT_COLUMNS_QUERY = """SELECT Airline_Name, Flight_Status, Departure_Airport_IATA, Arrival_Airport_IATA, Aircraft_ID,
+                                 substr(Departure, 1, 10)
+                          FROM Flights"""
+AIRCRAFT_QUERY = "SELECT Aircraft_ID, Aircraft_Model, Age FROM Aircrafts ORDER BY Aircraft_ID"
+
+# Dictionary-encoded columns: name in FlightData -> position in FLIGHT_COLUMNS_QUERY
+ENCODED_COLUMNS = {"airline": 0, "status": 1, "departure_airport": 2, "arrival_airport": 3, "day": 5}
+
+
+# The columns the reports need, one array entry per flight. Dictionary-encoded columns hold codes into
+# labels[name]. The aircraft arrays are sorted by Aircraft_ID
+class FlightData:
+
+    def __init__(self, columns, labels, aircraft_ids, aircraft_models, aircraft_ages, model_labels):
+        self.columns = columns
+        self.labels = labels
+        self.aircraft_ids = aircraft_ids
+        self.aircraft_models = aircraft_models
+        self.aircraft_ages = aircraft_ages
+        self.model_labels = model_labels
+
+    def __len__(self):
+        return len(self.columns["status"])
+
+
+# Read the flights and aircraft into a FlightData, chunk_size rows at a time
+def load_flights(connection, chunk_size=CHUNK_SIZE):
+    dictionaries = {name: Dictionary(STATUSES if name == "status" else ()) for name in ENCODED_COLUMNS}
+    chunks = {name: [] for name in list(ENCODED_COLUMNS) + ["aircraft_id"]}
+
+    cursor = connection.execute(FLIGHT_COLUMNS_QUERY)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        values = list(zip(*rows))
+        for name, position in ENCODED_COLUMNS.items():
+            chunks[name].append(dictionaries[name].codes(values[position]))
+        chunks["aircraft_id"].append(np.array(values[4], dtype=np.int64))
+    cursor.close()
+
+    columns = {name: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64) for name, parts in chunks.items()}
+    aircraft = connection.execute(AIRCRAFT_QUERY).fetchall()
+    models = Dictionary()
+    return FlightData(columns, {name: dictionary.labels for name, dictionary in dictionaries.items()},
+                      np.array([row[0] for row in aircraft], dtype=np.int64),
+                      models.codes([row[1] for row in aircraft]),
+                      np.array([row[2] for row in aircraft], dtype=np.int64), models.labels)
+
+
+# Build a FlightData from a snapshot (see flightSnapshot). The snapshot's dictionary codes are used as they are,
+# except that statuses are recoded so STATUSES come first. Days come from the local Departure timestamps
+def snapshot_flights(snapshot):
+    statuses = Dictionary(STATUSES)
+    status_codes = statuses.codes(snapshot.labels("Flights", "Flight_Status"))
+    departures = snapshot.column("Flights", "Departure")
+
+    # Day numbers since 1970-01-01, counted from the first day so they can be used as codes. Flights whose
+    # Departure couldn't be read as a time get a code of their own after the last day
+    known = departures != NULL_INT
+    days = departures // 86400
+    first_day = int(days[known].min()) if known.any() else 0
+    last_day = int(days[known].max()) if known.any() else -1
+    day_labels = [str(np.datetime64(day, "D")) for day in range(first_day, last_day + 1)]
+    day_codes = np.where(known, days - first_day, len(day_labels))
+    if not known.all():
+        day_labels.append(None)
+
+    columns = {"airline": snapshot.column("Flights", "Airline_Name"),
+               "status": status_codes[snapshot.column("Flights", "Flight_Status")],
+               "departure_airport": snapshot.column("Flights", "Departure_Airport_IATA"),
+               "arrival_airport": snapshot.column("Flights", "Arrival_Airport_IATA"), "day": day_codes,
+               "aircraft_id": snapshot.column("Flights", "Aircraft_ID")}
+    labels = {"airline": snapshot.labels("Flights", "Airline_Name"), "status": statuses.labels,
+              "departure_airport": snapshot.labels("Flights", "Departure_Airport_IATA"),
+              "arrival_airport": snapshot.labels("Flights", "Arrival_Airport_IATA"), "day": day_labels}
+    return FlightData(columns, labels, snapshot.column("Aircrafts", "Aircraft_ID"),
+                      snapshot.column("Aircrafts", "Aircraft_Model"), snapshot.column("Aircrafts", "Age"),
+                      snapshot.labels("Aircrafts", "Aircraft_Model"))
+
+
+# Look up each flight's aircraft. Returns (position in the aircraft arrays, True where the aircraft exists)
+def _aircraft_positions(data):
+    if not len(data.aircraft_ids):
+        return np.zeros(len(data), dtype=np.int64), np.zeros(len(data), dtype=bool)
+    positions = np.searchsorted(data.aircraft_ids, data.columns["aircraft_id"])
+    positions = np.minimum(positions, len(data.aircraft_ids) - 1)
+    return positions, data.aircraft_ids[positions] == data.columns["aircraft_id"]
+
+
+# Count the flights of every status in each group. keys is a list of (codes, number of codes), one per grouping
+# column. Returns (group codes per key, status counts per group), with only the groups that have flights
+def _count_by_status(data, keys):
+    statuses = len(data.labels["status"])
+    sizes = [max(size, 1) for codes, size in keys]
+    groups = np.ravel_multi_index([codes for codes, size in keys], sizes)
+    possible = int(np.prod(sizes, dtype=np.int64))
+    if possible <= MAX_DENSE_GROUPS:
+        counts = np.bincount(groups * statuses + data.columns["status"], minlength=possible * statuses)
+        counts = counts.reshape(possible, statuses)
+        present = np.flatnonzero(counts.sum(axis=1))
+        return np.unravel_index(present, sizes), counts[present]
+    present, groups = np.unique(groups, return_inverse=True)
+    counts = np.bincount(groups * statuses + data.columns["status"], minlength=len(present) * statuses)
+    return np.unravel_index(present, sizes), counts.reshape(len(present), statuses)
+
+
+# Turn grouped status counts into report rows: the group's labels, the number of flights and the percentage
+# with each status. Rows are sorted by number of flights (most first), then by label, and cut off after limit
+# Sort key for a label that orders numbers before text and puts None (e.g. a day a snapshot couldn't place) last,
+# so ties between rows never compare mismatched types
+def _label_key(label):
+    return (label is None, isinstance(label, str), label)
+
+
+def _report(headers, labels, counts, extra_headers=(), extra_columns=(), limit=None):
+    status_labels = STATUSES
+    totals = counts.sum(axis=1)
+    percentages = counts[:, :len(status_labels)] * 100.0 / np.maximum(totals, 1)[:, None]
+    order = sorted(range(len(totals)),
+                   key=lambda index: (-totals[index], [_label_key(label[index]) for label in labels]))
+    rows = []
+    for index in order[:limit]:
+        rows.append([label[index] for label in labels] + [int(totals[index])]
+                    + [round(float(percentage), 1) for percentage in percentages[index]]
+                    + [column[index] for column in extra_columns])
+    return (list(headers) + ["Flights"] + [f"{status} %" for status in status_labels] + list(extra_headers)), rows
+
+
+def _labels(data, name, codes):
+    return [data.labels[name][code] for code in codes]
+
+
+def airline_report(data, limit=None):
+    (airlines,), counts = _count_by_status(data, [(data.columns["airline"], len(data.labels["airline"]))])
+    return _report(["Airline_Name"], [_labels(data, "airline", airlines)], counts, limit=limit)
+
+
+def route_report(data, limit=None):
+    airports = len(data.labels["departure_airport"]), len(data.labels["arrival_airport"])
+    (departures, arrivals), counts = _count_by_status(
+        data, [(data.columns["departure_airport"], airports[0]), (data.columns["arrival_airport"], airports[1])])
+    return _report(["Departure_Airport_IATA", "Arrival_Airport_IATA"],
+                   [_labels(data, "departure_airport", departures), _labels(data, "arrival_airport", arrivals)],
+                   counts, limit=limit)
+
+
+def airport_day_report(data, limit=None):
+    (airports, days), counts = _count_by_status(
+        data, [(data.columns["departure_airport"], len(data.labels["departure_airport"])),
+               (data.columns["day"], len(data.labels["day"]))])
+    return _report(["Departure_Airport_IATA", "Date"],
+                   [_labels(data, "departure_airport", airports), _labels(data, "day", days)], counts, limit=limit)
+
+
+# Flights whose aircraft isn't in Aircrafts are grouped under "Unknown"
+def model_report(data, limit=None):
+    positions, known = _aircraft_positions(data)
+    unknown = len(data.model_labels)
+    models = np.where(known, data.aircraft_models[positions] if len(data.aircraft_ids) else unknown, unknown)
+    (codes,), counts = _count_by_status(data, [(models, unknown + 1)])
+
+    # Average age of the aircraft flown, weighted by flights
+    ages = np.where(known, data.aircraft_ages[positions] if len(data.aircraft_ids) else 0, 0)
+    age_totals = np.bincount(models, weights=ages, minlength=unknown + 1)
+    known_flights = np.bincount(models[known], minlength=unknown + 1)
+    average_ages = [round(float(age_totals[code] / known_flights[code]), 1) if known_flights[code] else None
+                    for code in codes]
+    labels = [data.model_labels[code] if code < unknown else "Unknown" for code in codes]
+    return _report(["Aircraft_Model"], [labels], counts, ["Average_Age"], [average_ages], limit=limit)
+
+
+def age_report(data, limit=None):
+    positions, known = _aircraft_positions(data)
+    ages = np.where(known, data.aircraft_ages[positions] if len(data.aircraft_ids) else 0, 0)
+    bands = np.where(known, ages // AGE_BAND_YEARS + 1, 0)
+    (codes,), counts = _count_by_status(data, [(bands, int(bands.max(initial=0)) + 1)])
+    labels = [f"{(code - 1) * AGE_BAND_YEARS}-{code * AGE_BAND_YEARS - 1} years" if code else "Unknown"
+              for code in codes]
+    return _report(["Aircraft_Age"], [labels], counts, limit=limit)
+
+
+REPORTS = {"airline": airline_report, "route": route_report, "model": model_report, "age": age_report,
+           "airport-day": airport_day_report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on-time, delay and cancellation rates.")
+    parser.add_argument("reports", nargs="*", help=f"Reports to print: {', '.join(REPORTS)} (default: all of them)")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--snapshot", help="Work from a snapshot directory written by flightSnapshot instead")
+    parser.add_argument("--limit", type=int, help="Maximum number of rows per report")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="grid", help="How the reports are printed")
+    args = parser.parse_args()
+    unknown = [name for name in args.reports if name not in REPORTS]
+    if unknown:
+        parser.error(f"unknown report {unknown[0]!r} (choose from {', '.join(REPORTS)})")
+    set_output_mode(args.output)
+
+    started = time.perf_counter()
+    if args.snapshot:
+        data = snapshot_flights(load_snapshot(args.snapshot))
+    else:
+        configure_pool(database=args.database)
+        connection = connect_to_db()
+        try:
+            data = load_flights(connection)
+        finally:
+            connection.close()
+    loaded = time.perf_counter()
+
+    names = args.reports or list(REPORTS)
+    for name in names:
+        headers, rows = REPORTS[name](data, args.limit)
+        print(f"\n{name} report:")
+        print_table(rows, headers)
+    print(f"\nLoaded {len(data):,} flights in {loaded - started:.2f}s, "
+          f"worked out {len(names)} report{'s' if len(names) > 1 else ''} in {time.perf_counter() - loaded:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+from connectionPool import configure_pool, connect_to_db, get_pool
+from databaseSchema import create_schema
+import changeLog
+import flightQueries
+import flightStore
+import routeNetwork
+
+# HTTP/JSON service exposing the flight operations, so many clients can query the database at once instead of one
+# operator at a time through the menu. Requests are handled on an asyncio event loop; the flightQueries functions
+# block, so they run on threads:
+#  - reads run on a bounded pool of reader threads, each using its own pooled connection. In WAL mode they all read
+#    at the same time
+#  - writes are queued to a single writer thread and applied one after another, so they never wait on each other
+#    for SQLite's write lock
+#
+#   GET    /flights?after=0&limit=500           Flights in Flight_ID order, a page at a time
+#   GET    /flights?column=Flight_Status&value=Delayed
+#   GET    /flights/search?Airline_Name=Emirates&Flight_Status=Delayed,Cancelled&Departure_from=2025-01-06
+#              &Departure_to=2025-01-13&order_by=Departure&desc=1&limit=100
+#                                               Every condition must match. Comma-separated values match any of them
+#   GET    /departures?from=2025-01-06T09:00%2B01:00&to=2025-01-06T12:00%2B01:00
+#   GET    /arrivals?from=...&to=...            Flights departing/arriving in a window of time across every airport.
+#                                               Times are ISO 8601 (UTC unless they have an offset) or epoch seconds
+#   GET    /flights/<id>
+#   POST   /flights                             Body: the Flights columns apart from Flight_ID
+#   PATCH  /flights/<id>                        Body: {"column": value, ...}
+#   DELETE /flights/<id>
+#   POST   /flights/<id>/pilots                 Body: {"Pilot_ID": ..., "Role": ...}
+#   GET    /pilots/<id>/schedule
+#   GET    /destinations/<iata>
+#   GET    /destinations/<iata>/count?status=Delayed
+#   GET    /connections?from=LHR&to=SYD&after=2025-01-06T09:00&limit=5&legs=3&connection_minutes=60
+#                                               The fastest itineraries of up to legs flights, in departure order
+#   GET    /metrics                             Request counts and latency percentiles for every endpoint
+
+MAX_PAGE_SIZE = 5000
+MAX_BODY_BYTES = 1024 * 1024
+# Seconds a client connection can sit idle between requests before it is closed
+KEEP_ALIVE_TIMEOUT = 15.0
+# Number of recent latencies kept per endpoint for the percentiles in /metrics
+LATENCY_WINDOW = 2048
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 410: "Gone", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Metrics name for requests that didn't match a route, so clients can't grow the metrics without limit
+UNKNOWN_ENDPOINT = "unknown"
+# Methods a 405 is recorded under along with the route it matched. Anything else is counted as unknown
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Flights columns a client must give when adding a flight, in add_flight() argument order
+NEW_FLIGHT_COLUMNS = flightQueries.FLIGHT_COLUMNS[1:]
+
+
+# Raised by a handler to send an error response. endpoint is the route a 405 matched, for the metrics
+class RequestError(Exception):
+
+    def __init__(self, status, message, endpoint=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.endpoint = endpoint
+
+
+# Turn rows into a list of dicts keyed by column name
+def as_records(rows, columns):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def int_parameter(query, name, default):
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        raise RequestError(400, f"{name} must be a whole number.")
+
+
+def json_body(body):
+    try:
+        document = json.loads(body or b"{}")
+    except ValueError:
+        raise RequestError(400, "The request body must be JSON.")
+    if not isinstance(document, dict):
+        raise RequestError(400, "The request body must be a JSON object.")
+    return document
+
+
+# Handlers. Each one is called on a reader or writer thread with the values captured from the path, the query
+# string and the request body, and returns (status, JSON-serialisable result)
+
+def get_flights(query, body):
+    column = query.get("column")
+    if column is not None:
+        if "value" not in query:
+            raise RequestError(400, "Searching by column needs a value.")
+        try:
+            rows = flightQueries.find_flights(column, query["value"])
+        except ValueError as error:
+            raise RequestError(400, str(error))
+        return 200, {"flights": as_records(rows, flightQueries.FLIGHT_COLUMNS)}
+
+    after = int_parameter(query, "after", flightQueries.FIRST_KEY)
+    limit = min(max(int_parameter(query, "limit", flightQueries.DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    rows = flightQueries.flights_page(after, limit)
+    # Clients ask for the next page with ?after=<next_after>
+    next_after = rows[-1][0] if len(rows) == limit else None
+    return 200, {"flights": as_records(rows, flightQueries.FLIGHT_COLUMNS), "next_after": next_after}
+
+
+def search_flights(query, body):
+    equals, one_of, between = {}, {}, {}
+    for name, value in query.items():
+        if name in ("order_by", "desc", "limit"):
+            continue
+        column, _, bound = name.rpartition("_")
+        if bound in ("from", "to") and column in flightQueries.SEARCH_COLUMNS:
+            # UTC bounds can be epoch seconds as well as ISO 8601 times, as for /departures
+            if column in flightQueries.UTC_COLUMNS and value.lstrip("-").isdigit():
+                value = int(value)
+            start, end = between.get(column, (None, None))
+            between[column] = (value, end) if bound == "from" else (start, value)
+        elif "," in value:
+            one_of[name] = value.split(",")
+        else:
+            equals[name] = value
+
+    limit = min(max(int_parameter(query, "limit", flightQueries.DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    try:
+        rows = flightQueries.search_flights(equals, one_of, between, query.get("order_by", "Departure"),
+                                            query.get("desc", "0") not in ("0", "false", ""), limit)
+    except ValueError as error:
+        raise RequestError(400, str(error))
+    return 200, {"flights": as_records(rows, flightQueries.FLIGHT_COLUMNS)}
+
+
+def time_window(query, window):
+    if "from" not in query or "to" not in query:
+        raise RequestError(400, "Give the window with from and to.")
+    try:
+        start, end = (int(query[name]) if query[name].lstrip("-").isdigit() else query[name] for name in ("from", "to"))
+        rows = window(start, end)
+    except ValueError as error:
+        raise RequestError(400, f"from and to must be ISO 8601 times or epoch seconds ({error}).")
+    return 200, {"flights": as_records(rows, flightQueries.FLIGHT_COLUMNS)}
+
+
+def get_departures(query, body):
+    return time_window(query, flightQueries.departures_between)
+
+
+def get_arrivals(query, body):
+    return time_window(query, flightQueries.arrivals_between)
+
+
+def get_flight(query, body, flight_id):
+    rows = flightQueries.find_flights("Flight_ID", int(flight_id))
+    if not rows:
+        raise RequestError(404, f"No flight with ID {flight_id}.")
+    return 200, as_records(rows, flightQueries.FLIGHT_COLUMNS)[0]
+
+
+def add_flight(query, body):
+    flight = json_body(body)
+    missing = [column for column in NEW_FLIGHT_COLUMNS if flight.get(column) in (None, "")]
+    if missing:
+        raise RequestError(400, f"Missing {', '.join(missing)}.")
+    flight_id = flightQueries.add_flight(*(flight[column] for column in NEW_FLIGHT_COLUMNS))
+    return 201, {"Flight_ID": flight_id}
+
+
+def update_flight(query, body, flight_id):
+    changes = json_body(body)
+    if not changes:
+        raise RequestError(400, "Give at least one column to change.")
+    # Check every column before writing any, so a bad one leaves the flight as it was
+    invalid = [column for column in changes if column not in NEW_FLIGHT_COLUMNS]
+    if invalid:
+        raise RequestError(400, f"Can't change {', '.join(map(repr, invalid))}; nothing was changed.")
+    outcomes = flightQueries.update_flights([(flight_id, column, value) for column, value in changes.items()])
+    if flightQueries.NO_SUCH_FLIGHT in outcomes:
+        raise RequestError(404, f"No flight with ID {flight_id}.")
+    return 200, {"outcomes": dict(zip(changes, outcomes))}
+
+
+def remove_flight(query, body, flight_id):
+    if not flightQueries.remove_flight(int(flight_id)):
+        raise RequestError(404, f"No flight with ID {flight_id}.")
+    return 200, {"removed": int(flight_id)}
+
+
+def assign_pilot(query, body, flight_id):
+    assignment = json_body(body)
+    if assignment.get("Pilot_ID") in (None, "") or assignment.get("Role") in (None, ""):
+        raise RequestError(400, "Missing Pilot_ID or Role.")
+    outcome = flightQueries.assign_pilot(int(flight_id), assignment["Pilot_ID"], assignment["Role"])
+    status = {flightQueries.ASSIGNED: 201, flightQueries.NO_SUCH_FLIGHT: 404, flightQueries.NO_SUCH_PILOT: 404,
+              flightQueries.ALREADY_ASSIGNED: 409, flightQueries.SCHEDULE_CONFLICT: 409}[outcome]
+    if outcome == flightQueries.SCHEDULE_CONFLICT:
+        conflicts = flightQueries.pilot_conflicts(assignment["Pilot_ID"], int(flight_id))
+        return status, {"outcome": outcome, "conflicts": as_records(conflicts, flightQueries.FLIGHT_COLUMNS)}
+    return status, {"outcome": outcome}
+
+
+def get_schedule(query, body, pilot_id):
+    rows = flightQueries.pilot_schedule(int(pilot_id))
+    if not rows and not flightQueries.pilot_exists(int(pilot_id)):
+        raise RequestError(404, f"No pilot with ID {pilot_id}.")
+    return 200, {"schedule": as_records(rows, flightQueries.SCHEDULE_COLUMNS)}
+
+
+def get_destination(query, body, iata):
+    rows = flightQueries.flights_to(iata.upper())
+    return 200, {"flights": as_records(rows, flightQueries.DESTINATION_COLUMNS)}
+
+
+def get_destination_count(query, body, iata):
+    return 200, {"Airport_IATA": iata.upper(),
+                 "Flight_Status": query.get("status"),
+                 "count": flightQueries.count_flights_to(iata.upper(), query.get("status"))}
+
+
+def get_connections(query, body):
+    if "from" not in query or "to" not in query or "after" not in query:
+        raise RequestError(400, "Give the airports with from and to, and the earliest departure with after.")
+    limit = min(max(int_parameter(query, "limit", 5), 1), 50)
+    legs = min(max(int_parameter(query, "legs", routeNetwork.DEFAULT_MAX_LEGS), 1), routeNetwork.DEFAULT_MAX_LEGS)
+    connection_minutes = int_parameter(query, "connection_minutes", routeNetwork.DEFAULT_CONNECTION_MINUTES)
+    try:
+        itineraries = routeNetwork.find_connections(query["from"], query["to"], query["after"], limit, legs,
+                                                    connection_minutes)
+    except ValueError as error:
+        raise RequestError(400, f"after must be an ISO 8601 time ({error}).")
+    return 200, {"itineraries": [as_records(itinerary, flightQueries.FLIGHT_COLUMNS) for itinerary in itineraries]}
+
+
+# Changes after ?since= from the change log, for clients keeping their own copy of the data in step.
+# 410 Gone means changes they needed have been pruned and they must start again from the tables
+def get_changes(query, body):
+    since = int_parameter(query, "since", 0)
+    limit = min(max(int_parameter(query, "limit", changeLog.DEFAULT_BATCH_SIZE), 1), MAX_PAGE_SIZE)
+    try:
+        changes = changeLog.changes_since(since, limit, [query["table"]] if "table" in query else None)
+    except changeLog.ChangesPruned as error:
+        raise RequestError(410, str(error))
+    # Clients ask for the next changes with ?since=<next_since>
+    return 200, {"changes": as_records(changes, changeLog.CHANGE_COLUMNS),
+                 "next_since": changes[-1][0] if changes else since}
+
+
+# (method, endpoint name used in /metrics, path pattern, handler, True if the handler writes)
+ROUTES = [
+    ("GET", "/flights", r"/flights", get_flights, False),
+    ("POST", "/flights", r"/flights", add_flight, True),
+    ("GET", "/flights/search", r"/flights/search", search_flights, False),
+    ("GET", "/flights/{id}", r"/flights/(\d+)", get_flight, False),
+    ("PATCH", "/flights/{id}", r"/flights/(\d+)", update_flight, True),
+    ("DELETE", "/flights/{id}", r"/flights/(\d+)", remove_flight, True),
+    ("POST", "/flights/{id}/pilots", r"/flights/(\d+)/pilots", assign_pilot, True),
+    ("GET", "/departures", r"/departures", get_departures, False),
+    ("GET", "/arrivals", r"/arrivals", get_arrivals, False),
+    ("GET", "/pilots/{id}/schedule", r"/pilots/(\d+)/schedule", get_schedule, False),
+    ("GET", "/destinations/{iata}", r"/destinations/([A-Za-z]{3})", get_destination, False),
+    ("GET", "/destinations/{iata}/count", r"/destinations/([A-Za-z]{3})/count", get_destination_count, False),
+    ("GET", "/connections", r"/connections", get_connections, False),
+    ("GET", "/changes", r"/changes", get_changes, False),
+]
+ROUTES = [(method, name, re.compile(pattern + "/?"), handler, writes) for method, name, pattern, handler, writes in ROUTES]
+
+
+# Request counts, status codes and latencies for each endpoint. Only updated from the event loop thread
+class EndpointMetrics:
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = Counter()
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, status, seconds):
+        self.requests += 1
+        self.statuses[status] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000 if recent else None
+
+        return {"requests": self.requests, "statuses": {str(status): count for status, count in self.statuses.items()},
+                "mean_ms": self.total_seconds / self.requests * 1000 if self.requests else None,
+                "p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99),
+                "max_ms": self.max_seconds * 1000}
+
+
+class FlightService:
+
+    def __init__(self, readers=4):
+        self.readers = readers
+        self._read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="reader")
+        # One thread means one write at a time, in the order they arrived
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self.metrics = {}
+        self.queued_writes = 0
+        self.started = time.time()
+
+    # Find the handler for a request. Returns (endpoint name, handler, writes, path values)
+    def route(self, method, path):
+        allowed = None
+        for route_method, name, pattern, handler, writes in ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                if route_method == method:
+                    return name, handler, writes, match.groups()
+                allowed = name
+        if allowed is not None:
+            raise RequestError(405, f"{method} is not supported for {path}.", allowed)
+        raise RequestError(404, f"Unknown endpoint {path}.")
+
+    async def handle(self, method, target, body):
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        if method == "GET" and url.path.rstrip("/") == "/metrics":
+            return "GET /metrics", 200, self.metrics_report()
+
+        name = UNKNOWN_ENDPOINT
+        try:
+            endpoint, handler, writes, values = self.route(method, url.path)
+            name = f"{method} {endpoint}"
+            loop = asyncio.get_running_loop()
+            if writes:
+                self.queued_writes += 1
+                try:
+                    status, result = await loop.run_in_executor(self._write_executor, handler, query, body, *values)
+                finally:
+                    self.queued_writes -= 1
+            else:
+                status, result = await loop.run_in_executor(self._read_executor, handler, query, body, *values)
+        except RequestError as error:
+            status, result = error.status, {"error": error.message}
+            if error.endpoint is not None and method in HTTP_METHODS:
+                name = f"{method} {error.endpoint}"
+        except Exception as error:
+            status, result = 500, {"error": f"{type(error).__name__}: {error}"}
+        return name, status, result
+
+    def metrics_report(self):
+        return {"uptime_seconds": time.time() - self.started,
+                "reader_threads": self.readers,
+                "queued_writes": self.queued_writes,
+                "connection_pool": get_pool().stats(),
+                "query_cache": flightQueries.query_cache.stats(),
+                "endpoints": {name: metrics.summary() for name, metrics in sorted(self.metrics.items())}}
+
+    # name is always a route's name or UNKNOWN_ENDPOINT (see handle()), never a path from the request
+    def record(self, name, status, seconds):
+        self.metrics.setdefault(name, EndpointMetrics()).record(status, seconds)
+
+    # Serve one client connection. HTTP/1.1 connections are kept open for further requests
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                started = time.perf_counter()
+                method, target, version, headers, body = request
+                if isinstance(body, RequestError):
+                    name, status, result = UNKNOWN_ENDPOINT, body.status, {"error": body.message}
+                else:
+                    name, status, result = await self.handle(method, target, body)
+
+                # A body that couldn't be read is still waiting on the connection, so it can't be reused
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                              and not isinstance(body, RequestError))
+                await write_response(writer, status, result, keep_alive)
+                self.record(name, status, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self._read_executor.shutdown()
+        self._write_executor.shutdown()
+
+
+# Read one request. Returns (method, target, version, headers, body) or None if the client closed the connection.
+# body is a RequestError instead if Content-Length isn't a number of bytes or is larger than MAX_BODY_BYTES
+async def read_request(reader):
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        return None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        return method.upper(), target, version, headers, RequestError(400, "Content-Length must be a number of bytes.")
+    if length > MAX_BODY_BYTES:
+        return method.upper(), target, version, headers, RequestError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+async def write_response(writer, status, result, keep_alive):
+    body = json.dumps(result, default=str).encode()
+    writer.write((f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                  "Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n"
+                  f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(host, port, readers):
+    service = FlightService(readers)
+    server = await asyncio.start_server(service.serve_client, host, port)
+    print(f"Serving flight queries on http://{host}:{port} with {readers} reader threads")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the flight operations over HTTP as JSON.")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to serve")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--readers", type=int, default=4, help="Number of threads running read queries")
+    parser.add_argument("--flight-store", action="store_true",
+                        help="Hold Flights in memory and answer lookups from there (only when no other process writes)")
+    args = parser.parse_args()
+
+    # One connection per reader thread plus one for the writer, so no thread ever waits for a connection
+    configure_pool(database=args.database, size=args.readers + 1)
+    connection = connect_to_db()
+    try:
+        create_schema(connection)
+    finally:
+        connection.close()
+    if args.flight_store:
+        flightStore.enable_flight_store()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.readers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+from connectionPool import configure_pool, connect_to_db
+
+# Columnar snapshots of the database for analysis away from the live file. Each column of each table is written to
+# its own NumPy .npy file, and snapshot.json (the manifest) lists the files with how each column is encoded:
+#  - plain: int64 values
+#  - timestamp: the local Departure/Arrival times as int64 seconds since 1970-01-01 00:00 (wall-clock time, so
+#    the value reads the same as the text). The arrays can be viewed as datetime64[s] without copying
+#  - dictionary: the distinct values are stored once, sorted, in the manifest, and the column holds each row's
+#    position in that list in the smallest unsigned integer type that fits. IATA codes, statuses and the other
+#    text columns take one or two bytes per row this way
+# NULLs in int64 columns are stored as NULL_INT, which is also how datetime64 represents NaT.
+#
+# Every table is read inside one read transaction, so the snapshot is consistent even while other connections are
+# writing (in WAL mode the writers aren't held up either). Files are written to <directory>.partial and only moved
+# into place once they are all complete. load_snapshot() memory-maps the files back, so opening a snapshot reads
+# nothing until a column is used and the data is shared with the OS page cache rather than copied
+
+SNAPSHOT_FORMAT = 1
+MANIFEST = "snapshot.json"
+CHUNK_SIZE = 65536
+NULL_INT = -2 ** 63
+
+# Columns exported from each table with their encoding, and the order the rows are written in
+SNAPSHOT_TABLES = {
+    "Flights": [("Flight_ID", "plain"), ("Flight_Number", "plain"), ("Airline_Name", "dictionary"),
+                ("Aircraft_ID", "plain"), ("Departure", "timestamp"), ("Arrival", "timestamp"),
+                ("Flight_Status", "dictionary"), ("Departure_Airport_IATA", "dictionary"),
+                ("Arrival_Airport_IATA", "dictionary"), ("Departure_UTC", "plain"), ("Arrival_UTC", "plain")],
+    "Flight_Pilot": [("Flight_ID", "plain"), ("Pilot_ID", "plain"), ("Role", "dictionary")],
+    "Pilots": [("Pilot_ID", "plain"), ("Full_Name", "dictionary"), ("Licence_Number", "dictionary"),
+               ("Rank", "dictionary"), ("Years_Of_Experience", "plain")],
+    "Aircrafts": [("Aircraft_ID", "plain"), ("Aircraft_Model", "dictionary"), ("Age", "plain"),
+                  ("Registration_Number", "dictionary")],
+    "Airports": [("Airport_IATA", "dictionary"), ("City", "dictionary"), ("Country", "dictionary"),
+                 ("Timezone", "dictionary")]
+}
+SNAPSHOT_ORDER = {"Flights": "Flight_ID", "Flight_Pilot": "Flight_ID, Pilot_ID", "Pilots": "Pilot_ID",
+                  "Aircrafts": "Aircraft_ID", "Airports": "Airport_IATA"}
+
+
+# Grows a dictionary of the distinct values in one column. codes() returns the code of every value in a chunk
+class Dictionary:
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.codes_by_label = {label: code for code, label in enumerate(self.labels)}
+
+    def codes(self, values):
+        for value in set(values) - self.codes_by_label.keys():
+            self.codes_by_label[value] = len(self.labels)
+            self.labels.append(value)
+        return np.fromiter(map(self.codes_by_label.__getitem__, values), np.int32, len(values))
+
+
+# The smallest unsigned integer type that can hold codes for this many labels
+def code_dtype(labels):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if labels <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def _int64_values(values):
+    # Checking for None first keeps the common case (no NULLs) a single conversion in C
+    if None in values:
+        values = [NULL_INT if value is None else value for value in values]
+    return np.array(values, dtype=np.int64)
+
+
+def _label_order(label):
+    if label is None:
+        return (0, 0)
+    if isinstance(label, str):
+        return (2, label)
+    return (1, label)
+
+
+# Write one table's columns into directory. Returns the table's manifest entry
+def _export_table(connection, directory, table, columns, chunk_size):
+    rows = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    selected = [f"CAST(strftime('%s', {column}) AS INTEGER)" if encoding == "timestamp" else column
+                for column, encoding in columns]
+
+    # Columns are written straight into memory-mapped .npy files as the chunks arrive. Dictionary codes go into a
+    # temporary int32 file first, because the final code of a value isn't known until every value has been seen
+    outputs = {}
+    dictionaries = {}
+    for column, encoding in columns:
+        if encoding == "dictionary":
+            dictionaries[column] = Dictionary()
+            path = os.path.join(directory, f"{table}.{column}.codes.tmp.npy")
+            outputs[column] = np.lib.format.open_memmap(path, mode="w+", dtype=np.int32, shape=(rows,))
+        else:
+            path = os.path.join(directory, f"{table}.{column}.npy")
+            outputs[column] = np.lib.format.open_memmap(path, mode="w+", dtype=np.int64, shape=(rows,))
+
+    cursor = connection.execute(f"SELECT {', '.join(selected)} FROM {table} ORDER BY {SNAPSHOT_ORDER[table]}")
+    position = 0
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        for (column, encoding), values in zip(columns, zip(*chunk)):
+            if encoding == "dictionary":
+                outputs[column][position:position + len(chunk)] = dictionaries[column].codes(values)
+            else:
+                outputs[column][position:position + len(chunk)] = _int64_values(values)
+        position += len(chunk)
+    cursor.close()
+
+    entry = {"rows": rows, "columns": {}}
+    for column, encoding in columns:
+        output = outputs.pop(column)
+        output.flush()
+        if encoding != "dictionary":
+            entry["columns"][column] = {"file": f"{table}.{column}.npy", "encoding": encoding, "dtype": "int64",
+                                        "null": NULL_INT}
+            del output
+            continue
+
+        # Sort the dictionary (NULL first, then any numbers SQLite stored in the column, then text) and rewrite the
+        # codes to match, in the smallest type that fits
+        labels = dictionaries[column].labels
+        order = sorted(range(len(labels)), key=lambda code: _label_order(labels[code]))
+        dtype = code_dtype(len(labels))
+        recode = np.empty(len(labels), dtype=dtype)
+        recode[order] = np.arange(len(labels), dtype=dtype)
+        final = np.lib.format.open_memmap(os.path.join(directory, f"{table}.{column}.npy"), mode="w+",
+                                          dtype=dtype, shape=(rows,))
+        for start in range(0, rows, chunk_size * 16):
+            final[start:start + chunk_size * 16] = recode[output[start:start + chunk_size * 16]]
+        final.flush()
+        temporary = output.filename
+        del output, final
+        os.remove(temporary)
+        entry["columns"][column] = {"file": f"{table}.{column}.npy", "encoding": "dictionary", "dtype": dtype.name,
+                                    "dictionary": [labels[code] for code in order]}
+    return entry
+
+
+# Export every table in SNAPSHOT_TABLES to directory, replacing any snapshot already there. Returns the manifest
+def export_snapshot(connection, directory, chunk_size=CHUNK_SIZE):
+    partial = directory.rstrip("/\\") + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    manifest = {"format": SNAPSHOT_FORMAT, "created": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+    # The first SELECT starts the read transaction; every later one sees the database as it was at that moment
+    connection.execute("BEGIN")
+    try:
+        for table, columns in SNAPSHOT_TABLES.items():
+            manifest["tables"][table] = _export_table(connection, partial, table, columns, chunk_size)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    finally:
+        # Nothing was written, so ending the transaction with a rollback just releases the snapshot
+        connection.rollback()
+
+    with open(os.path.join(partial, MANIFEST), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(partial, directory)
+    return manifest
+
+
+# A snapshot opened for reading. Columns are memory-mapped the first time they are asked for
+class Snapshot:
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{directory} holds a snapshot in format {self.manifest.get('format')}, "
+                             f"expected {SNAPSHOT_FORMAT}.")
+        self._arrays = {}
+
+    def rows(self, table):
+        return self.manifest["tables"][table]["rows"]
+
+    def _column_entry(self, table, column):
+        try:
+            return self.manifest["tables"][table]["columns"][column]
+        except KeyError:
+            raise KeyError(f"The snapshot has no column {table}.{column}.")
+
+    # The stored array for a column: values for plain and timestamp columns, codes for dictionary columns
+    def column(self, table, column):
+        key = (table, column)
+        if key not in self._arrays:
+            entry = self._column_entry(table, column)
+            self._arrays[key] = np.load(os.path.join(self.directory, entry["file"]), mmap_mode="r")
+        return self._arrays[key]
+
+    # The sorted distinct values of a dictionary column; a row's code is its position in this list
+    def labels(self, table, column):
+        return self._column_entry(table, column)["dictionary"]
+
+    # A timestamp column as datetime64[s], without copying. NULLs come out as NaT
+    def timestamps(self, table, column):
+        return self.column(table, column).view("datetime64[s]")
+
+    # A dictionary column's values, as an object array (this one does build a new array)
+    def decode(self, table, column):
+        return np.array(self.labels(table, column), dtype=object)[self.column(table, column)]
+
+    def size_in_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.directory, entry["file"]))
+                   for table in self.manifest["tables"].values() for entry in table["columns"].values())
+
+
+def load_snapshot(directory):
+    return Snapshot(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the database to a columnar snapshot, or describe one.")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to export")
+    parser.add_argument("--directory", default="snapshot", help="Snapshot directory")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        configure_pool(database=args.database, size=1)
+        connection = connect_to_db()
+        started = time.perf_counter()
+        try:
+            export_snapshot(connection, args.directory)
+        finally:
+            connection.close()
+        print(f"Exported {args.database} to {args.directory} in {time.perf_counter() - started:.2f}s")
+
+    snapshot = load_snapshot(args.directory)
+    print(f"Snapshot created {snapshot.manifest['created']}, {snapshot.size_in_bytes():,} bytes")
+    for table, entry in snapshot.manifest["tables"].items():
+        print(f"  {table}: {entry['rows']:,} rows")
+        for column, details in entry["columns"].items():
+            encoding = details["encoding"]
+            if encoding == "dictionary":
+                encoding += f", {len(details['dictionary']):,} values"
+            print(f"    {column:<24} {details['dtype']:<7} {encoding}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import date
+from connectionPool import configure_pool, connect_to_db
+import flightQueries
+
+# An in-process replica of the Flights table for read-mostly deployments. Each column is held as a typed array with
+# one entry per row ("slot") instead of one tuple per flight:
+#  - Flight_ID, Flight_Number and Aircraft_ID as int64
+#  - Departure and Arrival as int64 seconds since 1970-01-01 00:00, in the same wall-clock time as the text
+#  - Airline_Name, Flight_Status and the IATA codes interned: each distinct value is stored once and the rows hold
+#    its code as a one, two or four byte integer, widened as more values appear
+# A value that doesn't fit its column's type (a NULL, or text SQLite kept in an INTEGER column) is kept as it is in
+# a small per-column dictionary, so rows always read back exactly as the database holds them.
+#
+# Hash indexes on the arrival airport, departure airport and aircraft map each value to its slots. The airport
+# indexes keep their slots in arrival or departure time order, as the database's own indexes do, so
+# view_destination_info's rows come back in the same order. Arrivals per airport and status are counted as rows
+# come and go, so counting flights to an airport doesn't look at any rows.
+#
+# The store is loaded from the database when it is enabled and kept in step through flightQueries' write
+# listeners, like the route network: written flights are re-read by Flight_ID and their slots updated in place.
+# Writes made by other processes aren't seen, so it should only be enabled where this process does all the writing
+
+# Flight_IDs of free slots are set to this, which is below any real key
+FREE_SLOT = flightQueries.FIRST_KEY
+
+LOAD_QUERY = flightQueries.ALL_FLIGHTS_QUERY + " ORDER BY Flight_ID"
+AIRPORTS_QUERY = "SELECT Airport_IATA, City, Country FROM Airports"
+CHUNK_SIZE = 65536
+
+# Indexed column -> the columns its slots are ordered by (Flight_ID breaks ties)
+INDEXES = {"Arrival_Airport_IATA": ["Arrival"], "Departure_Airport_IATA": ["Departure"], "Aircraft_ID": []}
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+# The value SQLite compares an INTEGER column with: text that reads as a number is converted to one
+def _integer_operand(value):
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# The value SQLite compares a TEXT column with: numbers are converted to text
+def _text_operand(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+# An int64 column. Values that aren't integers in range are kept in exceptions, with 0 in the array
+class IntColumn:
+    __slots__ = ("values", "exceptions")
+
+    def __init__(self):
+        self.values = array("q")
+        self.exceptions = {}
+
+    def encode(self, value):
+        if type(value) is int and INT64_MIN <= value <= INT64_MAX:
+            return value
+        return None
+
+    def decode(self, stored):
+        return stored
+
+    def operand(self, value):
+        return _integer_operand(value)
+
+    # Set a slot's value. A slot one past the end is appended
+    def set(self, slot, value):
+        stored = self.encode(value)
+        if stored is None:
+            self.exceptions[slot] = value
+            stored = 0
+        elif self.exceptions:
+            self.exceptions.pop(slot, None)
+        if slot == len(self.values):
+            self.values.append(stored)
+        else:
+            self.values[slot] = stored
+
+    # Append a chunk of values. The whole chunk is converted in one go unless some values need to be exceptions
+    def extend(self, values):
+        try:
+            self.values.extend(array("q", values))
+        except (TypeError, OverflowError):
+            for value in values:
+                self.set(len(self.values), value)
+
+    def get(self, slot):
+        if self.exceptions and slot in self.exceptions:
+            return self.exceptions[slot]
+        return self.decode(self.values[slot])
+
+    # Exceptions sort after every value that fits in the array
+    def sort_key(self, slot):
+        if self.exceptions and slot in self.exceptions:
+            return INT64_MAX + 1
+        return self.values[slot]
+
+    # sort_key() of every slot
+    def sort_keys(self):
+        keys = self.values.tolist()
+        for slot in self.exceptions:
+            keys[slot] = INT64_MAX + 1
+        return keys
+
+    # get() of every slot
+    def all_values(self):
+        values = list(map(self.decode, self.values))
+        for slot, exception in self.exceptions.items():
+            values[slot] = exception
+        return values
+
+    # Slots whose value equals value, compared the way SQLite would compare them, in slot order
+    def matching(self, value):
+        value = self.operand(value)
+        if value is None:
+            return []
+        slots = [slot for slot, exception in self.exceptions.items() if exception == value]
+        stored = self.encode(value)
+        if stored is not None:
+            # array.index() does the scanning in C, so only the matches cost any Python
+            values = self.values
+            slot = -1
+            while True:
+                try:
+                    slot = values.index(stored, slot + 1)
+                except ValueError:
+                    break
+                if slot not in self.exceptions:
+                    slots.append(slot)
+        return sorted(slots)
+
+    def memory_bytes(self):
+        return self.values.itemsize * len(self.values) + sys.getsizeof(self.exceptions)
+
+
+# Departure or Arrival. Times written like 2025-01-06T14:30 (as everything in this database is) are stored as
+# seconds and formatted back on the way out; anything else is kept as an exception
+class TimeColumn(IntColumn):
+    __slots__ = ("_days", "_day_numbers")
+
+    def __init__(self):
+        super().__init__()
+        self._days = {}         # Day number -> "YYYY-MM-DD", for formatting
+        self._day_numbers = {}  # "YYYY-MM-DD" -> day number (or None if it isn't a date), for parsing
+
+    def encode(self, value):
+        if (type(value) is str and len(value) == 16 and value.isascii() and value[10] == "T" and value[13] == ":"
+                and value[11:13].isdigit() and value[14:16].isdigit()):
+            day = self._day_numbers.get(value[:10], -1)
+            if day == -1:
+                day = self._day_numbers[value[:10]] = self._day_number(value[:10])
+            hour, minute = int(value[11:13]), int(value[14:16])
+            if day is not None and hour < 24 and minute < 60:
+                return day * 86400 + hour * 3600 + minute * 60
+        return None
+
+    # Days since 1970-01-01 of a YYYY-MM-DD date, or None if it isn't one
+    @staticmethod
+    def _day_number(text):
+        if len(text) != 10 or text[4] != "-" or text[7] != "-":
+            return None
+        try:
+            return date.fromisoformat(text).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            return None
+
+    def decode(self, stored):
+        day, seconds = divmod(stored, 86400)
+        text = self._days.get(day)
+        if text is None:
+            text = self._days[day] = date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+        return f"{text}T{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+    # Times repeat a lot (every flight leaving in the same minute), so each distinct one in the chunk is parsed once
+    def extend(self, values):
+        parsed = {value: self.encode(value) for value in set(values)}
+        stored = list(map(parsed.__getitem__, values))
+        if None not in stored:
+            self.values.extend(array("q", stored))
+            return
+        for value in values:
+            self.set(len(self.values), value)
+
+    def operand(self, value):
+        return _text_operand(value)
+
+
+# A column of interned values. Codes start as one byte each and the array is widened when it runs out
+class CodeColumn:
+    __slots__ = ("values", "labels", "codes")
+
+    def __init__(self):
+        self.values = array("B")
+        self.labels = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+            if code > 255 and self.values.typecode == "B":
+                self.values = array("H", self.values)
+            elif code > 65535 and self.values.typecode == "H":
+                self.values = array("I", self.values)
+        return code
+
+    def extend(self, values):
+        for value in set(values) - self.codes.keys():
+            self.code(value)
+        self.values.extend(array(self.values.typecode, map(self.codes.__getitem__, values)))
+
+    def set(self, slot, value):
+        code = self.code(value)
+        if slot == len(self.values):
+            self.values.append(code)
+        else:
+            self.values[slot] = code
+
+    def get(self, slot):
+        return self.labels[self.values[slot]]
+
+    def operand(self, value):
+        return _text_operand(value)
+
+    def sort_key(self, slot):
+        return self.values[slot]
+
+    def sort_keys(self):
+        return self.values.tolist()
+
+    def all_values(self):
+        return list(map(self.labels.__getitem__, self.values))
+
+    def matching(self, value):
+        code = self.codes.get(self.operand(value))
+        if code is None:
+            return []
+        values = self.values
+        slots = []
+        slot = -1
+        while True:
+            try:
+                slot = values.index(code, slot + 1)
+            except ValueError:
+                return slots
+            slots.append(slot)
+
+    def memory_bytes(self):
+        return (self.values.itemsize * len(self.values) + sys.getsizeof(self.labels) + sys.getsizeof(self.codes)
+                + sum(sys.getsizeof(label) for label in self.labels))
+
+
+# Maps each value of a column to an array of the slots holding it, ordered by the order columns, then Flight_ID
+class HashIndex:
+    __slots__ = ("column", "order", "flight_ids", "buckets")
+
+    def __init__(self, column, order, flight_ids):
+        self.column = column
+        self.order = order
+        self.flight_ids = flight_ids
+        self.buckets = {}
+
+    def _order_key(self, slot):
+        return tuple(column.sort_key(slot) for column in self.order) + (self.flight_ids.values[slot],)
+
+    # Index every slot at once, which is much quicker than adding them one by one. Called straight after loading,
+    # when slots are in Flight_ID order, so a stable sort on the order columns leaves ties in Flight_ID order
+    def build(self):
+        slots = range(len(self.flight_ids.values))
+        if self.order:
+            keys = self.order[0].sort_keys() if len(self.order) == 1 else \
+                list(zip(*[column.sort_keys() for column in self.order]))
+            slots = sorted(slots, key=keys.__getitem__)
+        values = self.column.all_values()
+        buckets = {}
+        for slot in slots:
+            bucket = buckets.get(values[slot])
+            if bucket is None:
+                bucket = buckets[values[slot]] = []
+            bucket.append(slot)
+        self.buckets = {key: array("q", bucket) for key, bucket in buckets.items()}
+
+    # Slots must be added and removed while they hold the values they are indexed under
+    def add(self, slot):
+        key = self.column.get(slot)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = array("q")
+        insort(bucket, slot, key=self._order_key)
+
+    def remove(self, slot):
+        key = self.column.get(slot)
+        bucket = self.buckets[key]
+        position = bisect_left(bucket, self._order_key(slot), key=self._order_key)
+        while bucket[position] != slot:
+            position += 1
+        del bucket[position]
+        if not bucket:
+            del self.buckets[key]
+
+    def lookup(self, value):
+        return self.buckets.get(self.column.operand(value), ())
+
+    def memory_bytes(self):
+        return sys.getsizeof(self.buckets) + sum(bucket.itemsize * len(bucket) for bucket in self.buckets.values())
+
+
+class FlightStore:
+    __slots__ = ("columns", "by_name", "slots", "free", "indexes", "arrival_status_counts", "airports", "_lock",
+                 "_version_lock", "_version", "_loaded_version")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.airports = {}
+        # Every write to Flights bumps _version. _loaded_version is the version the store reflects, or None before
+        # the first load. They have a lock of their own so writers aren't held up while a load holds _lock
+        self._version_lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = None
+
+    def _reset(self):
+        self.columns = [IntColumn(), IntColumn(), CodeColumn(), IntColumn(), TimeColumn(), TimeColumn(), CodeColumn(),
+                        CodeColumn(), CodeColumn()]
+        self.by_name = dict(zip(flightQueries.FLIGHT_COLUMNS, self.columns))
+        self.slots = {}         # Flight_ID -> slot
+        self.free = []          # Slots of removed flights, reused by the next flights added
+        self.indexes = {name: HashIndex(self.by_name[name], [self.by_name[column] for column in order],
+                                        self.by_name["Flight_ID"])
+                        for name, order in INDEXES.items()}
+        self.arrival_status_counts = {}     # (Arrival_Airport_IATA, Flight_Status) -> number of flights
+
+    def __len__(self):
+        return len(self.slots)
+
+    # Read every flight and airport from the database
+    def load(self, connection, chunk_size=CHUNK_SIZE):
+        with self._version_lock:
+            version = self._version
+        with self._lock:
+            self._reset()
+            cursor = connection.execute(LOAD_QUERY)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for column, values in zip(self.columns, zip(*rows)):
+                    column.extend(values)
+            cursor.close()
+            self.slots = {flight_id: slot for slot, flight_id in enumerate(self.columns[0].values)}
+            for index in self.indexes.values():
+                index.build()
+            arrivals, statuses = self.by_name["Arrival_Airport_IATA"], self.by_name["Flight_Status"]
+            for (arrival, status), count in Counter(zip(arrivals.values, statuses.values)).items():
+                self.arrival_status_counts[arrivals.labels[arrival], statuses.labels[status]] = count
+            self.load_airports(connection)
+        # A write committed while the rows were being read may be missing from them, so the store is only current
+        # as of the version it started from
+        with self._version_lock:
+            self._loaded_version = version
+
+    def load_airports(self, connection):
+        with self._lock:
+            self.airports = {iata: (city, country) for iata, city, country in connection.execute(AIRPORTS_QUERY)}
+
+    # Index a slot once its values are set, and take it out again before they change
+    def _attach(self, slot):
+        for index in self.indexes.values():
+            index.add(slot)
+        key = (self.by_name["Arrival_Airport_IATA"].get(slot), self.by_name["Flight_Status"].get(slot))
+        self.arrival_status_counts[key] = self.arrival_status_counts.get(key, 0) + 1
+
+    def _detach(self, slot):
+        for index in self.indexes.values():
+            index.remove(slot)
+        key = (self.by_name["Arrival_Airport_IATA"].get(slot), self.by_name["Flight_Status"].get(slot))
+        self.arrival_status_counts[key] -= 1
+        if not self.arrival_status_counts[key]:
+            del self.arrival_status_counts[key]
+
+    # Make the store hold row (in FLIGHT_COLUMNS order), replacing the flight's current values if it has any
+    def put(self, row):
+        with self._lock:
+            slot = self.slots.get(row[0])
+            if slot is not None:
+                self._detach(slot)
+            elif self.free:
+                slot = self.free.pop()
+            else:
+                slot = len(self.columns[0].values)
+            for column, value in zip(self.columns, row):
+                column.set(slot, value)
+            self.slots[row[0]] = slot
+            self._attach(slot)
+
+    def discard(self, flight_id):
+        with self._lock:
+            slot = self.slots.pop(flight_id, None)
+            if slot is not None:
+                self._detach(slot)
+                self.columns[0].set(slot, FREE_SLOT)
+                self.free.append(slot)
+
+    # Re-read the given flights from the database. Flights that no longer exist are removed
+    def refresh(self, connection, flight_ids):
+        flight_ids = {int(flight_id) for flight_id in flight_ids}
+        rows = connection.execute(flightQueries.FLIGHTS_BY_ID_QUERY, (json.dumps(sorted(flight_ids)),)).fetchall()
+        with self._lock:
+            for flight_id in flight_ids - {row[0] for row in rows}:
+                self.discard(flight_id)
+            for row in rows:
+                self.put(row)
+
+    # flightQueries write listener. Flights written with known keys are re-read straight away; any other write to
+    # Flights makes the next lookup reload the whole store
+    def on_write(self, table, keys=None):
+        if table == "Airports":
+            self._refresh_with(self.load_airports)
+        elif table == "Flights":
+            with self._version_lock:
+                self._version += 1
+                # Only a store that was current can be brought up to date by re-reading the written flights
+                apply = keys is not None and self._loaded_version == self._version - 1
+                if apply:
+                    self._loaded_version = self._version
+            if apply:
+                self._refresh_with(lambda connection: self.refresh(connection, keys))
+
+    def _refresh_with(self, function):
+        connection = connect_to_db()
+        try:
+            function(connection)
+        finally:
+            connection.close()
+
+    def ensure_current(self):
+        with self._version_lock:
+            current = self._loaded_version == self._version
+        if not current:
+            self._refresh_with(self.load)
+
+    def row(self, slot):
+        return tuple(column.get(slot) for column in self.columns)
+
+    # The lookups below answer the flightQueries functions of the same name, with the same results
+
+    def find_flights(self, criteria, value):
+        self.ensure_current()
+        with self._lock:
+            if criteria == "Flight_ID":
+                slot = self.slots.get(_integer_operand(value))
+                return [] if slot is None else [self.row(slot)]
+            flight_ids = self.columns[0].values
+            if criteria in self.indexes:
+                slots = self.indexes[criteria].lookup(value)
+                if not INDEXES[criteria]:
+                    return [self.row(slot) for slot in slots]
+            else:
+                slots = [slot for slot in self.by_name[criteria].matching(value) if flight_ids[slot] != FREE_SLOT]
+            # Slots are in Flight_ID order only until removed flights' slots are reused, and the airport indexes
+            # are in time order, so sort to match the database
+            return [self.row(slot) for slot in sorted(slots, key=flight_ids.__getitem__)]
+
+    def flights_by_id(self, flight_ids):
+        self.ensure_current()
+        with self._lock:
+            slots = [self.slots.get(flight_id) for flight_id in sorted({int(flight_id) for flight_id in flight_ids})]
+            return [self.row(slot) for slot in slots if slot is not None]
+
+    def flights_to(self, iata):
+        self.ensure_current()
+        with self._lock:
+            numbers, airlines, arrivals, statuses = (self.by_name[name].get for name in
+                                                     ("Flight_Number", "Airline_Name", "Arrival", "Flight_Status"))
+            # Each departure airport's code, city and country, looked up once per airport rather than per flight.
+            # Flights from airports missing from Airports are left out, as the database's join leaves them out
+            origins = self.by_name["Departure_Airport_IATA"]
+            places = [(label,) + self.airports[label] if label in self.airports else None for label in origins.labels]
+            codes = origins.values
+            rows = []
+            for slot in self.indexes["Arrival_Airport_IATA"].lookup(iata):
+                place = places[codes[slot]]
+                if place is not None:
+                    rows.append((numbers(slot),) + place + (airlines(slot), arrivals(slot), statuses(slot)))
+            return rows
+
+    def count_flights_to(self, iata, flight_status=None):
+        self.ensure_current()
+        with self._lock:
+            if flight_status is None:
+                return len(self.indexes["Arrival_Airport_IATA"].lookup(iata))
+            return self.arrival_status_counts.get((_text_operand(iata), _text_operand(flight_status)), 0)
+
+    def memory_bytes(self):
+        with self._lock:
+            return (sum(column.memory_bytes() for column in self.columns)
+                    + sum(index.memory_bytes() for index in self.indexes.values())
+                    + sys.getsizeof(self.slots) + sys.getsizeof(self.arrival_status_counts))
+
+
+# Load the store from the current pool's database and have flightQueries answer lookups from it. Returns the store
+def enable_flight_store():
+    store = FlightStore()
+    store.ensure_current()
+    flightQueries.add_write_listener(store.on_write)
+    flightQueries.flight_store = store
+    return store
+
+
+def disable_flight_store():
+    store = flightQueries.flight_store
+    if store is not None:
+        flightQueries.flight_store = None
+        flightQueries.remove_write_listener(store.on_write)
+
+
+# Median time of repeated calls to function, in microseconds
+def _median_us(function, repeat):
+    timings = []
+    for index in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the in-memory flight store and compare its lookups with SQLite.")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to load")
+    parser.add_argument("--airport", default="SYD", help="Airport to look up flights to")
+    parser.add_argument("--repeat", type=int, default=50, help="Times each lookup is timed")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    started = time.perf_counter()
+    store = FlightStore()
+    store.ensure_current()
+    print(f"Loaded {len(store):,} flights in {time.perf_counter() - started:.2f}s, "
+          f"{store.memory_bytes() / 1_000_000:.1f}MB")
+
+    aircraft_id = store.columns[3].get(next(iter(store.slots.values()))) if len(store) else 0
+    lookups = [("count_flights_to", (args.airport,)), ("count_flights_to", (args.airport, "Delayed")),
+               ("find_flights", ("Flight_ID", max(store.slots, default=0))),
+               ("find_flights", ("Aircraft_ID", aircraft_id)),
+               ("flights_to", (args.airport,))]
+    for name, arguments in lookups:
+        # The SQLite side is called through __wrapped__ so the query cache doesn't answer it
+        database_function = getattr(getattr(flightQueries, name), "__wrapped__", getattr(flightQueries, name))
+        store_us = _median_us(lambda: getattr(store, name)(*arguments), args.repeat)
+        database_us = _median_us(lambda: database_function(*arguments), args.repeat)
+        print(f"  {name}{arguments}: store {store_us:,.1f}us, SQLite {database_us:,.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from connectionPool import configure_pool
+from dataGenerator import generate
+import flightQueries
+
+# Stress test for Flight_ID allocation. Several processes add flights to the same database at the same time, some
+# one at a time through flightQueries.add_flight() and some in blocks through reserve_flight_ids(). Afterwards
+# every ID that was handed out is checked for collisions and every flight is checked to be in the database.
+#
+# --legacy runs the same test with the old approach (read MAX(Flight_ID) + 1, then insert) to show the collisions
+# it causes
+
+FLIGHT = (1234, "Stress Air", 1, "2025-01-01T10:00", "2025-01-01T12:00", "On Time", "LHR", "JFK")
+
+
+# Old allocation: look up the highest ID and insert the next one. Another writer can read the same maximum
+# between the two statements
+def legacy_add_flight(connection):
+    flight_id = (connection.execute("SELECT MAX(Flight_ID) FROM Flights").fetchone()[0] or 0) + 1
+    connection.execute(f"INSERT INTO Flights ({', '.join(flightQueries.FLIGHT_COLUMNS)}) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (flight_id,) + FLIGHT)
+    connection.commit()
+    return flight_id
+
+
+# Work done by each writer process. Returns the IDs it was given and the number of inserts that failed
+def writer(database, inserts, block_size, legacy, start_at):
+    configure_pool(database=database, size=1)
+    ids = []
+    failures = 0
+    # Wait until every process has started so the writers really do overlap
+    time.sleep(max(0.0, start_at - time.time()))
+
+    connection = sqlite3.connect(database, timeout=60) if legacy else None
+    for index in range(inserts):
+        try:
+            if legacy:
+                ids.append(legacy_add_flight(connection))
+            elif block_size and index % 10 == 0:
+                # Every tenth operation is a bulk load of block_size flights using a reserved block of IDs
+                first_id = flightQueries.reserve_flight_ids(block_size)
+                block = list(range(first_id, first_id + block_size))
+                with sqlite3.connect(database, timeout=60) as bulk:
+                    bulk.executemany(f"INSERT INTO Flights ({', '.join(flightQueries.FLIGHT_COLUMNS)}) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(flight_id,) + FLIGHT for flight_id in block])
+                bulk.close()
+                ids.extend(block)
+            else:
+                ids.append(flightQueries.add_flight(*FLIGHT))
+        except sqlite3.IntegrityError:
+            # Another writer already used this ID
+            failures += 1
+            if connection is not None:
+                connection.rollback()
+    if connection is not None:
+        connection.close()
+    return ids, failures
+
+
+def run(processes, inserts, block_size, legacy):
+    directory = tempfile.mkdtemp()
+    database = os.path.join(directory, "stress.db")
+    connection = sqlite3.connect(database)
+    generate(connection, flights=0, aircrafts=1, pilots=0, seed=1)
+    connection.close()
+
+    start_at = time.time() + 1.0
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(writer, [(database, inserts, block_size, legacy, start_at)] * processes)
+
+    ids = [flight_id for process_ids, failures in results for flight_id in process_ids]
+    failures = sum(failures for process_ids, failures in results)
+    collisions = sum(count - 1 for count in Counter(ids).values() if count > 1)
+
+    connection = sqlite3.connect(database)
+    stored = connection.execute("SELECT COUNT(*) FROM Flights").fetchone()[0]
+    connection.close()
+    shutil.rmtree(directory)
+    return {"ids_handed_out": len(ids), "duplicate_ids": collisions, "failed_inserts": failures,
+            "flights_stored": stored}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check Flight_ID allocation under many concurrent writer processes.")
+    parser.add_argument("--processes", type=int, default=8, help="Number of writer processes")
+    parser.add_argument("--inserts", type=int, default=200, help="Insert operations per process")
+    parser.add_argument("--block-size", type=int, default=50,
+                        help="Flights per reserved-block bulk insert (every tenth operation), 0 to disable")
+    parser.add_argument("--legacy", action="store_true", help="Use the old MAX(Flight_ID) + 1 allocation instead")
+    args = parser.parse_args()
+
+    result = run(args.processes, args.inserts, args.block_size, args.legacy)
+    print(f"IDs handed out: {result['ids_handed_out']}, flights stored: {result['flights_stored']}, "
+          f"duplicate IDs: {result['duplicate_ids']}, failed inserts: {result['failed_inserts']}")
+
+    ok = (result["duplicate_ids"] == 0 and result["failed_inserts"] == 0
+          and result["ids_handed_out"] == result["flights_stored"])
+    print("PASS - no collisions" if ok else "FAIL - Flight_ID collisions detected")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
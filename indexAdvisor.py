@@ -0,0 +1,114 @@
+import argparse
+import re
+from connectionPool import configure_pool, connect_to_db
+import changeLog
+import flightQueries
+import routeNetwork
+
+# The queries the application runs (taken from flightQueries), with the operation each one belongs to.
+# Queries that are expected to read the whole table (e.g. listing ALL flights) are marked so the advisor
+# doesn't report them as a problem
+APPLICATION_QUERIES = [
+    ("all_flights", flightQueries.ALL_FLIGHTS_QUERY, True),
+] + [
+    (f"find_flights ({criteria})", flightQueries.FIND_FLIGHTS_QUERY.format(criteria=criteria), False)
+    for criteria in flightQueries.FLIGHT_COLUMNS
+] + [
+    ("flight_exists", flightQueries.FLIGHT_EXISTS_QUERY, False),
+    ("pilot_exists", flightQueries.PILOT_EXISTS_QUERY, False),
+    ("assign_pilot (assignment exists)", flightQueries.ASSIGNMENT_EXISTS_QUERY, False),
+    ("pilot_schedule (ALL)", flightQueries.ALL_SCHEDULES_QUERY, True),
+    ("pilot_schedule (pilot)", flightQueries.PILOT_SCHEDULE_QUERY, False),
+    ("iter_flight_pages", flightQueries.FLIGHTS_PAGE_QUERY, False),
+    ("iter_schedule_pages", flightQueries.SCHEDULE_PAGE_QUERY, False),
+    ("flights_to", flightQueries.FLIGHTS_TO_QUERY, False),
+    ("count_flights_to", flightQueries.COUNT_FLIGHTS_TO_QUERY, False),
+    ("count_flights_to (status)", flightQueries.COUNT_FLIGHTS_TO_WITH_STATUS_QUERY, False),
+    ("assign_pilot (schedule conflicts)", flightQueries.CONFLICTING_FLIGHTS_QUERY, False),
+    ("departures_between", flightQueries.DEPARTURES_BETWEEN_QUERY, False),
+    ("flights_by_id", flightQueries.FLIGHTS_BY_ID_QUERY, False),
+    ("route_network (build)", routeNetwork.NETWORK_QUERY, True),
+    ("route_network (refresh)", routeNetwork.NETWORK_FLIGHTS_QUERY, False),
+    ("arrivals_between", flightQueries.ARRIVALS_BETWEEN_QUERY, False),
+    ("changes_since", changeLog.CHANGES_SINCE_QUERY + changeLog.CHANGES_ORDER, False),
+    # Typical searches - each should be answered from one of the composite indexes. The values are placeholders
+    ("search_flights (origin, departure range)", flightQueries.build_flight_search(
+        equals={"Departure_Airport_IATA": ""}, between={"Departure": ("", "")})[0], False),
+    ("search_flights (airline, status, origin, departure range)", flightQueries.build_flight_search(
+        equals={"Airline_Name": "", "Flight_Status": "", "Departure_Airport_IATA": ""},
+        between={"Departure": ("", "")})[0], False),
+    ("search_flights (destination, arrival range)", flightQueries.build_flight_search(
+        equals={"Arrival_Airport_IATA": ""}, between={"Arrival": ("", "")}, order_by="Arrival")[0], False),
+    ("search_flights (statuses, departure range)", flightQueries.build_flight_search(
+        one_of={"Flight_Status": ["", ""]}, between={"Departure": ("", "")})[0], False)
+]
+
+
+# Run EXPLAIN QUERY PLAN on a query and return the plan's detail lines
+def explain(cursor, query):
+    # Placeholders still need a value to be bound, but the value doesn't change the plan so None is fine
+    names = re.findall(r":(\w+)", query)
+    parameters = {name: None for name in names} if names else (None,) * query.count("?")
+    cursor.execute("EXPLAIN QUERY PLAN " + query, parameters)
+    return [row[3] for row in cursor.fetchall()]
+
+
+# A plan step is a full scan if it starts with SCAN. Scans through a covering index still read every entry
+# so these are reported too. Scans of a temporary b-tree (used for ORDER BY) aren't table scans, and neither are
+# scans of json_each, which only reads the list of values passed in
+def find_scans(plan):
+    return [step for step in plan if step.startswith("SCAN") and "TEMP B-TREE" not in step
+            and not step.startswith("SCAN json_each")]
+
+
+# Explain every application query and return (operation, scans, plan, expected_scan) for each
+def advise(connection, queries=None):
+    cursor = connection.cursor()
+    results = []
+    for operation, query, expected_scan in (APPLICATION_QUERIES if queries is None else queries):
+        plan = explain(cursor, query)
+        results.append((operation, find_scans(plan), plan, expected_scan))
+    cursor.close()
+    return results
+
+
+# Print the advisor results, listing queries that still scan a table first
+def print_report(results, verbose=False):
+    problems = [result for result in results if result[1] and not result[3]]
+
+    if problems:
+        print("Queries that still perform a full scan:\n")
+        for operation, scans, plan, expected_scan in problems:
+            print(f" - {operation}")
+            for step in scans:
+                print(f"     {step}")
+    else:
+        print("No unexpected full table scans found.")
+
+    if verbose:
+        print("\nFull query plans:\n")
+        for operation, scans, plan, expected_scan in results:
+            note = " (full listing, scan expected)" if expected_scan else ""
+            print(f"{operation}{note}")
+            for step in plan:
+                print(f"     {step}")
+
+    return len(problems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report which application queries still scan whole tables.")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to analyse")
+    parser.add_argument("--verbose", action="store_true", help="Also print the full plan of every query")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    connection = connect_to_db()
+    try:
+        print_report(advise(connection), verbose=args.verbose)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
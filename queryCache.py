@@ -0,0 +1,101 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+# Read-through cache for query results, keyed on the query function and its arguments.
+# Entries are dropped when they are the least recently used and the cache is full, when they are older than ttl
+# seconds, or when one of the tables they were read from is written to (see invalidate()).
+# Cached results are shared between callers, so they must not be modified
+class QueryCache:
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl                  # Seconds an entry stays valid - this bounds staleness from other processes' writes
+        self._entries = OrderedDict()   # key -> (result, expiry time, tables), least recently used first
+        self._keys_by_table = {}        # table name -> set of keys read from that table
+        self._generations = {}          # table name -> number of times it has been invalidated
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # Return the cached result for key, or call load() to get it and cache it against the given tables
+    def get_or_load(self, key, tables, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            generations = [self._generations.get(table, 0) for table in tables]
+
+        # Run the query outside the lock so other threads can use the cache in the meantime
+        result = load()
+
+        with self._lock:
+            # A table invalidated while the query ran may have been written after the query read it, so the
+            # result is returned to this caller but not kept
+            if generations != [self._generations.get(table, 0) for table in tables]:
+                return result
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, now + self.ttl, tables)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return result
+
+    # Remove an entry and its table references. Must be called with the lock held
+    def _remove(self, key):
+        result, expires_at, tables = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    # Drop every entry that was read from the given table. Used as a flightQueries write listener, so it is also
+    # given the keys of the rows written, but entries aren't tracked by row
+    def invalidate(self, table, keys=None):
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in list(self._keys_by_table.pop(table, ())):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    # Drop everything
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    # Counters describing how well the cache is doing
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "evictions": self.evictions,
+                    "expirations": self.expirations, "invalidations": self.invalidations}
+
+    # Decorator that caches a function's results against the tables it reads, e.g.
+    #     @query_cache.cached("Flights", "Airports")
+    #     def flights_to(iata): ...
+    def cached(self, *tables):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args):
+                return self.get_or_load((function.__name__,) + args, tables, lambda: function(*args))
+            wrapper.uncached = function
+            return wrapper
+        return decorator
@@ -0,0 +1,328 @@
+import argparse
+import bisect
+import itertools
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from connectionPool import configure_pool, get_pool, connect_to_db
+from indexAdvisor import explain
+
+# Query tracing. While a QueryTracer is installed on the connection pool, every connection the pool hands out is
+# wrapped so that each statement run through it is timed: the SQL, the shape of its parameters, how long it took
+# (including fetching the rows, which is when SQLite does most of the work) and how many rows came back.
+# Timings are added to a histogram per statement, and statements slower than the threshold are kept in a slow
+# query log. Only the types of the parameters are recorded, never their values
+
+# Upper bounds of the histogram buckets in milliseconds. Anything slower goes in a final overflow bucket
+BUCKET_BOUNDS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+
+# Statements that only differ in whitespace or the length of an IN (?, ?, ...) list are counted together
+def normalise_sql(sql):
+    sql = " ".join(sql.split())
+    return re.sub(r"\bIN \(\?(?: ?, ?\?)+\)", "IN (?, ...)", sql, flags=re.IGNORECASE)
+
+
+# Describe parameters by their types, e.g. "(int, str)" or "{pilot: int}"
+def parameter_shape(parameters):
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+
+
+# Timings for one normalised statement
+class StatementStats:
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.shapes = Counter()
+
+    def add(self, elapsed_ms, rows, shape):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.shapes[shape] += 1
+
+    # Estimate a percentile from the histogram: the upper bound of the bucket it falls in (the slowest call
+    # for the overflow bucket)
+    def percentile_ms(self, fraction):
+        rank = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return {"sql": self.sql, "calls": self.calls, "total_ms": self.total_ms,
+                "mean_ms": self.total_ms / self.calls if self.calls else 0.0, "p50_ms": self.percentile_ms(0.5),
+                "p95_ms": self.percentile_ms(0.95), "max_ms": self.max_ms,
+                "rows_per_call": self.rows / self.calls if self.calls else 0.0,
+                "parameter_shapes": dict(self.shapes)}
+
+
+# Collects the timings of every traced statement. Shared by all threads, so updates are made under a lock
+class QueryTracer:
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, slow_log_size=200, slow_log_path=None):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log = deque(maxlen=slow_log_size)  # Most recent slow queries, as (time, sql, shape, ms, rows)
+        self.slow_log_path = slow_log_path            # File slow queries are also appended to, if set
+        self._statements = {}                         # Normalised SQL -> StatementStats
+        self._lock = threading.Lock()
+
+    # Called by PooledConnection for each connection handed out while the tracer is installed
+    def wrap(self, connection):
+        return TracingConnection(connection, self)
+
+    def record(self, sql, shape, elapsed_ms, rows):
+        sql = normalise_sql(sql)
+        with self._lock:
+            stats = self._statements.get(sql)
+            if stats is None:
+                stats = self._statements[sql] = StatementStats(sql)
+            stats.add(elapsed_ms, rows, shape)
+            if elapsed_ms < self.slow_query_ms:
+                return
+            entry = (datetime.now().isoformat(timespec="milliseconds"), sql, shape, elapsed_ms, rows)
+            self.slow_log.append(entry)
+            if self.slow_log_path:
+                with open(self.slow_log_path, "a") as log_file:
+                    log_file.write(f"{entry[0]}  {elapsed_ms:.2f}ms  {rows} rows  {shape}  {sql}\n")
+
+    # Statement summaries, slowest in total first
+    def top(self, limit=10, key="total_ms"):
+        with self._lock:
+            summaries = [stats.summary() for stats in self._statements.values()]
+        return sorted(summaries, key=lambda summary: summary[key], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow_log.clear()
+
+
+# A statement that has been executed but whose rows may not all have been fetched yet. It is recorded when the
+# rows run out or the cursor is reused or closed
+class _Execution:
+
+    def __init__(self, sql, shape, elapsed, rows):
+        self.sql = sql
+        self.shape = shape
+        self.elapsed = elapsed
+        self.rows = rows
+
+
+# Cursor wrapper that times execute() and every fetch that follows it. Anything else is passed straight through
+class TracingCursor:
+
+    def __init__(self, cursor, tracer):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._execution = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        execution, self._execution = self._execution, None
+        if execution is not None:
+            self._tracer.record(execution.sql, execution.shape, execution.elapsed * 1000, execution.rows)
+
+    def _run(self, method, sql, parameters, shape):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            # Statements that don't return rows are complete once they have run; a failed one is still timed
+            self._execution = _Execution(sql, shape, time.perf_counter() - started,
+                                         max(self._cursor.rowcount, 0) if self._cursor.description is None else 0)
+            if self._cursor.description is None:
+                self._finish()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._cursor.execute, sql, parameters, parameter_shape(parameters))
+
+    # Rows may come from a generator, so only the first is looked at to describe the parameters
+    def executemany(self, sql, parameter_rows):
+        parameter_rows = iter(parameter_rows)
+        first = next(parameter_rows, None)
+        if first is None:
+            return self._run(self._cursor.executemany, sql, [], "many x ()")
+        return self._run(self._cursor.executemany, sql, itertools.chain([first], parameter_rows),
+                         "many x " + parameter_shape(first))
+
+    # Time a fetch and add it to the current execution, which is finished once the rows run out
+    def _fetch(self, fetch, *arguments):
+        started = time.perf_counter()
+        result = fetch(*arguments)
+        execution = self._execution
+        if execution is not None:
+            execution.elapsed += time.perf_counter() - started
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        elif self._execution is not None:
+            self._execution.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cursor.arraysize if size is None else size
+        rows = self._fetch(self._cursor.fetchmany, size)
+        if self._execution is not None:
+            self._execution.rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        if self._execution is not None:
+            self._execution.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    # A cursor dropped before its rows ran out still counts
+    def __del__(self):
+        self._finish()
+
+
+# Connection wrapper whose cursors, and execute() shortcuts, are traced
+class TracingConnection:
+
+    def __init__(self, connection, tracer):
+        self._connection = connection
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self):
+        return TracingCursor(self._connection.cursor(), self._tracer)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameter_rows):
+        return self.cursor().executemany(sql, parameter_rows)
+
+
+# Start tracing every connection the shared pool hands out from now on, and return the tracer
+def enable_tracing(slow_query_ms=DEFAULT_SLOW_QUERY_MS, slow_log_path=None):
+    tracer = QueryTracer(slow_query_ms, slow_log_path=slow_log_path)
+    get_pool().tracer = tracer
+    return tracer
+
+
+def disable_tracing():
+    get_pool().tracer = None
+
+
+# The shared pool's tracer, or None if tracing is off
+def current_tracer():
+    return get_pool().tracer
+
+
+# Print the statements that took the most time in total, optionally with their query plans, then the most recent
+# slow queries
+def print_stats(tracer, limit=10, explain_plans=False, slow_queries=10):
+    top = tracer.top(limit)
+    if not top:
+        print("No queries have been traced yet.")
+        return
+
+    # Plans are read on a separate, untraced connection so explaining doesn't add to the statistics
+    plans = sqlite3.connect(get_pool().database) if explain_plans else None
+    try:
+        print(f"Top {len(top)} statements by total time:\n")
+        for rank, summary in enumerate(top, 1):
+            print(f"{rank:>2}) {summary['calls']} calls, {summary['total_ms']:.2f}ms total, "
+                  f"mean {summary['mean_ms']:.2f}ms, p50 <={summary['p50_ms']}ms, p95 <={summary['p95_ms']}ms, "
+                  f"max {summary['max_ms']:.2f}ms, {summary['rows_per_call']:.1f} rows per call")
+            print(f"    {summary['sql']}")
+            print(f"    parameters: {', '.join(f'{shape} x{count}' for shape, count in summary['parameter_shapes'].items())}")
+            if plans is not None:
+                try:
+                    for step in explain(plans.cursor(), summary["sql"].replace("IN (?, ...)", "IN (?)")):
+                        print(f"      {step}")
+                except sqlite3.Error as error:
+                    print(f"      (no plan: {error})")
+            print()
+    finally:
+        if plans is not None:
+            plans.close()
+
+    recent = list(tracer.slow_log)[-slow_queries:]
+    if recent:
+        print(f"Most recent queries slower than {tracer.slow_query_ms}ms:\n")
+        for logged_at, sql, shape, elapsed_ms, rows in recent:
+            print(f"  {logged_at}  {elapsed_ms:9.2f}ms  {rows:>7} rows  {shape}  {sql}")
+    else:
+        print(f"No queries slower than {tracer.slow_query_ms}ms.")
+
+
+# Run every menu operation from the benchmark against the current pool's database, with its output thrown away
+def run_workload(repeat, seed=1):
+    # Imported here because benchmark imports the application, which imports this module
+    import benchmark
+
+    connection = connect_to_db()
+    size = connection.execute("SELECT COUNT(*) FROM Flights").fetchone()[0]
+    connection.close()
+    rng = random.Random(seed)
+    for name, function, query, choose_arguments, answers_for, full_listing in benchmark.OPERATIONS:
+        for index in range(1 if full_listing else repeat):
+            benchmark.run_menu_function(function, answers_for(*choose_arguments(rng, size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace the menu operations' queries and list the slowest.")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--repeat", type=int, default=20, help="Times each operation is run")
+    parser.add_argument("--top", type=int, default=10, help="Number of statements to list")
+    parser.add_argument("--slow-ms", type=float, default=DEFAULT_SLOW_QUERY_MS,
+                        help="Queries slower than this many milliseconds go in the slow query log")
+    parser.add_argument("--slow-log", help="File to append slow queries to")
+    parser.add_argument("--explain", action="store_true", help="Show the query plan of each listed statement")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    tracer = enable_tracing(args.slow_ms, args.slow_log)
+    run_workload(args.repeat)
+    print_stats(tracer, args.top, args.explain)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import argparse
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from connectionPool import configure_pool, connect_to_db
+import flightQueries
+
+# Connection search over the timetable. The flights form a time-dependent graph between airports, held in memory
+# as one timetable per route (departure airport -> arrival airport): the UTC departure times in order, with the
+# arrival time and Flight_ID of each. For every position in a route's timetable we also keep which flight from that
+# position on arrives first, so "the earliest arrival on this route leaving at or after time t" is one binary
+# search. Cancelled flights and flights without UTC times are left out.
+#
+# Searches work in rounds, one per leg (as in the RAPTOR algorithm): round k takes the airports whose earliest
+# arrival improved in round k - 1 and tries every route out of them, leaving at least the minimum connection time
+# after landing. Airports only improve a limited number of times, so a search touches a few hundred routes however
+# many flights there are.
+#
+# The network is built once and then kept up to date through flightQueries' write listeners: written flights are
+# re-read by Flight_ID and moved between timetables, and only the routes that changed have their earliest-arrival
+# positions recalculated, on the next search that uses them
+
+DEFAULT_MAX_LEGS = 3
+DEFAULT_CONNECTION_MINUTES = 60
+
+# Flights in the network, in UTC departure order
+NETWORK_QUERY = """SELECT Flight_ID, Departure_Airport_IATA, Arrival_Airport_IATA, Departure_UTC, Arrival_UTC
+                   FROM Flights
+                   WHERE Departure_UTC IS NOT NULL AND Arrival_UTC IS NOT NULL AND Flight_Status <> 'Cancelled'
+                   ORDER BY Departure_UTC"""
+NETWORK_FLIGHTS_QUERY = """SELECT Flight_ID, Departure_Airport_IATA, Arrival_Airport_IATA, Departure_UTC, Arrival_UTC
+                           FROM Flights
+                           WHERE Flight_ID IN (SELECT value FROM json_each(?)) AND Departure_UTC IS NOT NULL
+                                 AND Arrival_UTC IS NOT NULL AND Flight_Status <> 'Cancelled'"""
+
+# Columns of each leg in an itinerary
+LEG_COLUMNS = ["Flight_ID", "Departure_Airport_IATA", "Arrival_Airport_IATA", "Departure_UTC", "Arrival_UTC"]
+
+
+# One route's timetable. The arrays are parallel and sorted by departure; earliest[i] is the position of the flight
+# that arrives first out of those at positions i onwards, or None until it is next needed after a change
+class Route:
+
+    def __init__(self):
+        self.departures = array("q")
+        self.arrivals = array("q")
+        self.flight_ids = array("q")
+        self.earliest = None
+
+    def add(self, flight_id, departure, arrival):
+        position = bisect_left(self.departures, departure)
+        self.departures.insert(position, departure)
+        self.arrivals.insert(position, arrival)
+        self.flight_ids.insert(position, flight_id)
+        self.earliest = None
+
+    def remove(self, flight_id, departure):
+        position = bisect_left(self.departures, departure)
+        while self.flight_ids[position] != flight_id:
+            position += 1
+        del self.departures[position], self.arrivals[position], self.flight_ids[position]
+        self.earliest = None
+
+    def index_arrivals(self):
+        self.earliest = earliest = array("q", bytes(8 * len(self.arrivals)))
+        arrivals = self.arrivals
+        best = len(arrivals) - 1
+        for index in range(best, -1, -1):
+            if arrivals[index] < arrivals[best]:
+                best = index
+            earliest[index] = best
+
+    # The position of the earliest-arriving flight leaving at or after ready, or None
+    def first_arrival(self, ready):
+        position = bisect_left(self.departures, ready)
+        if position == len(self.departures):
+            return None
+        if self.earliest is None:
+            self.index_arrivals()
+        return self.earliest[position]
+
+
+class RouteNetwork:
+
+    def __init__(self):
+        self.routes = {}        # Departure airport -> {arrival airport: Route}
+        self.flights = {}       # Flight_ID -> (departure airport, arrival airport, Departure_UTC) for every flight held
+        self._lock = threading.Lock()
+        # Every write to Flights bumps _version. _built_version is the version the network reflects, or None
+        # before the first build
+        self._version = 0
+        self._built_version = None
+
+    # Read the whole timetable from the database
+    def build(self, connection):
+        with self._lock:
+            version = self._version
+        routes = {}
+        flights = {}
+        for flight_id, origin, destination, departure, arrival in connection.execute(NETWORK_QUERY):
+            route = routes.setdefault(origin, {}).get(destination)
+            if route is None:
+                route = routes[origin][destination] = Route()
+            # Rows arrive in departure order, so appending keeps every route sorted
+            route.departures.append(departure)
+            route.arrivals.append(arrival)
+            route.flight_ids.append(flight_id)
+            flights[flight_id] = (origin, destination, departure)
+        for destinations in routes.values():
+            for route in destinations.values():
+                route.index_arrivals()
+        with self._lock:
+            self.routes = routes
+            self.flights = flights
+            # A write committed while the timetable was being read may be missing from it, so the network is only
+            # current as of the version it started from
+            self._built_version = version
+
+    def _remove(self, flight_id):
+        held = self.flights.pop(flight_id, None)
+        if held is not None:
+            origin, destination, departure = held
+            self.routes[origin][destination].remove(flight_id, departure)
+
+    def _add(self, flight_id, origin, destination, departure, arrival):
+        route = self.routes.setdefault(origin, {}).get(destination)
+        if route is None:
+            route = self.routes[origin][destination] = Route()
+        route.add(flight_id, departure, arrival)
+        self.flights[flight_id] = (origin, destination, departure)
+
+    # Re-read the given flights from the database and move them to their current routes. Flights that no longer
+    # exist (or are now cancelled) are removed
+    def refresh(self, connection, flight_ids):
+        flight_ids = sorted({int(flight_id) for flight_id in flight_ids})
+        rows = connection.execute(NETWORK_FLIGHTS_QUERY, (json.dumps(flight_ids),)).fetchall()
+        with self._lock:
+            for flight_id in flight_ids:
+                self._remove(flight_id)
+            for row in rows:
+                self._add(*row)
+
+    # flightQueries write listener. Writes to Flights with known keys are applied straight away; anything else
+    # (e.g. a bulk import) makes the next search rebuild the whole network
+    def on_write(self, table, keys=None):
+        if table != "Flights":
+            return
+        with self._lock:
+            self._version += 1
+            # Only a network that was current can be brought up to date by re-reading the written flights
+            apply = keys is not None and self._built_version == self._version - 1
+            if apply:
+                self._built_version = self._version
+        if not apply:
+            return
+        connection = connect_to_db()
+        try:
+            self.refresh(connection, keys)
+        finally:
+            connection.close()
+
+    # Rebuild the network if it has never been built or a write couldn't be applied to it
+    def ensure_current(self):
+        with self._lock:
+            current = self._built_version == self._version
+        if not current:
+            connection = connect_to_db()
+            try:
+                self.build(connection)
+            finally:
+                connection.close()
+
+    # The earliest arrival at destination leaving origin at or after `after` (UTC epoch seconds), using at most
+    # max_legs flights with at least connection_minutes between landing and taking off again.
+    # Returns the itinerary as a list of legs (LEG_COLUMNS), with the fewest legs among those arriving first, or
+    # None if the destination can't be reached
+    def fastest(self, origin, destination, after, max_legs=DEFAULT_MAX_LEGS,
+                connection_minutes=DEFAULT_CONNECTION_MINUTES):
+        connection_time = connection_minutes * 60
+        with self._lock:
+            # best[airport] is the earliest arrival at the airport in any round so far; labels[k][airport] is how
+            # the airport was reached in round k, as (arrival, previous airport, route, position)
+            best = {origin: after}
+            labels = [{origin: (after, None, None, None)}]
+            improved = [origin]
+            for leg in range(max_legs):
+                round_labels = {}
+                for airport in improved:
+                    # Connecting passengers need time to change planes; the first flight can leave straight away
+                    ready = labels[leg][airport][0] + (connection_time if leg else 0)
+                    for next_airport, route in self.routes.get(airport, {}).items():
+                        position = route.first_arrival(ready)
+                        if position is None:
+                            continue
+                        arrival = route.arrivals[position]
+                        # Only keep arrivals that beat every earlier round, and are no later than the best way to
+                        # the destination found so far (nothing can improve on that)
+                        if arrival < best.get(next_airport, arrival + 1) and arrival < best.get(destination, arrival + 1):
+                            best[next_airport] = arrival
+                            round_labels[next_airport] = (arrival, airport, route, position)
+                labels.append(round_labels)
+                improved = [airport for airport in round_labels if airport != destination]
+                if not improved:
+                    break
+
+            # The first round reaching the destination has the fewest legs; later rounds only reach it earlier
+            arrivals = [(labels[leg][destination][0], leg) for leg in range(1, len(labels)) if destination in labels[leg]]
+            if not arrivals:
+                return None
+            arrival, legs = min(arrivals)
+            itinerary = []
+            airport = destination
+            for leg in range(legs, 0, -1):
+                arrival, previous, route, position = labels[leg][airport]
+                itinerary.append((route.flight_ids[position], previous, airport, route.departures[position],
+                                  route.arrivals[position]))
+                airport = previous
+            return itinerary[::-1]
+
+    # Up to `limit` itineraries from origin to destination leaving between after and after + within_hours, in order
+    # of departure. Each is the fastest way to travel when leaving at or after its first flight; an itinerary that
+    # leaves earlier but arrives no sooner than a later one is left out
+    def connections(self, origin, destination, after, limit=5, max_legs=DEFAULT_MAX_LEGS,
+                    connection_minutes=DEFAULT_CONNECTION_MINUTES, within_hours=24):
+        self.ensure_current()
+        latest = after + within_hours * 3600
+        itineraries = []
+        while True:
+            itinerary = self.fastest(origin, destination, after, max_legs, connection_minutes)
+            if itinerary is None or itinerary[0][3] > latest:
+                break
+            if itineraries and itinerary[-1][4] <= itineraries[-1][-1][4]:
+                # Leaves later and arrives no later, so the previous one isn't worth taking
+                itineraries[-1] = itinerary
+            elif len(itineraries) == limit:
+                break
+            else:
+                itineraries.append(itinerary)
+            after = itinerary[0][3] + 1
+        return itineraries
+
+
+# The shared network, built on the first search and kept up to date by a write listener from then on
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_network():
+    global _network
+    with _network_lock:
+        if _network is None:
+            _network = RouteNetwork()
+            flightQueries.add_write_listener(_network.on_write)
+        return _network
+
+
+# Itineraries between two airports for the application, with each leg's local times and flight details.
+# after is an ISO 8601 time (UTC unless it has an offset). Returns a list of itineraries, each a list of rows in
+# flightQueries.FLIGHT_COLUMNS order
+def find_connections(origin, destination, after, limit=5, max_legs=DEFAULT_MAX_LEGS,
+                     connection_minutes=DEFAULT_CONNECTION_MINUTES, within_hours=24):
+    itineraries = get_network().connections(origin.upper(), destination.upper(), flightQueries.to_utc_epoch(after),
+                                            limit, max_legs, connection_minutes, within_hours)
+    flight_ids = [leg[0] for itinerary in itineraries for leg in itinerary]
+    if not flight_ids:
+        return []
+    details = {row[0]: row for row in flightQueries.flights_by_id(flight_ids)}
+    return [[details[leg[0]] for leg in itinerary if leg[0] in details] for itinerary in itineraries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest connections between two airports.")
+    parser.add_argument("origin", help="IATA code of the airport to leave from")
+    parser.add_argument("destination", help="IATA code of the airport to travel to")
+    parser.add_argument("after", help="Earliest departure (ISO 8601, UTC unless it has an offset)")
+    parser.add_argument("--database", default="FlightManagement.db", help="Database file to use")
+    parser.add_argument("--limit", type=int, default=5, help="Maximum number of itineraries")
+    parser.add_argument("--legs", type=int, default=DEFAULT_MAX_LEGS, help="Maximum number of flights per itinerary")
+    parser.add_argument("--connection-minutes", type=int, default=DEFAULT_CONNECTION_MINUTES,
+                        help="Minimum time between landing and the next flight")
+    parser.add_argument("--within-hours", type=float, default=24, help="How long after --after to look for departures")
+    args = parser.parse_args()
+
+    configure_pool(database=args.database)
+    network = get_network()
+    started = time.perf_counter()
+    network.ensure_current()
+    print(f"Built the network of {len(network.flights):,} flights in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    itineraries = find_connections(args.origin, args.destination, args.after, args.limit, args.legs,
+                                   args.connection_minutes, args.within_hours)
+    elapsed = time.perf_counter() - started
+    for number, itinerary in enumerate(itineraries, 1):
+        print(f"\nItinerary {number} ({len(itinerary)} flight{'s' if len(itinerary) > 1 else ''}):")
+        for row in itinerary:
+            print("  " + "  ".join(str(value) for value in row))
+    if not itineraries:
+        print(f"No connections from {args.origin} to {args.destination} found.")
+    print(f"\nSearched in {elapsed * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
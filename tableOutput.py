@@ -0,0 +1,139 @@
+import json
+import sys
+from itertools import islice
+from tabulate import tabulate # Used for formatting output
+
+# Printing helpers shared by the menu. Small results are printed as one grid; large listings are printed
+# page by page as they are read so the first rows appear straight away and memory use stays bounded.
+#
+# Output modes:
+#  - grid: tabulate's grid, which reads every row twice to size the columns and builds the whole table as one string
+#  - fast: the same grid layout, streamed. Column widths come from the first sample_size rows (or are given), and
+#    rows are written in chunks as they are formatted. A later value wider than its column widens the column from
+#    that row on rather than being cut short
+#  - plain: aligned columns without borders, streamed like fast
+#  - tsv: tab separated values with a header line, for pasting into a spreadsheet or piping to other tools
+#  - json: a JSON array with one object per row, written as the rows arrive
+OUTPUT_MODES = ["grid", "fast", "plain", "tsv", "json"]
+
+# Mode used by print_table() and print_pages(), changed with set_output_mode()
+output_mode = "grid"
+
+SAMPLE_SIZE = 1000      # Rows looked at to size the columns
+CHUNK_SIZE = 1000       # Rows formatted and written per write() call
+
+
+def set_output_mode(mode):
+    global output_mode
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}. Choose from {', '.join(OUTPUT_MODES)}.")
+    output_mode = mode
+
+
+# Print rows as a single grid table
+def print_table(rows, headers):
+    if output_mode == "grid":
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        write_table(rows, headers, output_mode)
+
+
+# Print a sequence of pages (lists of rows) as they arrive, each as its own grid with the headers repeated.
+# Only the page being printed is held in memory. Returns the total number of rows printed.
+# The streamed modes write every page into one table with the headers printed once
+def print_pages(pages, headers):
+    if output_mode != "grid":
+        return write_table((row for page in pages for row in page), headers, output_mode)
+
+    printed = 0
+    for page in pages:
+        print(f"Rows {printed + 1} to {printed + len(page)}:")
+        print(tabulate(page, headers=headers, tablefmt="grid"), flush=True)
+        printed += len(page)
+    return printed
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Stream rows (any iterable) to output in one of the streamed modes, holding at most sample_size rows at a time.
+# widths optionally fixes the width of each column, skipping the sample. Returns the number of rows written
+def write_table(rows, headers, mode="fast", output=None, widths=None, sample_size=SAMPLE_SIZE, chunk_size=CHUNK_SIZE):
+    if mode not in OUTPUT_MODES or mode == "grid":
+        raise ValueError(f"Unknown streamed output mode {mode!r}. Choose from {', '.join(OUTPUT_MODES[1:])}.")
+    # Looked up on each call so redirect_stdout() is respected
+    output = sys.stdout if output is None else output
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+
+    if mode == "tsv":
+        return _write_chunks(output, sample, rows, chunk_size, lambda row: "\n" + "\t".join(
+            _text(value).replace("\t", " ").replace("\n", " ") for value in row), "\t".join(headers))
+
+    if mode == "json":
+        return _write_chunks(output, sample, rows, chunk_size,
+                             lambda row: "\n  " + json.dumps(dict(zip(headers, row)), default=str),
+                             "[", separator=",", footer="\n]\n")
+
+    # fast and plain: size the columns from the sample (or use the widths given) and right-align numbers
+    if widths is None:
+        widths = [len(header) for header in headers]
+        for row in sample:
+            for index, value in enumerate(row):
+                widths[index] = max(widths[index], len(_text(value)))
+    else:
+        widths = list(widths)
+    numeric = [bool(sample) and all(_is_number(row[index]) for row in sample if row[index] is not None)
+               for index in range(len(headers))]
+
+    justify = [str.rjust if is_numeric else str.ljust for is_numeric in numeric]
+    columns = range(len(headers))
+    widened = [False]
+
+    def cells(values):
+        for index in columns:
+            if len(values[index]) > widths[index]:
+                widths[index] = len(values[index])
+                widened[0] = True
+        return [justify[index](values[index], widths[index]) for index in columns]
+
+    if mode == "plain":
+        return _write_chunks(output, sample, rows, chunk_size,
+                             lambda row: "\n" + "  ".join(cells([_text(value) for value in row])).rstrip(),
+                             "  ".join(cells(list(headers))).rstrip())
+
+    def rule(character):
+        return "+" + "+".join(character * (width + 2) for width in widths) + "+"
+
+    # The rule under each row is drawn after the row's cells, so it matches any column the row widened
+    ruler = [rule("-")]
+
+    def format_grid(row):
+        line = "\n| " + " | ".join(cells([_text(value) for value in row])) + " |\n"
+        if widened[0]:
+            widened[0] = False
+            ruler[0] = rule("-")
+        return line + ruler[0]
+
+    header = rule("-") + "\n| " + " | ".join(cells(list(headers))) + " |\n" + rule("=")
+    return _write_chunks(output, sample, rows, chunk_size, format_grid, header)
+
+
+# Format rows chunk_size at a time and write each chunk with a single write() call. Every formatted row starts
+# with its own line break, so the header, rows and footer can be written one after another
+def _write_chunks(output, sample, rows, chunk_size, format_row, header, separator="", footer="\n"):
+    output.write(header)
+    written = 0
+    chunk = sample
+    while chunk:
+        output.write((separator if written else "") + separator.join(format_row(row) for row in chunk))
+        written += len(chunk)
+        chunk = list(islice(rows, chunk_size))
+    output.write(footer)
+    output.flush()
+    return written